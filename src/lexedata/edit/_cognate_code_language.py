@@ -3,4 +3,216 @@
 Run lexstat on every (new, old) pair and stick the new forms together with the
 most similar (according to LexStat) existing form
 
+The LexStat scorer is built incrementally: The correspondence distributions of
+the pairs of old languages are taken from the cache filled by earlier runs of
+`lexedata.edit.detect_cognates` (or of this script), and only the pairs
+involving the new language are computed. Existing cognate judgements are not
+changed. Each form of the new language that is not judged yet is added to the
+cognate set of the same concept that it is closest to, on average, if that
+distance is below the threshold, or to a new singleton cognate set otherwise.
+
 """
+
+import itertools
+import typing as t
+from pathlib import Path
+
+import pycldf
+import lingpy
+
+import lexedata.cli as cli
+import lexedata.types as types
+from lexedata.util import fs
+from lexedata.edit.detect_cognates import (
+    ParallelPartial,
+    add_lexstat_arguments,
+    filter_function_factory,
+    load_or_compute_scorer,
+    ratio_pair,
+)
+
+
+def cognate_code_language(
+    metadata: Path,
+    language: types.Language_ID,
+    ratio: float,
+    soundclass: str,
+    threshold: float,
+    initial_threshold: float,
+    gop: float,
+    mode: str,
+    cache_dir: t.Optional[Path] = None,
+    cache_size: t.Optional[int] = None,
+    jobs: int = 1,
+    seed: t.Optional[str] = None,
+    logger: cli.logging.Logger = cli.logger,
+) -> t.Tuple[t.List[t.Dict[str, t.Any]], t.List[t.Dict[str, t.Any]]]:
+    """Find cognate sets for the unjudged forms of one language.
+
+    Return the new cognate sets and the new cognate judgements.
+
+    """
+    dataset = pycldf.Wordlist.from_metadata(metadata)
+    assert (
+        dataset.column_names.forms.segments is not None
+    ), "Dataset must have a CLDF #segments column."
+    c_f_id = dataset["FormTable", "id"].name
+    c_j_id = dataset["CognateTable", "id"].name
+    c_j_form = dataset["CognateTable", "formReference"].name
+    c_j_cogset = dataset["CognateTable", "cognatesetReference"].name
+    c_cs_id = dataset["CognatesetTable", "id"].name
+
+    judgements: t.Dict[types.Form_ID, t.Set[types.Cognateset_ID]] = {}
+    judgement_ids: t.Set[str] = set()
+    for judgement in dataset["CognateTable"]:
+        judgements.setdefault(judgement[c_j_form], set()).add(judgement[c_j_cogset])
+        judgement_ids.add(judgement[c_j_id])
+    cognateset_ids = {c[c_cs_id] for c in dataset["CognatesetTable"]}
+
+    lexstat_filter = filter_function_factory(dataset)
+    c_f_language = dataset["FormTable", "languageReference"].name
+    c_f_segments = dataset["FormTable", "segments"].name
+    # The judgements refer to the segments of the FormTable, not to the
+    # cleaned tokens LingPy works with, so keep them for the new language.
+    segments: t.Dict[types.Form_ID, t.List[str]] = {}
+
+    def filter(row: t.Dict[str, t.Any]) -> bool:
+        row["form_id"] = row[c_f_id.lower()]
+        if row[c_f_language.lower()] == language:
+            segments[row["form_id"]] = list(row[c_f_segments.lower()])
+        return lexstat_filter(row)
+
+    lex = ParallelPartial.from_cldf(
+        metadata,
+        filter=filter,
+        columns=["doculect", "concept", "tokens", "form_id"],
+        model=lingpy.data.model.Model(soundclass),
+        check=True,
+    )
+    if language not in lex.cols:
+        cli.Exit.INVALID_ID(f"Language {language} has no forms with segments.")
+    lex.jobs = jobs
+    lex.seed = seed
+    load_or_compute_scorer(
+        lex,
+        ratio=ratio_pair(ratio),
+        initial_threshold=initial_threshold,
+        soundclass=soundclass,
+        seed=seed,
+        cache_dir=cache_dir,
+        cache_size=cache_size,
+        logger=logger,
+    )
+
+    new_cognatesets: t.List[t.Dict[str, t.Any]] = []
+    new_judgements: t.List[t.Dict[str, t.Any]] = []
+    concepts = lex.get_dict(col=language, flat=True)
+    for concept, indices in cli.tq(
+        concepts.items(), task="Assigning forms to cognate sets", total=len(concepts)
+    ):
+        # Only forms of other languages that are already judged are candidates
+        candidates: t.Dict[types.Cognateset_ID, t.List[int]] = {}
+        for other in lex.get_dict(row=concept, flat=True).values():
+            for idx in other:
+                if lex[idx, "doculect"] == language:
+                    continue
+                for cognateset in judgements.get(lex[idx, "form_id"], ()):
+                    candidates.setdefault(cognateset, []).append(idx)
+
+        for idx in indices:
+            form_id = lex[idx, "form_id"]
+            if form_id in judgements:
+                continue
+            distances = {
+                cognateset: sum(
+                    lex.align_pairs(
+                        idx,
+                        other,
+                        method="lexstat",
+                        mode=mode,
+                        gop=gop,
+                        pprint=False,
+                        return_distance=True,
+                    )
+                    for other in members
+                )
+                / len(members)
+                for cognateset, members in candidates.items()
+            }
+            closest = min(distances, key=distances.__getitem__, default=None)
+            if closest is not None and distances[closest] < threshold:
+                cognateset = closest
+                logger.debug(
+                    f"Form {form_id} added to cognate set {cognateset} "
+                    f"(distance {distances[closest]:.2f})."
+                )
+            else:
+                cognateset = f"{form_id}"
+                i = 1
+                while cognateset in cognateset_ids:
+                    i += 1
+                    cognateset = f"{form_id}_{i}"
+                cognateset_ids.add(cognateset)
+                new_cognatesets.append({c_cs_id: cognateset})
+            judgement_id = f"{form_id}-{cognateset}"
+            while judgement_id in judgement_ids:
+                judgement_id += "_"
+            judgement_ids.add(judgement_id)
+            form_segments = segments[form_id]
+            judgement = {
+                c_j_id: judgement_id,
+                c_j_form: form_id,
+                c_j_cogset: cognateset,
+            }
+            if dataset.column_names.cognates.segmentSlice:
+                judgement[dataset.column_names.cognates.segmentSlice] = [
+                    f"1:{len(form_segments)}"
+                ]
+            if dataset.column_names.cognates.alignment:
+                judgement[dataset.column_names.cognates.alignment] = form_segments
+            new_judgements.append(judgement)
+    return new_cognatesets, new_judgements
+
+
+if __name__ == "__main__":
+    parser = cli.parser(description=__doc__)
+    parser.add_argument(
+        "language",
+        help="ID of the language to cognate code",
+    )
+    add_lexstat_arguments(parser)
+    args = parser.parse_args()
+    logger = cli.setup_logging(args)
+    if args.jobs < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--jobs must be at least 1.")
+
+    new_cognatesets, new_judgements = cognate_code_language(
+        metadata=args.metadata,
+        language=args.language,
+        ratio=args.ratio,
+        soundclass=args.sound_class,
+        threshold=args.threshold,
+        initial_threshold=args.initial_threshold,
+        gop=args.gop,
+        mode=args.mode,
+        cache_dir=args.cache_dir,
+        cache_size=int(args.cache_size * 1024 * 1024),
+        jobs=args.jobs,
+        seed=args.seed,
+        logger=logger,
+    )
+    dataset = pycldf.Wordlist.from_metadata(args.metadata)
+    fs.write_table_atomically(
+        dataset,
+        "CognatesetTable",
+        itertools.chain(dataset["CognatesetTable"], new_cognatesets),
+    )
+    fs.write_table_atomically(
+        dataset,
+        "CognateTable",
+        itertools.chain(dataset["CognateTable"], new_judgements),
+    )
+    logger.info(
+        f"Added {len(new_judgements)} judgements, "
+        f"{len(new_cognatesets)} of them to new cognate sets."
+    )
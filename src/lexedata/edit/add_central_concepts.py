@@ -1,5 +1,6 @@
 import typing as t
 import collections
+import concurrent.futures
 
 from csvw.metadata import URITemplate
 import pycldf
@@ -13,6 +14,15 @@ FormID = str
 ConceptID = str
 CognatesetID = str
 
+# The CLICS graph used by the worker processes. It is set once per worker,
+# instead of being sent with every task.
+_worker_clics: t.Optional[networkx.Graph] = None
+
+
+def _set_worker_clics(clics: networkx.Graph) -> None:
+    global _worker_clics
+    _worker_clics = clics
+
 
 def load_concepts_by_form(
     dataset: pycldf.Dataset,
@@ -47,10 +57,57 @@ def concepts_to_concepticon(dataset: pycldf.Wordlist) -> t.Mapping[ConceptID, in
     return concept_to_concepticon
 
 
+def clics_nodes(
+    concepts: t.Iterable[ConceptID],
+    concepts_to_concepticon: t.Mapping[ConceptID, int],
+) -> t.FrozenSet[str]:
+    """Look up the CLICS nodes of these concepts.
+
+    >>> sorted(clics_nodes(["arm", "hand", "other"], {"arm": 1673, "hand": 1277}))
+    ['1277', '1673']
+
+    """
+    return frozenset(str(concepts_to_concepticon.get(c)) for c in concepts) - {"None"}
+
+
+def subgraph_centralities(
+    clics: networkx.Graph, nodes: t.FrozenSet[str], sample: t.Optional[int] = None
+) -> t.Dict[str, float]:
+    """Compute the betweenness centralities in the CLICS subgraph of these nodes.
+
+    If `sample` is given and the subgraph is larger, the centralities are
+    approximated using only `sample` pivot nodes (with a fixed seed, so the
+    results are reproducible).
+
+    >>> graph = networkx.Graph([("1", "2"), ("2", "3"), ("3", "4")])
+    >>> subgraph_centralities(graph, frozenset({"1", "2", "3"}))
+    {'1': 0.0, '2': 1.0, '3': 0.0}
+
+    """
+    # In the extreme case, there is one concept in CLICS and one concept
+    # without CLICS connection. Then there is no path, and the centralities
+    # are 0 – including `endpoints=True` in `betweenness_centrality` does
+    # not help with that, either.
+    subgraph = clics.subgraph(nodes)
+    if sample is not None and len(subgraph) > sample:
+        return networkx.algorithms.centrality.betweenness_centrality(
+            subgraph, k=sample, seed=0
+        )
+    return networkx.algorithms.centrality.betweenness_centrality(subgraph)
+
+
+def _subgraph_centralities(
+    task: t.Tuple[t.FrozenSet[str], t.Optional[int]]
+) -> t.Dict[str, float]:
+    nodes, sample = task
+    return subgraph_centralities(_worker_clics, nodes, sample)
+
+
 def central_concept(
     concepts: t.Counter[ConceptID],
     concepts_to_concepticon: t.Mapping[ConceptID, int],
     clics: t.Optional[networkx.Graph],
+    centralities: t.Optional[t.Mapping[str, float]] = None,
 ):
     """Find the most central concept among a weighted set.
 
@@ -79,19 +136,15 @@ def central_concept(
     centrality within the disjoint subgraphs is considered, so in this example,
     'hand' would be considered the most central concept.
 
+    The `centralities` of the CLICS nodes can be passed in if they are known
+    already, see `central_concepts`.
+
     """
-    centralities: t.Mapping[ConceptID, float]
-    if clics is None:
+    if centralities is None and clics is None:
         centralities = {}
-    else:
-        # In the extreme case, there is one concept in CLICS and one concept
-        # without CLICS connection. Then there is no path, and the centralities
-        # are 0 – including `endpoints=True` in `betweenness_centrality` does
-        # not help with that, either.
-        centralities = networkx.algorithms.centrality.betweenness_centrality(
-            clics.subgraph(
-                {str(concepts_to_concepticon.get(c)) for c in concepts} - {"None"}
-            )
+    elif centralities is None:
+        centralities = subgraph_centralities(
+            clics, clics_nodes(concepts, concepts_to_concepticon)
         )
 
     def effective_centrality(cc):
@@ -111,6 +164,69 @@ def central_concept(
     return concept
 
 
+def central_concepts(
+    concepts_of_cognateset: t.Mapping[CognatesetID, t.Counter[ConceptID]],
+    concepts_to_concepticon: t.Mapping[ConceptID, int],
+    clics: networkx.Graph,
+    jobs: int = 1,
+    sample: t.Optional[int] = None,
+) -> t.Dict[CognatesetID, ConceptID]:
+    """Find the central concept of every cognate set.
+
+    Many cognate sets are linked to the same concepts, so the centralities are
+    computed only once for each distinct set of CLICS nodes, in `jobs` worker
+    processes if more than one. Below three nodes, all centralities are 0, so
+    nothing needs to be computed. With `sample`, large subgraphs use the
+    approximation of `subgraph_centralities`.
+
+    >>> graph = networkx.Graph([("1", "2"), ("2", "3")])
+    >>> central_concepts(
+    ...   {"s1": collections.Counter(["a", "b", "c"]),
+    ...    "s2": collections.Counter(["a", "b", "b", "c"]),
+    ...    "s3": collections.Counter(["a", "a", "d"])},
+    ...   {"a": 1, "b": 2, "c": 3},
+    ...   graph)
+    {'s1': 'b', 's2': 'b', 's3': 'a'}
+
+    """
+    nodes_of_cognateset = {
+        cognateset: clics_nodes(concepts, concepts_to_concepticon)
+        for cognateset, concepts in concepts_of_cognateset.items()
+    }
+    distinct = list({nodes for nodes in nodes_of_cognateset.values() if len(nodes) > 2})
+    centralities: t.Dict[t.FrozenSet[str], t.Mapping[str, float]] = {}
+    if jobs > 1 and len(distinct) > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs, initializer=_set_worker_clics, initargs=(clics,)
+        ) as pool:
+            results = pool.map(
+                _subgraph_centralities,
+                [(nodes, sample) for nodes in distinct],
+                chunksize=max(1, len(distinct) // (4 * jobs)),
+            )
+            for nodes, result in cli.tq(
+                zip(distinct, results),
+                task="Compute centralities in CLICS",
+                total=len(distinct),
+            ):
+                centralities[nodes] = result
+    else:
+        for nodes in cli.tq(
+            distinct, task="Compute centralities in CLICS", total=len(distinct)
+        ):
+            centralities[nodes] = subgraph_centralities(clics, nodes, sample)
+
+    return {
+        cognateset: central_concept(
+            concepts,
+            concepts_to_concepticon,
+            clics,
+            centralities.get(nodes_of_cognateset[cognateset], {}),
+        )
+        for cognateset, concepts in concepts_of_cognateset.items()
+    }
+
+
 def reshape_dataset(
     dataset: pycldf.Wordlist, add_column: bool = True
 ) -> pycldf.Dataset:
@@ -182,6 +298,8 @@ def add_central_concepts_to_cognateset_table(
     overwrite_existing: bool = True,
     logger: cli.logging.Logger = cli.logger,
     status_update: t.Optional = None,
+    jobs: int = 1,
+    sample: t.Optional[int] = None,
 ) -> pycldf.Dataset:
     # create mapping cognateset to central concept
     try:
@@ -194,11 +312,13 @@ def add_central_concepts_to_cognateset_table(
     ] = connected_concepts(dataset)
     central: t.MutableMapping[str, str] = {}
     if clics and dataset.column_names.parameters.concepticonReference:
-        concept_to_concepticon = concepts_to_concepticon(dataset)
-        for cognateset, concepts in concepts_of_cognateset.items():
-            central[cognateset] = central_concept(
-                concepts, concept_to_concepticon, clics
-            )
+        central = central_concepts(
+            concepts_of_cognateset,
+            concepts_to_concepticon(dataset),
+            clics,
+            jobs=jobs,
+            sample=sample,
+        )
     else:
         logger.warning(
             f"Dataset {dataset:} had no concepticonReference in a ParamterTable."
@@ -257,8 +377,30 @@ if __name__ == "__main__":
         help="Text written to Status_Column. Set to 'None' for no status update. "
         "(default: automatic central concepts)",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Compute the centralities of distinct sets of concepts in N parallel"
+        " worker processes (default: 1)",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=None,
+        metavar="K",
+        help="Approximate the centralities in subgraphs of more than K CLICS"
+        " concepts using K sampled pivot concepts (default: Compute exact"
+        " centralities)",
+    )
     args = parser.parse_args()
     logger = cli.setup_logging(args)
+    if args.jobs < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--jobs must be at least 1.")
+    if args.sample is not None and args.sample < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--sample must be at least 1.")
     dataset = pycldf.Wordlist.from_metadata(args.metadata)
     if args.status_update == "None":
         args.status_update = None
@@ -269,4 +411,6 @@ if __name__ == "__main__":
         overwrite_existing=args.overwrite,
         logger=logger,
         status_update=args.status_update,
+        jobs=args.jobs,
+        sample=args.sample,
     )
@@ -1,21 +1,29 @@
 """ Add a CognateTable to the dataset.
 
-If the dataset has a CognateTable, do nothing.
+If the dataset has a CognateTable, only add a CognatesetTable if there is none.
 If the dataset has no cognatesetReference column anywhere, add an empty CognateTable.
 If the dataset has a cognatesetReference in the FormTable, extract that to a separate cognateTable, also transferring alignments if they exist.
 If the dataset has a cognatesetReference anywhere else, admit you don't know what is going on and die.
 """
 
+import typing as t
+
 import pycldf
 
-from lexedata.util import cache_table
 from lexedata import cli
 from lexedata import util
+from lexedata.util import fs
 
 
 def add_explicit_cognateset_table(
     dataset: pycldf.Wordlist, logger: cli.logging.Logger = cli.logger
 ) -> None:
+    """Add a CognatesetTable listing the cognate sets of the CognateTable.
+
+    This is for datasets that already have a CognateTable; `add_cognate_table`
+    collects the cognate sets while it creates the CognateTable.
+
+    """
     if "CognatesetTable" in dataset:
         return
     dataset.add_component("CognatesetTable")
@@ -30,20 +38,78 @@ def add_explicit_cognateset_table(
     dataset.write(CognatesetTable=[{"ID": id} for id in sorted(cognatesets)])
 
 
+def judgement_from_form(
+    dataset: pycldf.Wordlist,
+    form: t.Mapping[str, t.Any],
+    split: bool = True,
+    logger: cli.logging.Logger = cli.logger,
+) -> t.Optional[t.Dict[str, t.Any]]:
+    """Extract the cognate judgement from a form, if it has one.
+
+    The form is given by local CLDF properties (id, concept, form, and
+    possibly segments, segmentSlice, cognatesetReference, alignment).
+
+    """
+    if not form.get("cognatesetReference"):
+        return None
+    f = form["id"]
+    if split:
+        cogset = util.string_to_id(
+            "{:}-{:}".format(form["concept"], form["cognatesetReference"])
+        )
+    else:
+        cogset = form["cognatesetReference"]
+    judgement = {
+        "ID": f,
+        "Form_ID": f,
+        "Cognateset_ID": cogset,
+    }
+    try:
+        judgement["Segment_Slice"] = form["segmentSlice"]
+    except KeyError:
+        try:
+            if (
+                "+" in form["segments"]
+                and dataset["FormTable", "cognatesetReference"].separator
+            ):
+                logger.warning(
+                    "You seem to have morpheme annotations in your cognates. I will probably mess them up a bit, because I have not been taught properly how to deal with them. Sorry!"
+                )
+            judgement["Segment_Slice"] = ["1:{:d}".format(len(form["segments"]))]
+        except (KeyError, TypeError):
+            logger.warning(
+                f"No segments found for form {f} ({form['form']}). You can generate segments using `lexedata.edit.segment_using_clts`."
+            )
+    # What does an alignment mean without segments or their slices?
+    # Doesn't matter, if we were given one, we take it.
+    judgement["Alignment"] = form.get("alignment")
+    return judgement
+
+
 def add_cognate_table(
     dataset: pycldf.Wordlist,
     split: bool = True,
     logger: cli.logging.Logger = cli.logger,
+    cognateset_table: bool = False,
 ) -> None:
+    """Move the cognate judgements from the FormTable to a new CognateTable.
+
+    The FormTable is read once. While reading it, the CognateTable and the
+    FormTable without the cognateset column are written through temporary
+    files, and with `cognateset_table`, the distinct cognate set IDs are
+    collected for a new CognatesetTable (unless the dataset has one already).
+
+    """
     if "CognateTable" in dataset:
         return
     dataset.add_component("CognateTable")
+    cognateset_table = cognateset_table and "CognatesetTable" not in dataset
 
     # TODO: Check if that cognatesetReference is already a foreign key to
     # elsewhere (could be a CognatesetTable, could be whatever), because then
     # we need to transfer that knowledge.
 
-    # Load anything that's useful for a cognate set table: Form IDs, segments,
+    # Read anything that's useful for a cognate set table: Form IDs, segments,
     # segment slices, cognateset references, alignments
     columns = {
         "id": dataset["FormTable", "id"].name,
@@ -55,56 +121,33 @@ def add_cognate_table(
             columns[property] = dataset["FormTable", property].name
         except KeyError:
             pass
-    cognate_judgements = []
-    forms = cache_table(dataset, columns=columns)
-    for f, form in cli.tq(
-        forms.items(), task="Extracting cognate judgements from forms…"
-    ):
-        if form.get("cognatesetReference"):
-            if split:
-                cogset = util.string_to_id(
-                    "{:}-{:}".format(form["concept"], form["cognatesetReference"])
-                )
-            else:
-                cogset = form["cognatesetReference"]
-            judgement = {
-                "ID": f,
-                "Form_ID": f,
-                "Cognateset_ID": cogset,
-            }
-            try:
-                judgement["Segment_Slice"] = form["segmentSlice"]
-            except KeyError:
-                try:
-                    if (
-                        "+" in form["segments"]
-                        and dataset["FormTable", "cognatesetReference"].separator
-                    ):
-                        logger.warning(
-                            "You seem to have morpheme annotations in your cognates. I will probably mess them up a bit, because I have not been taught properly how to deal with them. Sorry!"
-                        )
-                    judgement["Segment_Slice"] = [
-                        "1:{:d}".format(len(form["segments"]))
-                    ]
-                except (KeyError, TypeError):
-                    logger.warning(
-                        f"No segments found for form {f} ({form['form']}). You can generate segments using `lexedata.edit.segment_using_clts`."
-                    )
-            # What does an alignment mean without segments or their slices?
-            # Doesn't matter, if we were given one, we take it.
-            judgement["Alignment"] = form.get("alignment")
-            cognate_judgements.append(judgement)
-
-    # Delete the cognateset column
-    try:
-        cols = dataset["FormTable"].tableSchema.columns
-        ix = cols.index(dataset["FormTable", "cognatesetReference"])
-        del cols[ix]
-        dataset.write(FormTable=list(dataset["FormTable"]))
-    except ValueError:
-        pass
-
-    dataset.write(CognateTable=cognate_judgements)
+    c_cognateset = columns.get("cognatesetReference")
+
+    cognatesets: t.Set[str] = set()
+    with fs.table_writer(
+        dataset, "FormTable", exclude={c_cognateset}
+    ) as write_form, fs.table_writer(dataset, "CognateTable") as write_judgement:
+        for row in cli.tq(
+            dataset["FormTable"],
+            task="Extracting cognate judgements from forms…",
+            total=dataset["FormTable"].common_props.get("dc:extent"),
+        ):
+            form = {property: row[column] for property, column in columns.items()}
+            judgement = judgement_from_form(dataset, form, split=split, logger=logger)
+            if judgement is not None:
+                write_judgement(judgement)
+                cognatesets.update(util.ensure_list(judgement["Cognateset_ID"]))
+            write_form(row)
+        # Delete the cognateset column
+        if c_cognateset is not None:
+            cols = dataset["FormTable"].tableSchema.columns
+            del cols[cols.index(dataset["FormTable", c_cognateset])]
+
+    if cognateset_table:
+        # Only now that the FormTable has no cognateset column any more, the
+        # new CognatesetTable gets the right foreign keys.
+        dataset.add_component("CognatesetTable")
+        dataset.write(CognatesetTable=[{"ID": id} for id in sorted(cognatesets)])
 
 
 if __name__ == "__main__":
@@ -129,5 +172,7 @@ if __name__ == "__main__":
         )
 
     dataset = pycldf.Wordlist.from_metadata(args.metadata)
-    add_cognate_table(dataset, split=split)
-    add_explicit_cognateset_table(dataset, logger)
+    if "CognateTable" in dataset:
+        add_explicit_cognateset_table(dataset, logger)
+    else:
+        add_cognate_table(dataset, split=split, logger=logger, cognateset_table=True)
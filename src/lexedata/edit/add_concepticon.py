@@ -1,4 +1,16 @@
+"""Guess Concepticon links for the concepts of a dataset.
+
+Mapping glosses to Concepticon is slow, so the Concepticon target list of
+each gloss language is loaded only once per process, and both the target
+lists and the mappings of individual glosses are cached on disk for the same
+version of the Concepticon catalog. Re-running on an extended concept list
+therefore only maps the new glosses.
+
+"""
+
 import collections
+import functools
+import concurrent.futures
 import typing as t
 
 from csvw.metadata import URITemplate
@@ -9,10 +21,108 @@ import cldfbench
 from pyconcepticon.glosses import concept_map2
 
 from lexedata.edit.add_status_column import add_status_column_to_table
+from lexedata.util import cache
 import lexedata.cli as cli
 
-concepticon_path = cldfcatalog.Config.from_file().get_clone("concepticon")
-concepticon = cldfbench.catalogs.Concepticon(concepticon_path)
+# A Concepticon ID and gloss
+Target = t.Tuple[str, str]
+# The best Concepticon targets of a gloss, and their similarity (lower is
+# better, 10 for no match)
+Match = t.Tuple[t.List[Target], int]
+
+
+@functools.lru_cache(maxsize=None)
+def get_concepticon() -> cldfbench.catalogs.Concepticon:
+    """Return the configured Concepticon catalog."""
+    return cldfbench.catalogs.Concepticon(
+        cldfcatalog.Config.from_file().get_clone("concepticon")
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def concepticon_version() -> t.Optional[str]:
+    return cache.catalog_version(get_concepticon())
+
+
+@functools.lru_cache(maxsize=None)
+def concepticon_targets(language: str) -> t.List[Target]:
+    """Return the Concepticon concept sets with their glosses in a language."""
+    version = concepticon_version()
+    if version is not None:
+        targets = cache.load_pickle(f"concepticon-map-{language}", version)
+        if targets is not None:
+            return targets
+    targets = [
+        (id, gloss)
+        for id, gloss, *_ in get_concepticon().api._get_map_for_language(language, None)
+    ]
+    if version is not None:
+        cache.store_pickle(f"concepticon-map-{language}", version, targets)
+    return targets
+
+
+def map_glosses(
+    glosses: t.Sequence[str], language: str, targets: t.Sequence[Target]
+) -> t.Dict[str, Match]:
+    """Find the best Concepticon targets for each gloss."""
+    cmap = concept_map2(
+        glosses,
+        [gloss for id, gloss in targets],
+        similarity_level=2,
+        language=language,
+    )
+    # What a horrendous API! Why can't it return glosses or IDs instead of, as
+    # it does now, target-indices so I have to schlepp target along with the
+    # results?
+    matches: t.Dict[str, Match] = {}
+    for i, gloss in enumerate(glosses):
+        indices, similarity = cmap.get(i, ([], 10))
+        matches[gloss] = ([targets[j] for j in indices], similarity)
+    return matches
+
+
+def _map_glosses(task: t.Tuple[t.Sequence[str], str]) -> t.Dict[str, Match]:
+    glosses, language = task
+    return map_glosses(glosses, language, concepticon_targets(language))
+
+
+def mapped_glosses(
+    glosses_by_language: t.Mapping[str, t.Iterable[str]],
+    jobs: int = 1,
+    logger: cli.logging.Logger = cli.logger,
+) -> t.Dict[str, t.Dict[str, Match]]:
+    """Map glosses in several languages to Concepticon.
+
+    Glosses mapped before for the same Concepticon version are taken from the
+    cache, the others are mapped in `jobs` worker processes, one language per
+    task, if more than one.
+
+    """
+    version = concepticon_version()
+    known: t.Dict[str, t.Dict[str, Match]] = {}
+    new: t.Dict[str, t.List[str]] = {}
+    for language, glosses in glosses_by_language.items():
+        known[language] = (
+            version is not None
+            and cache.load_pickle(f"concepticon-glosses-{language}", version)
+        ) or {}
+        new[language] = sorted(set(glosses) - set(known[language]))
+        logger.info(
+            f"{len(new[language])} new glosses to map to Concepticon for language {language}."
+        )
+    tasks = [(glosses, language) for language, glosses in new.items() if glosses]
+    if jobs > 1 and len(tasks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_map_glosses, tasks))
+    else:
+        results = [_map_glosses(task) for task in tasks]
+    for (glosses, language), result in zip(tasks, results):
+        known[language].update(result)
+        if version is not None:
+            cache.store_pickle(
+                f"concepticon-glosses-{language}", version, known[language]
+            )
+    return known
 
 
 def equal_separated(option: str) -> t.Tuple[str, str]:
@@ -37,9 +147,13 @@ def add_concepticon_names(
         task="Write concepts with concepticon names to dataset",
     ):
         try:
-            row[column_name] = concepticon.api.conceptsets[
-                row[dataset.column_names.parameters.concepticonReference]
-            ].gloss
+            row[column_name] = (
+                get_concepticon()
+                .api.conceptsets[
+                    row[dataset.column_names.parameters.concepticonReference]
+                ]
+                .gloss
+            )
         except KeyError:
             pass
 
@@ -53,6 +167,8 @@ def add_concepticon_references(
     gloss_languages: t.Mapping[str, str],
     status_update: t.Optional[str],
     overwrite: bool = False,
+    jobs: int = 1,
+    logger: cli.logging.Logger = cli.logger,
 ) -> None:
     """Guess Concepticon links for a multilingual Concept table.
 
@@ -69,49 +185,37 @@ def add_concepticon_references(
         es, zh, pt)
     status_update: String written to Status_Column of #parameterTable if provided
     overwrite: Overwrite existing Concepticon references
+    jobs: Map the glosses of different languages in this many parallel
+        worker processes
 
     """
     # TODO: If this function took only dataset["ParameterTable"] and the name
     # of the target column in there as arguments, one could construct examples
     # that just use the Iterable API and therefore look nice as doctests.
-    gloss_lists: t.Dict[str, t.List[str]] = {column: [] for column in gloss_languages}
-
-    for row in dataset["ParameterTable"]:
-        for column, glosses in gloss_lists.items():
-            glosses.append(row[column] or "?")  # Concepticon abhors empty glosses.
-
-    targets = {
-        language: concepticon.api._get_map_for_language(language, None)
-        for language in gloss_languages.values()
+    glosses_by_language: t.Dict[str, t.Set[str]] = {
+        language: set() for language in gloss_languages.values()
     }
+    for row in dataset["ParameterTable"]:
+        for column, language in gloss_languages.items():
+            # Concepticon abhors empty glosses.
+            glosses_by_language[language].add(row[column] or "?")
 
-    cmaps: t.List[t.Dict[int, t.Tuple[t.List[int], int]]] = [
-        (
-            concept_map2(
-                glosses,
-                [i[1] for i in targets[gloss_languages[column]]],
-                similarity_level=2,
-                language=gloss_languages[column],
-            ),
-            # What a horrendous API! Why can't it return glosses or IDs instead
-            # of, as it does now, target-indices so I have to schlepp target along
-            # with the results?
-            targets[gloss_languages[column]],
-        )
-        for column, glosses in gloss_lists.items()
-    ]
+    mapped = mapped_glosses(glosses_by_language, jobs=jobs, logger=logger)
 
     write_back = []
-    for i, row in cli.tq(
-        enumerate(dataset["ParameterTable"]),
+    for row in cli.tq(
+        dataset["ParameterTable"],
         task="Write concepts with concepticon reference to dataset",
     ):
         if overwrite or not row.get(
             dataset.column_names.parameters.concepticonReference
         ):
-            matches = [(m.get(i, ([], 10)), t) for m, t in cmaps]
-            best_sim = min(x[0][1] for x in matches)
-            best_matches = [t[m] for (ms, s), t in matches for m in ms if s <= best_sim]
+            matches = [
+                mapped[language][row[column] or "?"]
+                for column, language in gloss_languages.items()
+            ]
+            best_sim = min(s for _, s in matches)
+            best_matches = [m for ms, s in matches for m in ms if s <= best_sim]
             c: t.Counter[str] = collections.Counter(id for id, string in best_matches)
             if len(c) > 1:
                 print(row, best_sim, c.most_common())
@@ -162,9 +266,9 @@ def add_concepticon_definitions(
         task="Write concepts with concepticon definitions to dataset",
     ):
         try:
-            row[column_name] = concepticon.api.conceptsets[
-                row[concepticon_ids]
-            ].definition
+            row[column_name] = (
+                get_concepticon().api.conceptsets[row[concepticon_ids]].definition
+            )
         except KeyError:
             pass
         write_back.append(row)
@@ -179,6 +283,7 @@ def create_concepticon_for_concepts(
     concepticon_definition: bool,
     overwrite: bool,
     status_update: t.Optional[str],
+    jobs: int = 1,
 ):
     # add Status_Column if status update
     if status_update:
@@ -202,6 +307,7 @@ def create_concepticon_for_concepts(
         gloss_languages=gloss_languages,
         status_update=status_update,
         overwrite=overwrite,
+        jobs=jobs,
     )
 
     if concepticon_glosses:
@@ -246,7 +352,18 @@ if __name__ == "__main__":
         help="Text written to Status_Column. Set to 'None' for no status update. "
         "(default: automatic Concepticon link)",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Map the glosses of different gloss languages in N parallel worker"
+        " processes (default: 1)",
+    )
     args = parser.parse_args()
+    if args.jobs < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--jobs must be at least 1.")
     if args.status_update == "None":
         args.status_update = None
 
@@ -257,4 +374,5 @@ if __name__ == "__main__":
         concepticon_definition=args.add_definitions,
         overwrite=args.overwrite,
         status_update=args.status_update,
+        jobs=args.jobs,
     )
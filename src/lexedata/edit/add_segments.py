@@ -12,8 +12,15 @@
     pre-aspirated or pre-nasalized consonants showing up as post-aspirated
     resp. post-nasalized vowels, which BIPA does not accept).)"""
 
+import re
+import csv
+import json
+import itertools
+import contextlib
 import typing as t
-from collections import defaultdict
+import concurrent.futures
+from pathlib import Path
+from collections import defaultdict, Counter
 from tabulate import tabulate
 
 from csvw.metadata import URITemplate
@@ -21,18 +28,33 @@ from csvw.metadata import URITemplate
 import pycldf
 import pyclts
 import segments
-import cldfbench
-import cldfcatalog
 import attr
 
 import lexedata.cli as cli
-
-clts_path = cldfcatalog.Config.from_file().get_clone("clts")
-clts = cldfbench.catalogs.CLTS(clts_path)
-bipa = clts.api.bipa
+from lexedata.util import fs
+from lexedata.util.clts import clts_version, get_bipa
 
 tokenizer = segments.Tokenizer()
 
+# Number of rows per job to process between two rounds of parallel segmentation
+CHUNK_SIZE = 1000
+
+T = t.TypeVar("T")
+
+
+def chunks(iterable: t.Iterable[T], size: int) -> t.Iterator[t.List[T]]:
+    """Split an iterable into lists of a given size.
+
+    >>> list(chunks(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 @attr.s(auto_attribs=True)
 class ReportEntry:
@@ -52,6 +74,12 @@ class SegmentReport:
             res.append((name, k, v.count, v.comment))
         return res
 
+    def update(self, other: "SegmentReport") -> None:
+        """Add the counts of another report to this one."""
+        for sound, entry in other.sounds.items():
+            self.sounds[sound].count += entry.count
+            self.sounds[sound].comment = entry.comment
+
 
 def cleanup(form: str) -> str:
     """
@@ -89,10 +117,76 @@ pre_replace = {
 }
 
 
+class PreReplacer:
+    """Apply a table of replacements to a string in a single scan.
+
+    All patterns are compiled into one alternation, longest patterns first, so
+    at each position the longest matching pattern is replaced. Calling the
+    replacer returns the replaced string and how often each pattern was hit.
+
+    >>> replacer = PreReplacer({"ts͡": "t͡s", "s": "z", "Ɂ": "ʔ"})
+    >>> replacer("ts͡aɁas")
+    ('t͡saʔaz', Counter({'ts͡': 1, 'Ɂ': 1, 's': 1}))
+    >>> PreReplacer({})("ts")
+    ('ts', Counter())
+    """
+
+    def __init__(self, replacements: t.Mapping[str, str]) -> None:
+        self.replacements = {
+            wrong: right for wrong, right in replacements.items() if wrong
+        }
+        patterns = sorted(self.replacements, key=len, reverse=True)
+        self.regex = re.compile("|".join(re.escape(p) for p in patterns))
+        self._restricted: t.Dict[t.FrozenSet[str], "PreReplacer"] = {}
+
+    def restricted(self, patterns: t.Iterable[str]) -> "PreReplacer":
+        """Return a replacer applying only some of the replacements.
+
+        >>> replacer = PreReplacer({"ts͡": "t͡s", "s": "z"})
+        >>> replacer.restricted(["ts͡"])("ts͡as")
+        ('t͡sas', Counter({'ts͡': 1}))
+        """
+        patterns = frozenset(patterns)
+        try:
+            return self._restricted[patterns]
+        except KeyError:
+            replacer = PreReplacer({p: self.replacements[p] for p in patterns})
+            self._restricted[patterns] = replacer
+            return replacer
+
+    def __call__(self, form: str) -> t.Tuple[str, t.Counter[str]]:
+        hits: t.Counter[str] = Counter()
+        if not self.replacements:
+            return form, hits
+
+        def replace(match: t.Match[str]) -> str:
+            hits[match.group()] += 1
+            return self.replacements[match.group()]
+
+        return self.regex.sub(replace, form), hits
+
+    @classmethod
+    def from_file(cls, path: Path) -> "PreReplacer":
+        """Load a replacement table from a file.
+
+        The file is a tab-separated file with two columns, the string to be
+        replaced and its replacement. Empty lines and lines starting with '#'
+        are ignored.
+        """
+        replacements = {}
+        with path.open(encoding="utf-8", newline="") as table:
+            for line in csv.reader(table, delimiter="\t"):
+                if not line or line[0].startswith("#"):
+                    continue
+                wrong, right = line
+                replacements[wrong] = right
+        return cls(replacements)
+
+
 def segment_form(
     formstring: str,
     report: SegmentReport,
-    system=bipa,
+    system: t.Optional[pyclts.TranscriptionSystem] = None,
     split_diphthongs: bool = True,
     context_for_warnings: str = "",
     logger: cli.logging.Logger = cli.logger,
@@ -119,6 +213,9 @@ def segment_form(
     [<pyclts.models.Consonant: voiceless bilabial stop consonant>, <pyclts.models.Vowel: unrounded open front vowel>, <pyclts.models.Consonant: devoiced voiced alveolar nasal consonant>, <pyclts.models.Vowel: rounded close-mid back vowel>, <pyclts.models.Consonant: voiced alveolar nasal consonant>, <pyclts.models.Vowel: rounded close-mid back vowel>, <pyclts.models.Vowel: rounded close-mid back ... vowel>, <pyclts.models.Consonant: voiceless alveolar sibilant affricate consonant>, <pyclts.models.Vowel: unrounded close front ... vowel>, <pyclts.models.Consonant: voiceless velar stop consonant>, <pyclts.models.Vowel: long rounded close-mid back vowel>, <pyclts.models.Consonant: voiceless glottal stop consonant>, <pyclts.models.Vowel: rounded close back ... vowel>]
 
     """
+    bipa = get_bipa()
+    if system is None:
+        system = bipa
     # and with the syllable boundary marker '.', so we wrap it with special cases for those.
     raw_tokens = [
         system[s]
@@ -210,13 +307,195 @@ def segment_form(
     return raw_tokens
 
 
+class WarningCollector:
+    """Stand-in for a logger that keeps warnings for later replay."""
+
+    def __init__(self) -> None:
+        self.messages: t.List[str] = []
+
+    def warning(self, message: str) -> None:
+        self.messages.append(message)
+
+
+@attr.s(auto_attribs=True)
+class SegmentedForm:
+    segments: t.List[str]
+    report: SegmentReport = attr.ib(factory=SegmentReport)
+    warnings: t.List[str] = attr.ib(factory=list)
+
+
+def segment_form_for_cache(formstring: str, **kwargs) -> SegmentedForm:
+    """Segment a form, keeping its report and warnings separate.
+
+    The result contains everything needed to replay this segmentation for
+    another occurrence of the same formstring.
+    """
+    report = SegmentReport()
+    collector = WarningCollector()
+    segments = segment_form(formstring, report=report, logger=collector, **kwargs)
+    return SegmentedForm(
+        segments=[str(s) for s in segments],
+        report=report,
+        warnings=collector.messages,
+    )
+
+
+def segment_forms_for_cache(formstrings: t.Sequence[str]) -> t.List[SegmentedForm]:
+    """Segment a batch of forms, as a unit of work for a worker process."""
+    return [segment_form_for_cache(formstring) for formstring in formstrings]
+
+
+def segmentation_version() -> t.Optional[str]:
+    """Describe the versions of the data the segmentation depends on.
+
+    These are the CLTS catalog, providing BIPA, and the `segments` package,
+    providing the tokenizer. If the CLTS catalog has no reliable version,
+    return None.
+    """
+    version = clts_version()
+    if version is None:
+        return None
+    return f"clts {version}; segments {segments.__version__}"
+
+
+class SegmentCache:
+    """A content-addressed cache of segmentations.
+
+    The cache maps (pre-replaced) form strings to their segments, together
+    with the report entries and warnings that segmenting them produced, so
+    that reports stay exact when a result is served from the cache. If a path
+    is given, the cache is loaded from that JSON file and can be saved back
+    there, to be re-used between runs.
+
+    The file records the `version` of the segmentation (by default, see
+    `segmentation_version`), and a file with a different version is ignored,
+    so that updating CLTS or `segments` does not replay stale segmentations.
+    Without a reliable version, the file is neither loaded nor saved.
+
+    """
+
+    def __init__(
+        self, path: t.Optional[Path] = None, version: t.Optional[str] = None
+    ) -> None:
+        self.path = path
+        self.version = version
+        self.entries: t.Dict[str, SegmentedForm] = {}
+        if path is None:
+            return
+        if self.version is None:
+            self.version = segmentation_version()
+        if self.version is None:
+            cli.logger.warning(
+                "The CLTS catalog has no reliable version, so the segment cache "
+                f"{path} is not used."
+            )
+            return
+        if not path.exists():
+            return
+        with path.open(encoding="utf-8") as cachefile:
+            content = json.load(cachefile)
+        if content.get("version") != self.version:
+            cli.logger.info(
+                f"The segment cache {path} was made with different versions of "
+                "CLTS or segments and is discarded."
+            )
+            return
+        for form, (segmented, report, warnings) in content["segmentations"].items():
+            entry = SegmentedForm(segments=segmented, warnings=warnings)
+            for sound, count, comment in report:
+                entry.report.sounds[sound] = ReportEntry(count, comment)
+            self.entries[form] = entry
+
+    def segment(
+        self,
+        formstring: str,
+        report: SegmentReport,
+        context_for_warnings: str = "",
+        logger: cli.logging.Logger = cli.logger,
+    ) -> t.List[str]:
+        """Segment the form, or look up its segmentation in the cache.
+
+        In either case, update the report and log the warnings as if
+        `segment_form` had been called.
+        """
+        try:
+            entry = self.entries[formstring]
+        except KeyError:
+            entry = segment_form_for_cache(formstring)
+            self.entries[formstring] = entry
+        report.update(entry.report)
+        for message in entry.warnings:
+            logger.warning(f"{context_for_warnings}{message}")
+        return entry.segments
+
+    def fill(
+        self,
+        formstrings: t.Iterable[str],
+        pool: concurrent.futures.Executor,
+        jobs: int,
+    ) -> None:
+        """Segment all uncached formstrings in parallel and cache the results."""
+        missing = list(dict.fromkeys(f for f in formstrings if f not in self.entries))
+        if not missing:
+            return
+        batches = [missing[i::jobs] for i in range(jobs)]
+        for batch, results in zip(batches, pool.map(segment_forms_for_cache, batches)):
+            self.entries.update(zip(batch, results))
+
+    def save(self) -> None:
+        if self.path is None or self.version is None:
+            return
+        with self.path.open("w", encoding="utf-8") as cachefile:
+            json.dump(
+                {
+                    "version": self.version,
+                    "segmentations": {
+                        form: [
+                            entry.segments,
+                            [
+                                (sound, e.count, e.comment)
+                                for sound, e in entry.report.sounds.items()
+                            ],
+                            entry.warnings,
+                        ]
+                        for form, entry in self.entries.items()
+                    },
+                },
+                cachefile,
+                ensure_ascii=False,
+            )
+
+
 def add_segments_to_dataset(
     dataset: pycldf.Dataset,
     transcription: str,
     overwrite_existing: bool,
     replace_form: bool,
     logger: cli.logging.Logger = cli.logger,
+    cache: t.Optional[SegmentCache] = None,
+    jobs: int = 1,
+    replacer: t.Optional[PreReplacer] = None,
 ):
+    """Add segments to the FormTable, segmenting the transcription column.
+
+    The FormTable is read once and streamed back through a temporary file, so
+    apart from the segment cache, memory use does not grow with the size of
+    the table. Per-language reports are created as languages are encountered.
+
+    With jobs > 1, the rows are processed in chunks, and the transcriptions in
+    each chunk that are not in the cache yet are segmented in a pool of that
+    many worker processes. The reports and warnings of the workers are
+    collected in the cache and replayed in this process, in the order of the
+    rows, so the output does not depend on the number of jobs.
+
+    Before segmentation, the replacements of `replacer` (by default, the
+    `pre_replace` table) are applied to the transcription.
+
+    """
+    if cache is None:
+        cache = SegmentCache()
+    if replacer is None:
+        replacer = PreReplacer(pre_replace)
     if dataset.column_names.forms.segments is None:
         # Create a Segments column in FormTable
         dataset.add_columns("FormTable", "Segments")
@@ -225,44 +504,61 @@ def add_segments_to_dataset(
         c.propertyUrl = URITemplate("http://cldf.clld.org/v1.0/terms.rdf#segments")
         dataset.write_metadata()
 
-    write_back = []
     c_f_segments = dataset["FormTable", "segments"].name
     c_f_id = dataset["FormTable", "id"].name
     c_f_lan = dataset["FormTable", "languageReference"].name
     c_f_form = dataset["FormTable", "form"].name
-    # report = t.Dict[str, t.Dict[str, t.Dict[str, str]]] = {}
-    report = {f[c_f_lan]: SegmentReport() for f in dataset["FormTable"]}
-    for r, row in cli.tq(
-        enumerate(dataset["FormTable"], 1),
-        task="Writing forms with segments to dataset",
-        total=dataset["FormTable"].common_props.get("dc:extent"),
-    ):
-        if row[c_f_segments] and not overwrite_existing:
-            write_back.append(row)
-            continue
-        else:
-            if row[transcription] is None or row[transcription] == "-":
-                row[dataset.column_names.forms.segments] = ""
-            elif row[transcription]:
-                form = row[transcription].strip()
-                for wrong, right in pre_replace.items():
-                    if wrong in form:
-                        report[row[c_f_lan]].sounds[wrong]["count"] += form.count(wrong)
-                        report[row[c_f_lan]].sounds[wrong][
-                            "comment"
-                        ] = f"'{wrong}' replaced by '{right}' – run with `--replace-form` to apply this also to the forms."
-                        form = form.replace(wrong, right)
-                        # also replace symbol in #FormTable *form
-                        if replace_form:
-                            row[c_f_form] = row[c_f_form].replace(wrong, right)
-                row[dataset.column_names.forms.segments] = segment_form(
-                    form,
-                    report=report[row[c_f_lan]],
-                    context_for_warnings=f"In form {row[c_f_id]} (line {r}): ",
-                    logger=logger,
+    report: t.Dict[str, SegmentReport] = {}
+
+    def segmented_rows() -> t.Iterator[t.Dict[str, t.Any]]:
+        rows = cli.tq(
+            enumerate(dataset["FormTable"], 1),
+            task="Writing forms with segments to dataset",
+            total=dataset["FormTable"].common_props.get("dc:extent"),
+        )
+        with contextlib.ExitStack() as stack:
+            pool = None
+            if jobs > 1:
+                pool = stack.enter_context(
+                    concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
                 )
-            write_back.append(row)
-    dataset.write(FormTable=write_back)
+            for chunk in chunks(rows, CHUNK_SIZE * jobs):
+                to_segment: t.List[
+                    t.Tuple[int, t.Dict[str, t.Any], str, SegmentReport]
+                ] = []
+                for r, row in chunk:
+                    language_report = report.setdefault(row[c_f_lan], SegmentReport())
+                    if row[c_f_segments] and not overwrite_existing:
+                        continue
+                    elif row[transcription] is None or row[transcription] == "-":
+                        row[c_f_segments] = ""
+                    elif row[transcription]:
+                        form, hits = replacer(row[transcription].strip())
+                        for wrong, count in hits.items():
+                            right = replacer.replacements[wrong]
+                            language_report.sounds[wrong].count += count
+                            language_report.sounds[
+                                wrong
+                            ].comment = f"'{wrong}' replaced by '{right}' – run with `--replace-form` to apply this also to the forms."
+                        # also replace symbols in #FormTable *form, but only
+                        # those that were replaced in the transcription
+                        if hits and replace_form:
+                            row[c_f_form] = replacer.restricted(hits)(row[c_f_form])[0]
+                        to_segment.append((r, row, form, language_report))
+                if pool is not None:
+                    cache.fill([form for _, _, form, _ in to_segment], pool, jobs)
+                for r, row, form, language_report in to_segment:
+                    row[c_f_segments] = cache.segment(
+                        form,
+                        report=language_report,
+                        context_for_warnings=f"In form {row[c_f_id]} (line {r}): ",
+                        logger=logger,
+                    )
+                for r, row in chunk:
+                    yield row
+
+    fs.write_table_atomically(dataset, "FormTable", segmented_rows())
+    cache.save()
     return report
 
 
@@ -287,8 +583,39 @@ if __name__ == "__main__":
         default=False,
         help="Apply the replacements performed on segments also to #form column of #FormTable",
     )
+    parser.add_argument(
+        "--segment-cache",
+        type=Path,
+        default=None,
+        metavar="CACHE_FILE",
+        help="Load segmentations of transcriptions from CACHE_FILE, if it exists, "
+        "and store the segmentations of this run there, "
+        "so that repeated runs only segment new transcriptions. "
+        "The cache is discarded when CLTS or segments were updated since. "
+        "(default: Only cache segmentations in memory)",
+    )
+    parser.add_argument(
+        "--replacement-table",
+        type=Path,
+        default=None,
+        metavar="TSV_FILE",
+        help="Load the replacements to apply to transcriptions before segmentation "
+        "from TSV_FILE, a tab-separated file with the string to replace in the first "
+        "and its replacement in the second column, "
+        "instead of using lexedata's default replacements",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Segment transcriptions in N parallel worker processes (default: 1)",
+    )
     args = parser.parse_args()
     logger = cli.setup_logging(args)
+    if args.jobs < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--jobs must be at least 1.")
 
     dataset = pycldf.Wordlist.from_metadata(args.metadata)
 
@@ -301,6 +628,13 @@ if __name__ == "__main__":
         args.overwrite,
         args.replace_form,
         logger=logger,
+        cache=SegmentCache(args.segment_cache),
+        jobs=args.jobs,
+        replacer=(
+            None
+            if args.replacement_table is None
+            else PreReplacer.from_file(args.replacement_table)
+        ),
     )
     data = []
     for lan, segment_report in report.items():
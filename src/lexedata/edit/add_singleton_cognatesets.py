@@ -9,8 +9,9 @@ import typing as t
 
 import pycldf
 
-from lexedata import types
 from lexedata import cli
+from lexedata.util import fs
+from lexedata.util.references import referring_column
 
 # Type aliases, for clarity
 CognatesetID = str
@@ -18,7 +19,15 @@ FormID = str
 ConceptID = str
 
 
-def create_singeltons(dataset: pycldf.Dataset, logger: cli.logger = cli.logger):
+def singleton_rows(
+    dataset: pycldf.Dataset, logger: cli.logging.Logger = cli.logger
+) -> t.Tuple[t.List[t.Dict[str, t.Any]], t.List[t.Dict[str, t.Any]]]:
+    """Create singleton cognate sets for all forms without cognate judgements.
+
+    Return only the new cognate sets and the new judgements, to be appended to
+    the existing tables. The CognateTable and the FormTable are each read once.
+
+    """
     # cldf names and foreignkeys
     c_f_id = dataset["FormTable", "id"].name
     c_f_form = dataset["FormTable", "form"].name
@@ -37,82 +46,96 @@ def create_singeltons(dataset: pycldf.Dataset, logger: cli.logger = cli.logger):
             "add a Status Column."
         )
 
-    foreign_key_form_concept = ""
-    for foreign_key in dataset["FormTable"].tableSchema.foreignKeys:
-        if foreign_key.reference.resource == dataset["ParameterTable"].url:
-            foreign_key_form_concept = foreign_key.columnReference[0]
-
-    foreign_key_form_language = ""
-    for foreign_key in dataset["FormTable"].tableSchema.foreignKeys:
-        if foreign_key.reference.resource == dataset["LanguageTable"].url:
-            foreign_key_form_language = foreign_key.columnReference[0]
-
-    foreign_key_cognate_form = ""
-    for foreign_key in dataset["CognateTable"].tableSchema.foreignKeys:
-        if foreign_key.reference.resource == dataset["FormTable"].url:
-            foreign_key_cognate_form = foreign_key.columnReference[0]
-
-    foreign_key_cognate_cogset = ""
-    for foreign_key in dataset["CognateTable"].tableSchema.foreignKeys:
-        if foreign_key.reference.resource == dataset["CognatesetTable"].url:
-            foreign_key_cognate_cogset = foreign_key.columnReference[0]
-
-    # load data
-    singleton_forms: t.Dict[FormID, types.Form] = {}
-    for f in dataset["FormTable"]:
-        singleton_forms[f[c_f_id]] = f
-
-    all_judgements: t.Dict[CognatesetID, t.List[types.CogSet]] = {}
-    for j in dataset["CognateTable"]:
-        all_judgements.setdefault(j[foreign_key_cognate_cogset], []).append(j)
-
-    all_cogsets = [c for c in dataset["CognatesetTable"]]
-
-    concept_id_by_form_id: t.Dict[ConceptID, FormID] = {}
-    for f in dataset["FormTable"]:
-        concept = f[foreign_key_form_concept]
-        if isinstance(concept, str):
-            concept_id_by_form_id[f[c_f_id]] = concept
-        else:
-            concept_id_by_form_id[f[c_f_id]] = concept[0]
-
-    # delete forms with cognateset
-    for k in all_judgements:
-        for j in all_judgements[k]:
-            form_id = j[foreign_key_cognate_form]
-            try:
-                del singleton_forms[form_id]
-            except KeyError:
-                continue
-    del all_judgements
-    judgements = [c for c in dataset["CognateTable"]]
-
-    # create singletons for remaining forms and add singleton to cogsets
-    for i, form_id in enumerate(singleton_forms):
-        if singleton_forms[form_id][c_f_form] is None:
+    foreign_key_form_concept = (
+        referring_column(dataset, "ParameterTable", from_table="FormTable") or ""
+    )
+    foreign_key_form_language = (
+        referring_column(dataset, "LanguageTable", from_table="FormTable") or ""
+    )
+    foreign_key_cognate_form = (
+        referring_column(dataset, "FormTable", from_table="CognateTable") or ""
+    )
+    foreign_key_cognate_cogset = (
+        referring_column(dataset, "CognatesetTable", from_table="CognateTable") or ""
+    )
+
+    # Only the IDs of the forms that already have judgements are needed
+    judged: t.Set[FormID] = {
+        judgement[foreign_key_cognate_form]
+        for judgement in cli.tq(
+            dataset["CognateTable"],
+            task="Find forms with cognate judgements",
+            total=dataset["CognateTable"].common_props.get("dc:extent"),
+        )
+    }
+
+    # create singletons for remaining forms
+    new_cogsets: t.List[t.Dict[str, t.Any]] = []
+    new_judgements: t.List[t.Dict[str, t.Any]] = []
+    i = 0
+    for form in cli.tq(
+        dataset["FormTable"],
+        task="Create singleton cognate sets",
+        total=dataset["FormTable"].common_props.get("dc:extent"),
+    ):
+        if form[c_f_id] in judged:
             continue
+        i += 1
+        if form[c_f_form] is None:
+            continue
+        concept = form[foreign_key_form_concept]
         cogset = {
-            c_cs_id: f"X{i + 1}_{singleton_forms[form_id][foreign_key_form_language]}",
-            c_cs_name: concept_id_by_form_id[form_id],
+            c_cs_id: f"X{i}_{form[foreign_key_form_language]}",
+            c_cs_name: concept if isinstance(concept, str) else concept[0],
         }
         if status_column:
             cogset[status_column] = "automatic singleton"
-        all_cogsets.append(cogset)
+        new_cogsets.append(cogset)
 
         cognate = {
             c_c_id: f"{cogset[c_cs_id]}",
-            foreign_key_cognate_form: form_id,
+            foreign_key_cognate_form: form[c_f_id],
             foreign_key_cognate_cogset: cogset[c_cs_id],
         }
-        judgements.append(cognate)
+        new_judgements.append(cognate)
+    return new_cogsets, new_judgements
+
+
+def create_singeltons(
+    dataset: pycldf.Dataset, logger: cli.logging.Logger = cli.logger
+) -> t.Tuple[t.List[t.Dict[str, t.Any]], t.List[t.Dict[str, t.Any]]]:
+    """Create singleton cognate sets for all forms without cognate judgements.
+
+    Return all cognate sets and all judgements, the existing ones followed by
+    the new ones. To only add the new ones to the dataset, use
+    `add_singletons`, which does not rewrite the existing rows.
+
+    """
+    new_cogsets, new_judgements = singleton_rows(dataset=dataset, logger=logger)
+    all_cogsets = list(dataset["CognatesetTable"]) + new_cogsets
+    judgements = list(dataset["CognateTable"]) + new_judgements
     return all_cogsets, judgements
 
 
+def add_singletons(
+    dataset: pycldf.Dataset, logger: cli.logging.Logger = cli.logger
+) -> None:
+    """Append singleton cognate sets for unjudged forms to the dataset.
+
+    The cognate sets and judgements are appended together: if either fails,
+    neither table is changed.
+    """
+    new_cogsets, new_judgements = singleton_rows(dataset=dataset, logger=logger)
+    with fs.rollback_on_failure(dataset, ["CognatesetTable", "CognateTable"]):
+        fs.append_rows(dataset, "CognatesetTable", new_cogsets)
+        fs.append_rows(dataset, "CognateTable", new_judgements)
+    logger.info(f"Added {len(new_cogsets)} singleton cognate sets.")
+
+
 if __name__ == "__main__":
     parser = cli.parser(description="Create an Excel cognate view from a CLDF dataset")
     args = parser.parse_args()
     logger = cli.setup_logging(args)
     logger.info("Creating Singleton Cognatesets.")
     dataset = pycldf.Dataset.from_metadata(args.metadata)
-    all_cogsets, judgements = create_singeltons(dataset=dataset, logger=logger)
-    dataset.write(CognatesetTable=all_cogsets, CognateTable=judgements)
+    add_singletons(dataset=dataset, logger=logger)
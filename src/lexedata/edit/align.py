@@ -1,33 +1,146 @@
 """Automatically align morphemes within each cognateset
 
-If possible, align using existing lexstat scorer.
+The morphemes of each cognate set are aligned using LingPy's progressive
+multiple alignment with the scorer of a sound class model. The alignment
+distances of each pair of morphemes are computed only once per run.
+
+LexStat scorers cached by `lexedata.edit.detect_cognates` are not used here:
+they score language-specific sound classes of a LexStat wordlist built with
+the cognate detection parameters, which the alignment of a cognate table does
+not know.
 
 """
 
+import functools
 import typing as t
+import concurrent.futures
+
 import pycldf
+import lingpy
 
 from lexedata.edit.add_status_column import add_status_column_to_table
 from lexedata import cli
 
 
-def align(forms):
-    """‘Align’ forms by adding gap characters to the end.
+@functools.lru_cache(maxsize=2 ** 16)
+def _pair_distance(
+    a: t.Tuple[str, ...],
+    b: t.Tuple[str, ...],
+    model: str,
+    gop: float,
+    scale: float,
+    factor: float,
+    restricted_chars: str,
+) -> float:
+    """Compute the alignment distance of two morphemes, as Multiple does.
 
-    TODO: This is DUMB. Write a function that does this more sensibly, using
-    LexStat scorers where available.
+    The same morphemes turn up in many cognate sets, so the distances are
+    memoised per pair of morphemes.
 
+    >>> round(_pair_distance(("t", "a"), ("t", "a", "k"), "sca", -2, 0.5, 0.3, "T_"), 3)
+    0.288
     """
-    length = 0
-    for (language, segments), metadata in forms:
-        length = max(len(segments), length)
+    pair = lingpy.Multiple([list(a), list(b)])
+    pair.prog_align(
+        model=model,
+        gop=gop,
+        scale=scale,
+        factor=factor,
+        restricted_chars=restricted_chars,
+    )
+    if pair.height < 2:
+        # Both morphemes have the same sound classes
+        return 0.0
+    return pair.matrix[0][1]
+
+
+class _MemoisedMultiple(lingpy.Multiple):
+    """A progressive multiple alignment with memoised pairwise distances.
+
+    Progressive alignment only needs the distance matrix of the pairwise
+    alignments to construct its guide tree, so that matrix is filled from
+    `_pair_distance` instead of aligning every pair of sequences again.
+    """
+
+    def _get_pairwise_alignments(
+        self,
+        mode="global",
+        gop=-2,
+        scale=0.5,
+        factor=0.3,
+        restricted_chars="T_",
+        **keywords,
+    ):
+        sequences = [tuple(self.tokens[self.int2ext[i][0]]) for i in range(self.height)]
+        self.matrix = [[0.0] * self.height for _ in range(self.height)]
+        for i in range(self.height):
+            for j in range(i + 1, self.height):
+                self.matrix[i][j] = self.matrix[j][i] = _pair_distance(
+                    sequences[i],
+                    sequences[j],
+                    self.model.name,
+                    gop,
+                    scale,
+                    factor,
+                    restricted_chars,
+                )
+
+
+def _align_morphemes(
+    morphemes: t.Tuple[t.Tuple[str, ...], ...], model: str
+) -> t.Tuple[t.Tuple[str, ...], ...]:
+    """Progressively align some distinct, non-empty morphemes.
+
+    >>> _align_morphemes((("t", "a", "k", "a"), ("t", "a", "k")), "sca")
+    (('t', 'a', 'k', 'a'), ('t', 'a', 'k', '-'))
+    """
+    msa = _MemoisedMultiple([list(morpheme) for morpheme in morphemes])
+    msa.prog_align(model=model)
+    return tuple(tuple(row) for row in msa.alm_matrix)
+
+
+def align(forms, model: str = "sca"):
+    """Align forms with a progressive multiple alignment.
+
+    Identical morphemes are aligned only once, and get the same alignment.
+    Empty morphemes are aligned as all gaps.
+
+    >>> for alignment, id in align([
+    ...         (("l1", ["t", "a", "k", "a"]), "j1"),
+    ...         (("l2", ["t", "a", "k"]), "j2"),
+    ...         (("l3", ["t", "a", "k", "a"]), "j3"),
+    ...         (("l4", []), "j4")]):
+    ...     print(id, " ".join(alignment))
+    j1 t a k a
+    j2 t a k -
+    j3 t a k a
+    j4 - - - -
+
+    """
+    distinct = sorted({tuple(segments) for (_, segments), _ in forms if segments})
+    if distinct:
+        aligned = dict(zip(distinct, _align_morphemes(tuple(distinct), model)))
+    else:
+        aligned = {}
+    length = max((len(alignment) for alignment in aligned.values()), default=0)
 
     for (language, segments), metadata in forms:
-        yield segments + ["-"] * (length - len(segments)), metadata
+        yield list(aligned.get(tuple(segments), ["-"] * length)), metadata
+
+
+def _align_cognatesets(
+    task: t.Tuple[t.List[t.List[t.Tuple[t.Tuple[str, t.List[str]], str]]], str]
+) -> t.List[t.List[t.Tuple[t.List[str], str]]]:
+    """Align each of a batch of cognate sets, in a worker process."""
+    cognatesets, model = task
+    return [list(align(morphemes, model)) for morphemes in cognatesets]
 
 
 def aligne_cognate_table(
-    dataset: pycldf.Dataset, status_update: t.Optional[str] = None
+    dataset: pycldf.Dataset,
+    status_update: t.Optional[str] = None,
+    model: str = "sca",
+    jobs: int = 1,
 ):
     f_id = dataset["FormTable", "id"].name
     f_segments = dataset["FormTable", "segments"].name
@@ -37,7 +150,11 @@ def aligne_cognate_table(
         add_status_column_to_table(dataset=dataset, table_name="CognateTable")
 
     forms = {}
-    for form in cli.tq(dataset["FormTable"]):
+    for form in cli.tq(
+        dataset["FormTable"],
+        task="Reading the forms",
+        total=dataset["FormTable"].common_props.get("dc:extent"),
+    ):
         forms[form[f_id]] = form
 
     c_id = dataset["CognateTable", "id"].name
@@ -51,7 +168,7 @@ def aligne_cognate_table(
     judgements: t.Dict[str, t.Dict[str, t.Any]] = {}
     for judgement in cli.tq(
         dataset["CognateTable"],
-        task="Aligning the cognate segments",
+        task="Collecting the cognate segments",
         total=dataset["CognateTable"].common_props.get("dc:extent"),
     ):
         judgements[judgement[c_id]] = judgement
@@ -59,7 +176,7 @@ def aligne_cognate_table(
         morpheme = []
         if not judgement[c_slice]:
             morpheme = form[f_segments]
-        for s in judgement[c_slice]:
+        for s in judgement[c_slice] or []:
             if ":" in s:
                 i_, j_ = s.split(":")
                 i, j = int(i_), int(j_)
@@ -71,11 +188,27 @@ def aligne_cognate_table(
             ((form[f_language], morpheme), judgement[c_id])
         )
 
-    for cognateset, morphemes in cognatesets.items():
-        for alignment, id in align(morphemes):
-            judgements[id][c_alignment] = alignment
-            if status_update:
-                judgement["Status_Column"] = status_update
+    # Align the cognate sets in batches, so that each task sent to a worker
+    # process is big enough to be worth it.
+    batches = list(cognatesets.values())
+    batches = [batches[i : i + 100] for i in range(0, len(batches), 100)]
+    tasks = [(batch, model) for batch in batches]
+
+    def aligned_batches():
+        if jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+                yield from pool.map(_align_cognatesets, tasks)
+        else:
+            yield from map(_align_cognatesets, tasks)
+
+    for aligned_batch in cli.tq(
+        aligned_batches(), task="Aligning the cognate sets", total=len(tasks)
+    ):
+        for aligned in aligned_batch:
+            for alignment, id in aligned:
+                judgements[id][c_alignment] = alignment
+                if status_update:
+                    judgements[id]["Status_Column"] = status_update
     dataset["CognateTable"].write(judgements.values())
 
 
@@ -89,9 +222,28 @@ if __name__ == "__main__":
         help="Text written to Status_Column. Set to 'None' for no status update. "
         "(default: Morphemes aligned)",
     )
+    parser.add_argument(
+        "--sound-class",
+        default="sca",
+        choices=["sca", "dolgo", "asjp", "art"],
+        help="Sound class model to use for the alignment (default: sca)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Align the cognate sets in N parallel worker processes (default: 1)",
+    )
     args = parser.parse_args()
     if args.status_update == "None":
         args.status_update = None
+    if args.jobs < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--jobs must be at least 1.")
     aligne_cognate_table(
-        pycldf.Wordlist.from_metadata(args.metadata), args.status_update
+        pycldf.Wordlist.from_metadata(args.metadata),
+        args.status_update,
+        model=args.sound_class,
+        jobs=args.jobs,
     )
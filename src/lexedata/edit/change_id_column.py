@@ -3,63 +3,7 @@ import typing as t
 
 from lexedata.edit.add_status_column import add_status_column_to_table
 import lexedata.cli as cli
-
-# TODO: use lexedata.edit.clean_ids.update_ids
-
-
-def substitute_many(
-    row, columns, old_values_to_new_values, status_update: t.Optional[str]
-):
-    for column in columns:
-        if type(row[column]) == list:
-            row[column] = [
-                old_values_to_new_values.get(val, val) for val in row[column]
-            ]
-            if status_update:
-                row["Status_Column"] = status_update
-        elif type(row[column]) == str:
-            row[column] = old_values_to_new_values.get(row[column], row[column])
-            if status_update:
-                row["Status_Column"] = status_update
-    return row
-
-
-def rename(
-    ds,
-    old_values_to_new_values,
-    logger: cli.logging.Logger,
-    status_update: t.Optional[str],
-):
-    concepts = ds["ParameterTable"]
-
-    for table in ds.tables:
-        if table == concepts:
-            continue
-        _, component = table.common_props["dc:conformsTo"].split("#")
-        try:
-            c_concept = ds[component, "parameterReference"]
-            columns = {c_concept.name}
-        except KeyError:
-            columns = set()
-        for reference in table.tableSchema.foreignKeys:
-            if reference.reference.resource.string == concepts.url.string:
-                (column,) = reference.columnReference
-                columns.add(column)
-        if columns:
-            logger.info(f"Changing columns {columns:} in {component:}…")
-            ds.write(
-                **{
-                    component: [
-                        substitute_many(
-                            r,
-                            columns,
-                            old_values_to_new_values,
-                            status_update=status_update,
-                        )
-                        for r in table
-                    ]
-                }
-            )
+from lexedata.util.rewrite_ids import rewrite_ids
 
 
 def replace_column(
@@ -88,21 +32,12 @@ def replace_column(
         assert smush or len(mapping) == len(
             set(mapping.values())
         ), "Would collapse some concepts that were distinct before! Add '--smush' if that is intended."
-        # dataset["ParameterTable"].tableSchema.columns["c_id"]
-        rename(dataset, mapping, logger, status_update=status_update)
     else:
-        concepts = dataset["ParameterTable"]
-
-        c_id = dataset["ParameterTable", "id"].name
-
-        logger.info(f"Changing {c_id:} of ParameterTable…")
-        dataset.write(
-            ParameterTable=[
-                substitute_many(r, [c_id], {original: replacement}, status_update=None)
-                for r in concepts
-            ]
-        )
-        rename(dataset, {original: replacement}, logger, status_update=status_update)
+        mapping = {original: replacement}
+    logger.info("Changing IDs of the ParameterTable and all references to them…")
+    rewrite_ids(
+        dataset, {"ParameterTable": mapping}, status_update=status_update, logger=logger
+    )
 
 
 if __name__ == "__main__":
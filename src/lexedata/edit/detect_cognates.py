@@ -1,32 +1,547 @@
 """Similarity code tentative cognates in a word list and align them"""
 
-import csv
+import os
+import random
 import hashlib
 import typing as t
+import concurrent.futures
+from collections import defaultdict
 from pathlib import Path
 
 import pycldf
 import pyclts
 import segments
-import cldfbench
-import cldfcatalog
 
 import lingpy
 import lingpy.compare.partial
+from lingpy.settings import rcParams
+from lingpy.algorithm import calign
 
 import lexedata.cli as cli
 import lexedata.types as types
+from lexedata.util import cache, fs
+from lexedata.util.clts import get_bipa
 
+tokenizer = segments.Tokenizer()
 
-clts_path = cldfcatalog.Config.from_file().get_clone("clts")
-clts = cldfbench.catalogs.CLTS(clts_path)
-bipa = clts.api.bipa
 
-tokenizer = segments.Tokenizer()
+# The scorer used by the worker processes computing random correspondences. It
+# is set once per worker, instead of being sent with every task.
+_worker_scorer = None
+
+
+def _set_worker_scorer(scorer) -> None:
+    global _worker_scorer
+    _worker_scorer = scorer
+
+
+def _random_correspondences(
+    task: t.Tuple[t.List, t.List, t.List, t.List, float, str]
+) -> t.List[t.Tuple[t.Dict[t.Tuple[str, str], float], int]]:
+    """Count sound correspondences in one batch of random word pairs.
+
+    Return the correspondence counts and the number of included pairs for
+    each alignment mode.
+    """
+    numbers, gops, prostrings, modes, factor, restricted_chars = task
+    results = []
+    for mode, gop, scale in modes:
+        corrs, included = calign.corrdist(
+            10.0,
+            numbers,
+            gops,
+            prostrings,
+            gop,
+            scale,
+            factor,
+            _worker_scorer,
+            mode,
+            restricted_chars,
+        )
+        results.append((dict(corrs), included))
+    return results
+
+
+# The wordlist used by the worker processes computing the distance matrices of
+# concepts. It is rebuilt once per worker from its plain data, because LingPy
+# wordlists themselves cannot be pickled.
+_worker_lexstat = None
+
+
+def _set_worker_lexstat(data: t.Dict[int, t.List], scorer) -> None:
+    global _worker_lexstat
+    _worker_lexstat = ParallelPartial(data)
+    if scorer is not None:
+        _worker_lexstat.cscorer = scorer
+
+
+def _concept_matrices(
+    task: t.Tuple[bool, t.List[str], t.Dict[str, t.Any]]
+) -> t.List[t.Tuple[str, t.Any, t.List[t.List[float]]]]:
+    """Compute the distance matrices of a group of concepts.
+
+    Return the concept, the indices (or, for partial cognates, the morpheme
+    trace) and the matrix of each concept, like LingPy's matrix iterators.
+    """
+    partial, concepts, keywords = task
+    # This is the worker's own copy, so restricting it to the concepts of
+    # this task is harmless.
+    _worker_lexstat.rows = concepts
+    if partial:
+        return list(_worker_lexstat._get_partial_matrices(**keywords))
+    else:
+        return list(_worker_lexstat._get_matrices(**keywords))
+
+
+def _align_concepts(
+    task: t.Tuple[t.Dict[int, t.List], str, bool, t.Dict[str, t.Any]]
+) -> t.Dict[t.Any, t.Dict[str, t.Any]]:
+    """Align the cognate sets of a wordlist containing a group of concepts.
+
+    Return the alignment results of each cognate set.
+    """
+    data, ref, fuzzy, keywords = task
+    alm = lingpy.Alignments(data, ref=ref, fuzzy=fuzzy)
+    alm.align(**keywords)
+    return {
+        key: {
+            field: value
+            for field, value in msa.items()
+            if field
+            in {"alignment", "_sonority_consensus", "stamp", "parameters", "swaps"}
+        }
+        for key, msa in alm._meta["msa"][ref].items()
+    }
+
+
+def _plain_row(row: t.List[t.Any]) -> t.List[t.Any]:
+    """Convert LingPy's list types in a wordlist row to plain lists.
+
+    Some of LingPy's list types cannot be pickled, so this is necessary to
+    send the data of a wordlist to a worker process.
+
+    """
+    return [list(value) if isinstance(value, list) else value for value in row]
+
+
+_MATRIX_KEYWORDS = {
+    "method",
+    "scale",
+    "factor",
+    "restricted_chars",
+    "mode",
+    "gop",
+    "restriction",
+    "imap_mode",
+    "split_on_tones",
+}
+
+
+def _concept_groups(concepts: t.Sequence[str], jobs: int) -> t.List[t.List[str]]:
+    """Split the concepts into a few groups per job.
+
+    >>> _concept_groups(["a", "b", "c", "d", "e"], 1)
+    [['a', 'b'], ['c', 'd'], ['e']]
+    >>> _concept_groups(["a"], 4)
+    [['a']]
+    """
+    size = -(-len(concepts) // (4 * jobs)) or 1
+    return [list(concepts[i : i + size]) for i in range(0, len(concepts), size)]
+
+
+def _strip_language_index(char: str) -> str:
+    """Remove the language index prefix from a LexStat character.
+
+    >>> _strip_language_index("12.K.C")
+    'K.C'
+    """
+    return char.split(".", 1)[1]
+
+
+class ParallelPartial(lingpy.compare.partial.Partial):
+    """A LingPy Partial with parallel and incremental LexStat scorers.
+
+    LexStat derives its scorer from the attested and a random distribution of
+    sound correspondences for each pair of languages. The random distribution
+    is computed by aligning `runs` random pairs of words. With `jobs` > 1, the
+    random word pairs of each language pair are split into batches, which are
+    aligned in a pool of worker processes, and the counts of the batches are
+    added up again.
+
+    If a `seed` is set, the random word pairs are drawn from a random number
+    generator seeded with the seed and the language pair, so the scorer does
+    not depend on the number of jobs or the order of computation.
+
+    If a `pair_cache_dir` is set, the distributions of each language pair are
+    stored there, keyed by the forms of the two languages and the scorer
+    parameters, and only the distributions of language pairs not found there
+    are computed. This makes adding a language to a dataset cheap.
+
+    Once the scorer exists, the concepts are independent of each other. With
+    `jobs` > 1, the distance matrices for clustering are computed for groups
+    of concepts in worker processes, and clustered in the main process in the
+    original order of concepts, so the cognate set IDs stay globally unique
+    and the same as in a serial run.
+
+    Without any of these options, LingPy's own implementation is used.
+
+    """
+
+    jobs: int = 1
+    seed: t.Optional[str] = None
+    pair_cache_dir: t.Optional[Path] = None
+
+    def _pair_cache_key(self, tA: str, tB: str, kw: t.Mapping[str, t.Any]) -> str:
+        parameters = {
+            key: kw.get(key)
+            for key in [
+                "modes",
+                "factor",
+                "restricted_chars",
+                "threshold",
+                "runs",
+                "method",
+            ]
+        }
+        digest = hashlib.sha1()
+        digest.update(
+            "{:}\t{:}\t{:}\t{!r}\t{!r}".format(
+                lingpy.__version__, self.model.name, self.seed, parameters, (tA, tB)
+            ).encode("utf-8")
+        )
+        for idxA, idxB in self.pairs[tA, tB]:
+            digest.update(
+                "\n{:}\t{:}".format(
+                    " ".join(self[idxA, "tokens"]), " ".join(self[idxB, "tokens"])
+                ).encode("utf-8")
+            )
+        return digest.hexdigest()[:20]
+
+    def _get_corrdist(self, **keywords):
+        kw = dict(
+            factor=rcParams["align_factor"],
+            modes=rcParams["lexstat_modes"],
+            preprocessing=False,
+            restricted_chars=rcParams["restricted_chars"],
+            threshold=rcParams["lexstat_scoring_threshold"],
+            runs=rcParams["lexstat_runs"],
+            method=rcParams["lexstat_scoring_method"],
+            subset=False,
+        )
+        kw.update(keywords)
+        self._cached_randist: t.Dict[t.Tuple[str, str], t.Any] = {}
+        self._pair_cache_keys: t.Dict[t.Tuple[str, str], str] = {}
+        if self.pair_cache_dir is None or kw["preprocessing"] or kw["subset"]:
+            return super()._get_corrdist(**keywords)
+
+        self._included = {}
+        corrdist = {}
+        for (i, tA), (j, tB) in lingpy.util.multicombinations2(enumerate(self.cols)):
+            key = self._pair_cache_key(tA, tB, kw)
+            cached = cache.load_pickle("lexstat-pair", key, self.pair_cache_dir)
+            if cached is not None:
+                attested, self._included[tA, tB], random_dist = cached
+                corrdist[tA, tB] = defaultdict(
+                    float,
+                    {
+                        (f"{i + 1}.{a}", f"{j + 1}.{b}"): d
+                        for (a, b), d in attested.items()
+                    },
+                )
+                self._cached_randist[tA, tB] = defaultdict(
+                    float,
+                    {
+                        (f"{i + 1}.{a}", f"{j + 1}.{b}"): d
+                        for (a, b), d in random_dist.items()
+                    },
+                )
+                continue
+            self._pair_cache_keys[tA, tB] = key
+            corrdist[tA, tB] = defaultdict(float)
+            for mode, gop, scale in kw["modes"]:
+                pairs = self.pairs[tA, tB]
+                corrs, self._included[tA, tB] = calign.corrdist(
+                    kw["threshold"],
+                    [self[pair, self._numbers] for pair in pairs],
+                    [self[pair, self._weights] for pair in pairs],
+                    [self[pair, self._prostrings] for pair in pairs],
+                    gop,
+                    scale,
+                    kw["factor"],
+                    self.bscorer,
+                    mode,
+                    kw["restricted_chars"],
+                )
+                for (a, b), d in corrs.items():
+                    if a == "-":
+                        a = lingpy.util.charstring(i + 1)
+                    elif b == "-":
+                        b = lingpy.util.charstring(j + 1)
+                    corrdist[tA, tB][a, b] += d / float(len(kw["modes"]))
+        if self._cached_randist:
+            cli.logger.info(
+                f"Reusing cached correspondences for {len(self._cached_randist)} "
+                f"language pairs, computing {len(self._pair_cache_keys)} new ones."
+            )
+        return corrdist
+
+    def _get_randist(self, **keywords):
+        kw = dict(
+            modes=rcParams["lexstat_modes"],
+            factor=rcParams["align_factor"],
+            restricted_chars=rcParams["restricted_chars"],
+            runs=rcParams["lexstat_runs"],
+            method=rcParams["lexstat_scoring_method"],
+        )
+        kw.update(keywords)
+        if (self.jobs == 1 and self.seed is None and self.pair_cache_dir is None) or kw[
+            "method"
+        ] in ["markov", "markov-chain", "mc"]:
+            return super()._get_randist(**keywords)
+
+        cached = getattr(self, "_cached_randist", {})
+        language_pairs = [
+            ((i, tA), (j, tB))
+            for (i, tA), (j, tB) in lingpy.util.multicombinations2(enumerate(self.cols))
+            if (tA, tB) not in cached
+        ]
+        corrdist = dict(cached)
+        if not language_pairs:
+            return corrdist
+
+        batches_per_pair = -(-4 * self.jobs // len(language_pairs))
+        tasks = []
+        task_pairs = []
+        for (i, tA), (j, tB) in language_pairs:
+            numbers = [self[pair, self._numbers] for pair in self.pairs[tA, tB]]
+            gops = [self[pair, self._weights] for pair in self.pairs[tA, tB]]
+            prostrings = [self[pair, self._prostrings] for pair in self.pairs[tA, tB]]
+            sample = [(x, y) for x in range(len(numbers)) for y in range(len(numbers))]
+            if len(sample) > kw["runs"]:
+                rng = random.Random(
+                    None if self.seed is None else f"{self.seed}/{tA}/{tB}"
+                )
+                sample = rng.sample(sample, kw["runs"])
+            for b in range(min(batches_per_pair, len(sample)) or 1):
+                batch = sample[b::batches_per_pair]
+                tasks.append(
+                    (
+                        [(numbers[x][0], numbers[y][1]) for x, y in batch],
+                        [(gops[x][0], gops[y][1]) for x, y in batch],
+                        [(prostrings[x][0], prostrings[y][1]) for x, y in batch],
+                        kw["modes"],
+                        kw["factor"],
+                        kw["restricted_chars"],
+                    )
+                )
+                task_pairs.append(((i, tA), (j, tB)))
+
+        if self.jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.jobs,
+                initializer=_set_worker_scorer,
+                initargs=(self.bscorer,),
+            ) as pool:
+                results = list(pool.map(_random_correspondences, tasks))
+        else:
+            _set_worker_scorer(self.bscorer)
+            results = [_random_correspondences(task) for task in tasks]
+
+        # Add up the counts of all batches, for each language pair and mode
+        counts: t.Dict[
+            t.Tuple[t.Tuple[int, str], t.Tuple[int, str]],
+            t.List[t.Tuple[t.DefaultDict[t.Tuple[str, str], float], int]],
+        ] = {}
+        for pair, result in zip(task_pairs, results):
+            merged = counts.setdefault(
+                pair, [(defaultdict(float), 0) for _ in kw["modes"]]
+            )
+            for m, (corrs, included) in enumerate(result):
+                for k, v in corrs.items():
+                    merged[m][0][k] += v
+                merged[m] = (merged[m][0], merged[m][1] + included)
+
+        for ((i, tA), (j, tB)), merged in counts.items():
+            corrdist[tA, tB] = defaultdict(float)
+            for corrs, included in merged:
+                for (a, b), count in corrs.items():
+                    d = count * self._included[tA, tB] / included
+                    if a == "-":
+                        a = lingpy.util.charstring(i + 1)
+                    elif b == "-":
+                        b = lingpy.util.charstring(j + 1)
+                    corrdist[tA, tB][a, b] += d / len(kw["modes"])
+
+            key = getattr(self, "_pair_cache_keys", {}).get((tA, tB))
+            if key is not None:
+                cache.store_pickle(
+                    "lexstat-pair",
+                    key,
+                    (
+                        {
+                            (_strip_language_index(a), _strip_language_index(b)): d
+                            for (a, b), d in self._corrdist[tA, tB].items()
+                        },
+                        self._included[tA, tB],
+                        {
+                            (_strip_language_index(a), _strip_language_index(b)): d
+                            for (a, b), d in corrdist[tA, tB].items()
+                        },
+                    ),
+                    self.pair_cache_dir,
+                )
+        return corrdist
+
+    def _concept_parallel_matrices(self, partial: bool, keywords: t.Dict[str, t.Any]):
+        # The clustering methods pass all their options on, some of which are
+        # functions that cannot be sent to the workers, so only keep those
+        # the matrices depend on.
+        keywords = {
+            key: value for key, value in keywords.items() if key in _MATRIX_KEYWORDS
+        }
+        concepts = sorted(self.rows)
+        data = {0: self.columns}
+        for idx in self:
+            data[idx] = _plain_row(self[idx])
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_set_worker_lexstat,
+            initargs=(data, getattr(self, "cscorer", None)),
+        ) as pool:
+            tasks = [
+                (partial, group, keywords)
+                for group in _concept_groups(concepts, self.jobs)
+            ]
+            for matrices in pool.map(_concept_matrices, tasks):
+                yield from matrices
+
+    def _get_matrices(self, concept=False, **keywords):
+        if concept or self.jobs == 1 or keywords.get("external_scorer"):
+            return super()._get_matrices(concept=concept, **keywords)
+        return self._concept_parallel_matrices(False, keywords)
+
+    def _get_partial_matrices(self, concept=False, **keywords):
+        if concept or self.jobs == 1 or keywords.get("external_scorer"):
+            return super()._get_partial_matrices(concept=concept, **keywords)
+        return self._concept_parallel_matrices(True, keywords)
+
+
+class ParallelAlignments(lingpy.Alignments):
+    """LingPy Alignments that can align groups of concepts in parallel.
+
+    Cognate sets never span several concepts, so with `jobs` > 1 the cognate
+    sets of groups of concepts are aligned in worker processes, and the
+    results are collected in this object.
+
+    """
+
+    jobs: int = 1
+
+    def align(self, **keywords):
+        if self.jobs == 1:
+            return super().align(**keywords)
+        ref = keywords.get("ref") or self._ref
+        tasks = []
+        for group in _concept_groups(sorted(self.rows), self.jobs):
+            data = {0: self.columns}
+            for concept in group:
+                for idx in self.get_list(row=concept, flat=True):
+                    data[idx] = _plain_row(self[idx])
+            tasks.append((data, ref, self._mode == "fuzzy", keywords))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            for results in pool.map(_align_concepts, tasks):
+                for key, msa in results.items():
+                    self._meta["msa"][ref][key].update(msa)
+        self._msa2col(ref=ref, alignment=keywords.get("alignment") or self._alignment)
+
+
+def scorer_cache_key(lex: lingpy.compare.lexstat.LexStat, **parameters) -> str:
+    """Compute a key for the LexStat scorer of this data with these parameters.
+
+    The key is a hash of the tokenized forms of each language and concept and
+    of all parameters that influence the scorer computation, so it changes
+    whenever the scorer would have to be recomputed.
+    """
+    digest = hashlib.sha1()
+    digest.update(lingpy.__version__.encode("utf-8"))
+    for key, value in sorted(parameters.items()):
+        digest.update(f"\t{key}={value!r}".encode("utf-8"))
+    for idx in sorted(lex):
+        digest.update(
+            "\n{:}\t{:}\t{:}".format(
+                lex[idx, "doculect"], lex[idx, "concept"], " ".join(lex[idx, "tokens"])
+            ).encode("utf-8")
+        )
+    return digest.hexdigest()[:20]
+
+
+def ratio_pair(ratio: float) -> t.Tuple[float, float]:
+    """Turn a LexStat ratio into the pair of weights LingPy expects.
+
+    >>> ratio_pair(1.5)
+    (1.5, 1)
+    >>> ratio_pair(float("inf"))
+    (1, 0)
+    """
+    if ratio == float("inf"):
+        return (1, 0)
+    elif ratio >= 0:
+        return (ratio, 1)
+    else:
+        raise ValueError("LexStat ratio must be in [0, ∞]")
+
 
+def load_or_compute_scorer(
+    lex: lingpy.compare.lexstat.LexStat,
+    ratio: t.Tuple[float, float],
+    initial_threshold: float,
+    soundclass: str,
+    runs: int = 10000,
+    seed: t.Optional[str] = None,
+    cache_dir: t.Optional[Path] = None,
+    cache_size: t.Optional[int] = None,
+    logger: cli.logging.Logger = cli.logger,
+) -> None:
+    """Equip lex with a LexStat scorer, from the cache if possible.
 
-def sha1(path):
-    return hashlib.sha1(str(path).encode("utf-8")).hexdigest()[:12]
+    Scorers are stored in the cache directory (see `lexedata.util.cache`),
+    under a name derived from the tokenized forms and the scorer parameters.
+    If there is no cached scorer, the correspondence distributions of each
+    language pair are also cached there, so that a scorer for a dataset with a
+    new language only needs to compute the pairs involving that language.
+    After storing a new scorer, the least recently used scorers and
+    distributions are removed until they take at most cache_size bytes.
+    """
+    directory = cache.cache_directory(cache_dir)
+    key = scorer_cache_key(
+        lex,
+        ratio=ratio,
+        initial_threshold=initial_threshold,
+        soundclass=soundclass,
+        runs=runs,
+        seed=seed,
+    )
+    cache_file = directory / f"lexstats-{key}.tsv"
+    try:
+        scorers_etc = lingpy.compare.lexstat.LexStat(filename=str(cache_file))
+        lex.scorer = scorers_etc.scorer
+        lex.cscorer = scorers_etc.cscorer
+        lex.bscorer = scorers_etc.bscorer
+        os.utime(cache_file)
+        logger.info(f"Loaded LexStat scorer from {cache_file}.")
+        return
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    if isinstance(lex, ParallelPartial):
+        lex.pair_cache_dir = directory
+    lex.get_scorer(runs=runs, ratio=ratio, threshold=initial_threshold)
+    # LingPy adds the extension itself. Write to a temporary file first, so
+    # that an interrupted run does not leave a truncated scorer behind.
+    temporary = directory / f"lexstats-{key}.{os.getpid()}.partial"
+    lex.output("tsv", filename=str(temporary), ignore=[])
+    os.replace(str(temporary) + ".tsv", cache_file)
+    if cache_size is not None:
+        cache.evict(directory, "lexstat*", cache_size)
 
 
 def clean_segments(segment_string: t.List[str]) -> t.Iterable[pyclts.models.Symbol]:
@@ -42,6 +557,7 @@ def clean_segments(segment_string: t.List[str]) -> t.Iterable[pyclts.models.Symb
     ['t', 'a', '+', 'a', 't']
 
     """
+    bipa = get_bipa()
     segments = [bipa[x] for x in segment_string]
     segments.insert(0, bipa["#"])
     segments.append(bipa["#"])
@@ -86,57 +602,43 @@ def cognate_code_to_file(
     initial_threshold: float,
     gop: float,
     mode: str,
-    output_file: Path,
+    output_file: t.Optional[Path] = None,
+    cache_dir: t.Optional[Path] = None,
+    cache_size: t.Optional[int] = None,
+    jobs: int = 1,
+    seed: t.Optional[str] = None,
 ) -> None:
     dataset = pycldf.Wordlist.from_metadata(metadata)
     assert (
         dataset.column_names.forms.segments is not None
     ), "Dataset must have a CLDF #segments column."
 
-    lex = lingpy.compare.partial.Partial.from_cldf(
+    c_f_id = dataset["FormTable", "id"].name
+    lexstat_filter = filter_function_factory(dataset)
+
+    def filter(row: t.Dict[str, t.Any]) -> bool:
+        row["form_id"] = row[c_f_id.lower()]
+        return lexstat_filter(row)
+
+    lex = ParallelPartial.from_cldf(
         metadata,
-        filter=filter_function_factory(dataset),
-        columns=["doculect", "concept", "tokens"],
+        filter=filter,
+        columns=["doculect", "concept", "tokens", "form_id"],
         model=lingpy.data.model.Model(soundclass),
         check=True,
     )
+    lex.jobs = jobs
+    lex.seed = seed
 
-    if ratio != 1.5:
-        if ratio == float("inf"):
-            ratio_pair = (1, 0)
-            ratio_str = "-inf"
-        if ratio == int(ratio) >= 0:
-            r = int(ratio)
-            ratio_pair = (r, 1)
-            ratio_str = "-{:d}".format(r)
-        elif ratio > 0:
-            ratio_pair = (ratio, 1)
-            ratio_str = "-" + str(ratio)
-        else:
-            raise ValueError("LexStat ratio must be in [0, ∞]")
-    else:
-        ratio_pair = (3, 2)
-        ratio_str = ""
-    if initial_threshold != 0.7:
-        ratio_str += "-t{:02d}".format(int(initial_threshold * 100))
-    try:
-        scorers_etc = lingpy.compare.lexstat.LexStat(
-            filename="lexstats-{:}-{:s}{:s}.tsv".format(
-                sha1(metadata), soundclass, ratio_str
-            )
-        )
-        lex.scorer = scorers_etc.scorer
-        lex.cscorer = scorers_etc.cscorer
-        lex.bscorer = scorers_etc.bscorer
-    except (OSError, ValueError):
-        lex.get_scorer(runs=10000, ratio=ratio_pair, threshold=initial_threshold)
-        lex.output(
-            "tsv",
-            filename="lexstats-{:}-{:s}{:s}".format(
-                sha1(metadata), soundclass, ratio_str
-            ),
-            ignore=[],
-        )
+    load_or_compute_scorer(
+        lex,
+        ratio=ratio_pair(ratio),
+        initial_threshold=initial_threshold,
+        soundclass=soundclass,
+        seed=seed,
+        cache_dir=cache_dir,
+        cache_size=cache_size,
+    )
     # For some purposes it is useful to have monolithic cognate classes.
     lex.cluster(
         method="lexstat",
@@ -159,10 +661,13 @@ def cognate_code_to_file(
         gop=gop,
         mode=mode,
     )
-    lex.output("tsv", filename="auto-clusters")
-    alm = lingpy.Alignments(lex, ref="partialcognateids", fuzzy=True)
+    if output_file is not None:
+        lex.output("tsv", filename=str(output_file.parent / "auto-clusters"))
+    alm = ParallelAlignments(lex, ref="partialcognateids", fuzzy=True)
+    alm.jobs = jobs
     alm.align(method="progressive")
-    alm.output("tsv", filename=str(output_file), ignore="all", prettify=False)
+    if output_file is not None:
+        alm.output("tsv", filename=str(output_file), ignore="all", prettify=False)
 
     try:
         dataset.add_component("CognateTable")
@@ -173,48 +678,48 @@ def cognate_code_to_file(
     except ValueError:
         ...
 
-    read_back = csv.DictReader(
-        open(str(output_file) + ".tsv", encoding="utf-8"), delimiter="\t"
+    cognatesets: t.Dict[str, t.Dict[str, t.Any]] = {}
+    fs.write_table_atomically(
+        dataset, "CognateTable", judgements_from_alignments(alm, cognatesets)
     )
-    cognatesets = {}
-    judgements = []
+    fs.write_table_atomically(dataset, "CognatesetTable", cognatesets.values())
+
+
+def judgements_from_alignments(
+    alm: lingpy.Alignments,
+    cognatesets: t.Dict[str, t.Dict[str, t.Any]],
+) -> t.Iterator[t.Dict[str, t.Any]]:
+    """Generate cognate judgements from partial cognate IDs and alignments.
+
+    Every morpheme of every form in the aligned wordlist becomes one judgement.
+    The cognate sets that are referred to get added to `cognatesets`, which is
+    only complete once the generator is exhausted.
+
+    """
     i = 1
-    for line in read_back:
-        partial = line["PARTIALCOGNATEIDS"].split()
-        alignment = line["ALIGNMENT"].split(" + ")
+    for idx in alm:
         slice_start = 0
-        for cs, alm in zip(partial, alignment):
+        for cs, morpheme in zip(alm[idx, "partialcognateids"], alm[idx, "alignment"].n):
+            cs = str(cs)
             # TODO: @Gereon: is it alright to add the same content to Name and ID?
             cognatesets.setdefault(cs, {"ID": cs, "Name": cs})
-            length = len(alm.split())
-            judgements.append(
-                {
-                    "ID": i,
-                    "Form_ID": line["ID"],
-                    "Cognateset_ID": cs,
-                    "Segment_Slice": [
-                        "{:d}:{:d}".format(slice_start, slice_start + length)
-                    ],
-                    "Alignment": alm.split(),
-                    "Source": ["LexStat"],
-                }
-            )
+            length = len(morpheme)
+            yield {
+                "ID": i,
+                "Form_ID": alm[idx, "form_id"],
+                "Cognateset_ID": cs,
+                "Segment_Slice": [
+                    "{:d}:{:d}".format(slice_start, slice_start + length)
+                ],
+                "Alignment": list(morpheme),
+                "Source": ["LexStat"],
+            }
             i += 1
             slice_start += length
-    dataset.write(CognatesetTable=cognatesets.values())
-    dataset.write(CognateTable=judgements)
 
 
-if __name__ == "__main__":
-    parser = cli.parser(description=__doc__)
-    parser.add_argument(
-        "--output-file",
-        "-o",
-        type=Path,
-        default="aligned",
-        help="Output file to write segmented data to,"
-        " without extension .tsv (automatically added) (default: aligned)",
-    )
+def add_lexstat_arguments(parser: cli.argparse.ArgumentParser) -> None:
+    """Add the command line arguments for LexStat scorers and clustering."""
     parser.add_argument(
         "--sound-class",
         default="sca",
@@ -227,14 +732,6 @@ if __name__ == "__main__":
         type=float,
         help="Cognate clustering threshold value (default: 0.55)",
     )
-    parser.add_argument(
-        "--clustering-method",
-        default="infomap",
-        help="Cognate clustering method name. Valid options"
-        " are, dependent on your LingPy version, {'upgma',"
-        " 'single', 'complete', 'mcl', 'infomap'}."
-        " (default: infomap)",
-    )
     parser.add_argument(
         "--gop",
         default=-2,
@@ -261,7 +758,64 @@ if __name__ == "__main__":
         help="Threshold value for the initial pairs used to"
         "bootstrap the calculation (default: 0.7)",
     )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Directory to cache LexStat scorers in"
+        " (default: $LEXEDATA_CACHE_DIR, or the lexedata folder in your user cache directory)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=500,
+        metavar="MB",
+        help="Remove the least recently used LexStat scorers from the cache"
+        " when they take more than this many megabytes (default: 500)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Compute the random correspondences for the LexStat scorer,"
+        " and cluster and align the concepts, in N parallel worker processes"
+        " (default: 1)",
+    )
+    parser.add_argument(
+        "--seed",
+        default=None,
+        help="Seed for the random word pairs of the LexStat scorer. With a seed,"
+        " the scorer is reproducible and independent of the number of --jobs."
+        " (default: Draw different random pairs in every run)",
+    )
+
+
+if __name__ == "__main__":
+    parser = cli.parser(description=__doc__)
+    parser.add_argument(
+        "--output-file",
+        "-o",
+        type=Path,
+        default=None,
+        help="Also write the LingPy alignments to this file, without extension"
+        " .tsv (automatically added), and the LingPy cognate clusters to"
+        " auto-clusters.tsv next to it, for debugging."
+        " (default: Only write the CognateTable and CognatesetTable)",
+    )
+    parser.add_argument(
+        "--clustering-method",
+        default="infomap",
+        help="Cognate clustering method name. Valid options"
+        " are, dependent on your LingPy version, {'upgma',"
+        " 'single', 'complete', 'mcl', 'infomap'}."
+        " (default: infomap)",
+    )
+    add_lexstat_arguments(parser)
     args = parser.parse_args()
+    if args.jobs < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--jobs must be at least 1.")
     cognate_code_to_file(
         metadata=args.metadata,
         ratio=args.ratio,
@@ -272,4 +826,8 @@ if __name__ == "__main__":
         initial_threshold=args.initial_threshold,
         gop=args.gop,
         output_file=args.output_file,
+        cache_dir=args.cache_dir,
+        cache_size=int(args.cache_size * 1024 * 1024),
+        jobs=args.jobs,
+        seed=args.seed,
     )
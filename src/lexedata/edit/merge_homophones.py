@@ -9,15 +9,18 @@ What other columns give warnings, what other columns give errors?
 """
 
 import re
+import csv
+import json
 import argparse
 import typing as t
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
 
 import pycldf
 
 import lexedata.cli as cli
 from lexedata import types
+from lexedata.util import fs
 
 # The cell value type, which tends to be string, lists of string, or int:
 C = t.TypeVar("C")
@@ -315,6 +318,40 @@ default_mergers: t.Mapping[str, Merger] = t.DefaultDict(
 )
 
 
+def merge_plan(
+    dataset: types.Wordlist[
+        types.Language_ID,
+        types.Form_ID,
+        types.Parameter_ID,
+        types.Cognate_ID,
+        types.Cognateset_ID,
+    ],
+    mergers: t.Mapping[str, Merger],
+) -> t.List[t.Tuple[str, Merger]]:
+    """Decide once which merger to use for each column of the FormTable.
+
+    A column's merger is looked up by the column name, then by its CLDF
+    property, and defaults to `must_be_equal`. The ID column is not merged.
+
+    """
+    c_f_id = dataset["FormTable", "id"].name
+    plan = []
+    for column in dataset["FormTable"].tableSchema.columns:
+        if column.name == c_f_id:
+            continue
+        try:
+            _, reference_name = column.propertyUrl.uri.split("#")
+        except AttributeError:
+            reference_name = column.name
+        plan.append(
+            (
+                column.name,
+                mergers.get(column.name, mergers.get(reference_name, must_be_equal)),
+            )
+        )
+    return plan
+
+
 def merge_group(
     forms: t.Sequence[types.Form],
     target: types.Form,
@@ -327,54 +364,62 @@ def merge_group(
         types.Cognateset_ID,
     ],
     logger: cli.logger = cli.logger,
+    plan: t.Optional[t.Sequence[t.Tuple[str, Merger]]] = None,
 ) -> types.Form:
+    """Merge the forms into the target form.
+
+    If no `plan` from `merge_plan` is given, it is computed from the mergers
+    and the dataset.
+
+    """
     c_f_id = dataset["FormTable", "id"].name
-    for column in target:
-        if column == c_f_id:
+    if plan is None:
+        plan = merge_plan(dataset, mergers)
+    unknown = set(target) - {column for column, _ in plan} - {c_f_id}
+    if unknown:
+        cli.Exit.INVALID_COLUMN_NAME(f"Column {unknown.pop()} is not in FormTable.")
+    for column, merger in plan:
+        if column not in target:
             continue
         try:
-            try:
-                _, reference_name = dataset["FormTable", column].propertyUrl.uri.split(
-                    "#"
-                )
-            except AttributeError:
-                reference_name = column
-            merger = mergers.get(column, mergers.get(reference_name, must_be_equal))
-            try:
-                merge_result = merger([form[column] for form in forms], target)
-            except AssertionError:
-                merger_name = merger.__name__
-                cli.Exit.INVALID_INPUT(
-                    f"Merging forms: {[f[c_f_id] for f in forms]} with target: {target[c_f_id]} on column: {column}\n"
-                    f"The merge function {merger_name} requires the input data to be equal. \n"
-                    f"Given input: {[form[column] for form in forms]}"
-                )
-            except NotImplementedError:
-                merger_name = merger.__name__
-                cli.Exit.INVALID_INPUT(
-                    f"Merging forms: {[f[c_f_id] for f in forms]} with target: {target[c_f_id]} \n"
-                    f"The merge function {merger_name} is not implemented for type {type(forms[0])}. \n"
-                    f"Given input: {[form[column] for form in forms]}"
-                )
-            # make sure nothing in the target is overwritten with None or empty string
-            if (merge_result is None or merge_result == "") and (
-                target[column] is not None or target[column] != ""
-            ):
-                continue
-            # don't overwrite target value, but add return value from merging function
-            if target[column] is None:
-                target[column] = merge_result
-            else:
-                if (
-                    isinstance(target[column], str)
-                    and isinstance(merge_result, str)
-                    and merge_result != target[column]
-                ):
-                    target[column] += SEPARATOR + merge_result
-                elif target[column] != merge_result:
-                    target[column] += merge_result
+            values = [form[column] for form in forms]
         except KeyError:
-            cli.Exit.INVALID_COLUMN_NAME(f"Column {column} is not in FormTable.")
+            cli.Exit.INVALID_COLUMN_NAME(
+                f"Column {column} is missing from some of the forms {[f[c_f_id] for f in forms]}."
+            )
+        try:
+            merge_result = merger(values, target)
+        except AssertionError:
+            merger_name = merger.__name__
+            cli.Exit.INVALID_INPUT(
+                f"Merging forms: {[f[c_f_id] for f in forms]} with target: {target[c_f_id]} on column: {column}\n"
+                f"The merge function {merger_name} requires the input data to be equal. \n"
+                f"Given input: {values}"
+            )
+        except NotImplementedError:
+            merger_name = merger.__name__
+            cli.Exit.INVALID_INPUT(
+                f"Merging forms: {[f[c_f_id] for f in forms]} with target: {target[c_f_id]} \n"
+                f"The merge function {merger_name} is not implemented for type {type(forms[0])}. \n"
+                f"Given input: {values}"
+            )
+        # make sure nothing in the target is overwritten with None or empty string
+        if (merge_result is None or merge_result == "") and (
+            target[column] is not None or target[column] != ""
+        ):
+            continue
+        # don't overwrite target value, but add return value from merging function
+        if target[column] is None:
+            target[column] = merge_result
+        else:
+            if (
+                isinstance(target[column], str)
+                and isinstance(merge_result, str)
+                and merge_result != target[column]
+            ):
+                target[column] += SEPARATOR + merge_result
+            elif target[column] != merge_result:
+                target[column] += merge_result
     return target
 
 
@@ -390,53 +435,97 @@ def merge_forms(
     homophone_groups: t.Mapping[types.Form_ID, t.Sequence[types.Form_ID]],
     logger: cli.logger = cli.logger,
 ) -> t.Iterable[types.Form]:
+    """Merge the forms of each homophone group into the group's target form.
+
+    All forms keep their position in the FormTable: the merged form takes the
+    place of the group's target, and the other forms of the group are dropped.
+    If a merge is skipped, or some forms of a group are missing, the forms of
+    that group are left as they are. Forms are only kept in memory while a
+    group that starts before them is still incomplete.
+
+    """
     merge_targets = {
         variant: target
         for target, variants in homophone_groups.items()
         for variant in variants
     }
     c_f_id = data["FormTable", "id"].name
+    plan = merge_plan(data, mergers)
 
     for ids_to_merge in homophone_groups.values():
         for form_id in ids_to_merge:
             assert merge_targets[form_id] in homophone_groups
 
-    buffer: t.Dict[types.Form_ID, types.Form] = {}
-    for f in data["FormTable"]:
-        buffer[f[c_f_id]] = f
+    group_of = dict(merge_targets)
+    members: t.Dict[types.Form_ID, t.Set[types.Form_ID]] = {}
+    for target_id, variants in homophone_groups.items():
+        group_of[target_id] = target_id
+        members[target_id] = {target_id, *variants}
+    # The forms of groups read so far, and what each of them turns into once
+    # its group is complete: the merged form, the form itself, or nothing.
+    held: t.Dict[types.Form_ID, types.Form] = {}
+    resolved: t.Dict[types.Form_ID, t.Optional[types.Form]] = {}
+    # The output in FormTable order, waiting for the group at its head to be
+    # complete. Entries are forms, or IDs of forms in homophone groups.
+    pending: t.Deque[t.Union[types.Form, types.Form_ID]] = deque()
+
+    def ready() -> t.Iterable[types.Form]:
+        while pending:
+            head = pending[0]
+            if isinstance(head, dict):
+                yield pending.popleft()
+            elif head in resolved:
+                pending.popleft()
+                result = resolved.pop(head)
+                if result is not None:
+                    yield result
+            else:
+                break
 
-    unknown = set()
     form: types.Form
     for form in data["FormTable"]:
         id: types.Form_ID = form[c_f_id]
-        if id in merge_targets:
-            unknown.add(id)
-            target_id = merge_targets[id]
-            group = homophone_groups[target_id]
-            if all(i in buffer for i in group):
-                try:
-                    buffer[target_id] = merge_group(
-                        [buffer[i] for i in group],
-                        buffer[target_id].copy(),  # type: ignore
-                        mergers,
-                        data,
-                        logger,
-                    )
-
-                    for i in group:
-                        if i != target_id:
-                            del buffer[i]
-                except Skip:
-                    logger.info(
-                        f"Merging form {id} with forms {[f[c_f_id] for f in group]} was skipped."
-                    )
-                    pass
-                unknown.remove(id)
-
-    for f in buffer:
-        if f in unknown:
-            break
-        yield buffer[f]
+        if id not in group_of:
+            if pending:
+                pending.append(form)
+            else:
+                yield form
+            continue
+        held[id] = form
+        pending.append(id)
+        target_id = group_of[id]
+        if not all(i in held for i in members[target_id]):
+            continue
+        group = homophone_groups[target_id]
+        try:
+            merged = merge_group(
+                [held[i] for i in group],
+                held[target_id].copy(),  # type: ignore
+                mergers,
+                data,
+                logger,
+                plan=plan,
+            )
+            for i in members[target_id]:
+                resolved[i] = None
+            resolved[target_id] = merged
+        except Skip:
+            logger.info(
+                f"Merging form {target_id} with forms {list(group)} was skipped."
+            )
+            for i in members[target_id]:
+                resolved[i] = held[i]
+        for i in members[target_id]:
+            del held[i]
+        yield from ready()
+
+    if held:
+        logger.warning(
+            f"Some forms to be merged were not found, so the forms {list(held)}, "
+            "which should have been merged with them, were left as they are."
+        )
+        resolved.update(held)
+        yield from ready()
 
 
 def parse_merge_override(string: str) -> t.Tuple[str, Merger]:
@@ -513,6 +602,56 @@ def parse_homophones_old_format(
     return homophone_groups
 
 
+def parse_homophones_tsv(
+    report: t.TextIO,
+) -> t.Mapping[types.Form_ID, t.Sequence[types.Form_ID]]:
+    r"""Parse homophones merge instructions from a TSV homophones report
+
+    The first form of each group is the target of the merge.
+
+    >>> from io import StringIO
+    >>> file = StringIO("Group\tLanguage_ID\tForm\tForm_ID\n"
+    ... "1\tache\tkɾã\tache_one\n"
+    ... "1\tache\tkɾã\tache_two\n"
+    ... "2\tache\tpe\tache_three\n"
+    ... "2\tache\tpe\tache_four\n"
+    ... "2\tache\tpe\tache_five\n")
+    >>> parse_homophones_tsv(file)
+    defaultdict(<class 'list'>, {'ache_one': ['ache_two'], 'ache_three': ['ache_four', 'ache_five']})
+    """
+    homophone_groups: t.Mapping[types.Form_ID, t.List[types.Form_ID]] = defaultdict(
+        list
+    )
+    targets: t.Dict[str, types.Form_ID] = {}
+    for row in csv.DictReader(report, delimiter="\t"):
+        if row["Group"] in targets:
+            homophone_groups[targets[row["Group"]]].append(row["Form_ID"])
+        else:
+            targets[row["Group"]] = row["Form_ID"]
+    return homophone_groups
+
+
+def parse_homophones_json(
+    report: t.TextIO,
+) -> t.Mapping[types.Form_ID, t.Sequence[types.Form_ID]]:
+    """Parse homophones merge instructions from a JSON homophones report
+
+    The first form of each group is the target of the merge.
+
+    >>> from io import StringIO
+    >>> file = StringIO('[{"forms": [{"id": "ache_one"}, {"id": "ache_two"}]}]')
+    >>> parse_homophones_json(file)
+    defaultdict(<class 'list'>, {'ache_one': ['ache_two']})
+    """
+    homophone_groups: t.Mapping[types.Form_ID, t.List[types.Form_ID]] = defaultdict(
+        list
+    )
+    for group in json.load(report):
+        target, *variants = [form["id"] for form in group["forms"]]
+        homophone_groups[target].extend(variants)
+    return homophone_groups
+
+
 all_mergers: t.Set[Merger] = {default}
 all_mergers.update(default_mergers.values())
 for name, item in list(vars().items()):
@@ -525,7 +664,9 @@ for name, item in list(vars().items()):
 
 if __name__ == "__main__":
     parser = cli.parser(
-        description="Script for merging homophones.",
+        description="Script for merging homophones. Each merged form takes the "
+        "place of its target form in the FormTable, all other forms keep their "
+        "position.",
         epilog="""The default merging functions are:
 {:}
 
@@ -546,7 +687,8 @@ The following merge functions are predefined, each takes the given entries for o
     )
     parser.add_argument(
         "merge_report",
-        help="Path pointing to the file containing the merge report generated by report/homophones.py",
+        help="Path pointing to the file containing the merge report generated by report/homophones.py."
+        " Reports with the extension .tsv or .json are read in that format.",
         type=Path,
     )
     parser.add_argument(
@@ -567,27 +709,28 @@ The following merge functions are predefined, each takes the given entries for o
         mergers[column] = merger
     logger.info(
         "The homophones merger was initialized as follows\n Column : merger function\n"
-        + "\n".join("{}: {}".format(k, m.__name__) for k, m in mergers)
+        + "\n".join("{}: {}".format(k, m.__name__) for k, m in mergers.items())
     )
     # Parse the homophones instructions!
-    homophone_groups = parse_homophones_old_format(
-        args.merge_report.open("r", encoding="utf8"),
+    parse = {
+        ".tsv": parse_homophones_tsv,
+        ".json": parse_homophones_json,
+    }.get(args.merge_report.suffix, parse_homophones_old_format)
+    homophone_groups = parse(
+        args.merge_report.open("r", encoding="utf8", newline=""),
     )
     if homophone_groups == defaultdict(list):
         cli.Exit.INVALID_INPUT(
             f"The provided report {args.report} is empty or does not have the correct format."
         )
-    merged_forms = [
-        e
-        for e in cli.tq(
-            merge_forms(
-                data=pycldf.Dataset.from_metadata(args.metadata),
-                mergers=mergers,
-                homophone_groups=homophone_groups,
-                logger=logger,
-            ),
+    merged_forms = cli.tq(
+        merge_forms(
+            data=pycldf.Dataset.from_metadata(args.metadata),
+            mergers=mergers,
+            homophone_groups=homophone_groups,
             logger=logger,
-            task=f"Merging {sum([len(v) for v in homophone_groups.values()])}",
-        )
-    ]
-    dataset.write(FormTable=merged_forms)
+        ),
+        logger=logger,
+        task=f"Merging {sum([len(v) for v in homophone_groups.values()])}",
+    )
+    fs.write_table_atomically(dataset, "FormTable", merged_forms)
@@ -5,20 +5,128 @@ Maybe this should be one of the extended checks, with automatic fixing option, i
 This funtionality is, without error reporting, in the CLI of lexedata.util
 """
 
-from pathlib import Path
+import os
+import shutil
+import tempfile
+import typing as t
 import unicodedata
+import concurrent.futures
+from pathlib import Path
+
+import pycldf
 
 from lexedata import cli
 
+# Read files in chunks of this many characters
+CHUNK_SIZE = 1 << 20
+
 
 def n(s: str) -> str:
     return unicodedata.normalize("NFC", s)
 
 
-def normalize(file, original_encoding="utf-8"):
-    # TODO: If this ever takes more than a second, add a cli.tq progress bar
-    content = file.open(encoding=original_encoding).read()
-    file.open("w", encoding=original_encoding).write(n(content))
+def chunks(file: t.TextIO, chunk_size: int = CHUNK_SIZE) -> t.Iterator[str]:
+    """Read a text file in chunks that end at line breaks.
+
+    No character combines with a line break, so NFC normalizing each chunk
+    separately gives the same result as normalizing the whole text. A line
+    longer than the chunk size is read completely into one chunk.
+
+    >>> import io
+    >>> list(chunks(io.StringIO("ab\\ncd\\ne"), 4))
+    ['ab\\n', 'cd\\n', 'e']
+
+    """
+    rest = ""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        chunk = rest + chunk
+        end = max(chunk.rfind("\n"), chunk.rfind("\r")) + 1
+        if end:
+            yield chunk[:end]
+            rest = chunk[end:]
+        else:
+            rest = chunk
+    if rest:
+        yield rest
+
+
+def normalize(
+    file: Path, original_encoding: str = "utf-8", chunk_size: int = CHUNK_SIZE
+) -> bool:
+    """NFC normalize a text file, and return whether it changed.
+
+    The file is first checked chunk by chunk, and only if some chunk is not in
+    NFC already, it is normalized through a temporary file, which replaces the
+    original file only once it is completely written.
+
+    >>> file = Path(tempfile.mkdtemp()) / "forms.csv"
+    >>> _ = file.write_text("ID,Form\\nf1,e\\u0301\\n", encoding="utf-8")
+    >>> normalize(file)
+    True
+    >>> file.read_text(encoding="utf-8") == "ID,Form\\nf1,\\u00e9\\n"
+    True
+    >>> normalize(file)
+    False
+
+    """
+    with file.open(encoding=original_encoding, newline="") as content:
+        if all(
+            unicodedata.is_normalized("NFC", chunk)
+            for chunk in chunks(content, chunk_size)
+        ):
+            return False
+
+    handle, temporary = tempfile.mkstemp(
+        dir=file.parent, prefix=f".{file.name}.", suffix=".tmp"
+    )
+    try:
+        with open(handle, "w", encoding=original_encoding, newline="") as target:
+            with file.open(encoding=original_encoding, newline="") as content:
+                for chunk in chunks(content, chunk_size):
+                    target.write(n(chunk))
+        shutil.copymode(file, temporary)
+        os.replace(temporary, file)
+    except BaseException:
+        Path(temporary).unlink()
+        raise
+    return True
+
+
+def _normalize(task: t.Tuple[Path, str]) -> bool:
+    file, original_encoding = task
+    return normalize(file, original_encoding)
+
+
+def normalize_files(
+    files: t.Sequence[Path],
+    original_encoding: str = "utf-8",
+    jobs: int = 1,
+    logger: cli.logging.Logger = cli.logger,
+) -> t.List[Path]:
+    """NFC normalize text files, in `jobs` worker processes if more than one.
+
+    Return the files that changed.
+
+    """
+    if jobs > 1 and len(files) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            changed = list(
+                pool.map(_normalize, [(file, original_encoding) for file in files])
+            )
+    else:
+        changed = []
+        for file in files:
+            logger.info(f"Normalizing {file}…")
+            changed.append(normalize(file, original_encoding))
+    for file, file_changed in zip(files, changed):
+        if file_changed:
+            logger.info(f"Normalized {file}.")
+        else:
+            logger.debug(f"{file} was NFC normalized already.")
+    return [file for file, file_changed in zip(files, changed) if file_changed]
 
 
 if __name__ == "__main__":
@@ -30,11 +138,19 @@ if __name__ == "__main__":
         help="The file(s) to re-encode. Default: All table files included by the metadata file, though not the sources.",
     )
     parser.add_argument("--from-encoding", default="utf-8", help="original encoding")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Normalize N files in parallel (default: 1)",
+    )
     args = parser.parse_args()
     logger = cli.setup_logging(args)
+    if args.jobs < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--jobs must be at least 1.")
     if not args.file:
-        # TODO: Check CLDF for how to properly get table URLs as path
-        args.file = [Path(table.url.string) for table in args.metadata.tables]
-    for file in args.file:
-        logger.info(f"Normalizing {file}…")
-        normalize(file)
+        dataset = pycldf.Dataset.from_metadata(args.metadata)
+        args.file = [dataset.directory / str(table.url) for table in dataset.tables]
+    normalize_files(args.file, args.from_encoding, jobs=args.jobs, logger=logger)
@@ -13,6 +13,7 @@ import pycldf
 
 from lexedata import cli
 from lexedata.util import ID_FORMAT, string_to_id, cache_table
+from lexedata.util.rewrite_ids import rewrite_ids
 
 ID_COMPONENTS: t.Mapping[str, t.Sequence[str]] = {
     "FormTable": ["languageReference", "parameterReference"]
@@ -60,71 +61,24 @@ def update_integer_ids(
 ):
     """Update all IDs of the table in the database, also in foreign keys."""
     c_id = table.get_column("http://cldf.clld.org/v1.0/terms.rdf#id")
-    max_id = 0
-    no_integer_rows: t.Set[str] = set()
-    # logger.info("Checking IDs that are already integers…")
+    mapping: t.Dict[str, int] = {}
+    no_integer_rows: t.List[str] = []
     for row in cli.tq(
         ds[table],
         task="Checking IDs that are already integers…",
         total=ds[table].common_props.get("dc:extent"),
     ):
         try:
-            max_id = max(int(row[c_id.name]), max_id)
+            mapping[row[c_id.name]] = int(row[c_id.name])
         except ValueError:
-            no_integer_rows.add(row[c_id.name])
+            no_integer_rows.append(row[c_id.name])
     logger.info("Adding integer IDs to other rows…")
+    max_id = max(mapping.values(), default=0)
+    for id in no_integer_rows:
+        max_id += 1
+        mapping[id] = max_id
 
-    mapping: t.Dict[str, int]
-    rows: t.List[t.Dict[str, t.Any]] = []
-    for row in cli.tq(
-        ds[table],
-        task="Updating integer ids",
-        total=ds[table].common_props.get("dc:extent"),
-    ):
-        original = row[c_id.name]
-        if row[c_id.name] in no_integer_rows:
-            max_id += 1
-            row[c_id.name] = max_id
-        else:
-            row[c_id.name] = int(row[c_id.name])
-        mapping[original] = row[c_id.name]
-        rows.append(row)
-    logger.info(f"Writing {table.url.string} back to file…")
-    table.write(rows)
-
-    foreign_keys_to_here = {
-        other_table.url.string: {
-            foreign_key.columnReference[
-                foreign_key.reference.columnReference.index(c_id.name)
-            ]
-            for foreign_key in other_table.tableSchema.foreignKeys
-            if foreign_key.reference.resource == table.url
-            if c_id.name in foreign_key.reference.columnReference
-        }
-        for other_table in ds.tables
-    }
-    for other_table, columns in foreign_keys_to_here.items():
-        if not columns:
-            continue
-        # logger.info(f"Applying changed foreign key to {other_table}…")
-        rows = []
-        for row in cli.tq(
-            ds[other_table],
-            task=f"Applying changed foreign key to {other_table}…",
-            total=ds[other_table].common_props.get("dc:extent"),
-        ):
-            for column in columns:
-                row[column] = mapping[str(row[column])]
-            rows.append(row)
-
-        for column in columns:
-            ds[other_table, column].datatype = c_id.datatype
-
-        logger.info(f"Writing {other_table} back to file…")
-        for column in columns:
-            ds[other_table, column].datatype = c_id.datatype
-
-        ds[other_table].write(rows)
+    rewrite_ids(ds, {table.url.string: mapping}, copy_datatypes=True, logger=logger)
 
 
 def update_ids(
@@ -135,48 +89,8 @@ def update_ids(
 ):
     """Update all IDs of the table in the database, also in foreign keys."""
     c_id = table.get_column("http://cldf.clld.org/v1.0/terms.rdf#id")
-    rows = []
-    for row in cli.tq(
-        ds[table],
-        task=f"Updating ids of {table}",
-        total=ds[table].common_props.get("dc:extent"),
-    ):
-        row[c_id.name] = mapping.get(row[c_id.name], row[c_id.name])
-        rows.append(row)
-    logger.info(f"Writing {table.url.string} back to file…")
-    table.write(rows)
-
     c_id.datatype.format = ID_FORMAT.pattern
-
-    foreign_keys_to_here = {
-        other_table.url.string: {
-            foreign_key.columnReference[
-                foreign_key.reference.columnReference.index(c_id.name)
-            ]
-            for foreign_key in other_table.tableSchema.foreignKeys
-            if foreign_key.reference.resource == table.url
-            if c_id.name in foreign_key.reference.columnReference
-        }
-        for other_table in ds.tables
-    }
-    for other_table, columns in foreign_keys_to_here.items():
-        if not columns:
-            continue
-        logger.info(
-            f"Applying changed foreign key to columns {columns:} in {other_table:}…"
-        )
-        rows = []
-        for row in cli.tq(
-            ds[other_table], total=ds[other_table].common_props.get("dc:extent")
-        ):
-            for column in columns:
-                row[column] = mapping.get(row[column], row[column])
-            rows.append(row)
-        logger.info(f"Writing {other_table} back to file…")
-        ds[other_table].write(rows)
-
-        for column in columns:
-            ds[other_table, column].datatype = c_id.datatype
+    rewrite_ids(ds, {table.url.string: mapping}, copy_datatypes=True, logger=logger)
 
 
 if __name__ == "__main__":
@@ -9,6 +9,7 @@ import pycldf
 from lexedata import util
 from lexedata import types
 from lexedata import cli
+from lexedata.util.references import references_to
 
 try:
     from typing import Literal
@@ -148,12 +149,13 @@ def read_wordlist(
             ):
                 code_column = col_map.cognates.cognatesetReference
                 form_reference = col_map.cognates.formReference
-                (foreign_key,) = [
-                    key
-                    for key in dataset["CognateTable"].tableSchema.foreignKeys
-                    if key.columnReference == [form_reference]
+                (form_table_column,) = [
+                    reference.referenced_column
+                    for reference in references_to(
+                        dataset, "FormTable", from_table="CognateTable"
+                    )
+                    if reference.column == form_reference
                 ]
-                (form_table_column,) = foreign_key.reference.columnReference
                 cognatesets = util.cache_table(
                     dataset,
                     "CognateTable",
@@ -190,12 +192,13 @@ def read_wordlist(
         types.Language_ID, t.MutableMapping[types.Parameter_ID, t.Set]
     ]
     if "LanguageTable" in dataset:
-        (langref_target,) = [
-            key
-            for key in dataset["FormTable"].tableSchema.foreignKeys
-            if key.columnReference == [dataset["FormTable", "languageReference"].name]
+        (ref_col,) = [
+            reference.referenced_column
+            for reference in references_to(
+                dataset, "LanguageTable", from_table="FormTable"
+            )
+            if reference.column == dataset["FormTable", "languageReference"].name
         ]
-        ref_col = langref_target.reference.columnReference[0]
         data = {lang[ref_col]: t.DefaultDict(set) for lang in dataset["LanguageTable"]}
     else:
         data = t.DefaultDict(lambda: t.DefaultDict(set))
@@ -625,9 +628,9 @@ def format_nexus(
     if partitions:
         charsetstrings = [
             "CharSet {id}={indices};".format(
-                id=id, indices=" ".join(str(k) for k in indices)
+                id=id, indices=format_ranges(ranges, " ", "-")
             )
-            for id, indices in partitions.items()
+            for id, ranges in partitions.items()
         ]
         charsets = """Begin Sets;
   {:}
@@ -698,48 +701,152 @@ def fill_beast(data_object: ET.Element, languages, sequences) -> None:
     ET.SubElement(plate, "taxon", id="$(language)", spec="Taxon")
 
 
-def compress_indices(indices: t.Set[int]) -> t.Iterator[slice]:
+def compress_indices(indices: t.Iterable[int]) -> t.Iterator[slice]:
     """Turn groups of largely contiguous indices into slices.
 
+    The indices are sorted once and the runs are emitted iteratively, so this
+    works for arbitrarily fragmented index sets and leaves its input intact.
+
     >>> list(compress_indices(set(range(10))))
     [slice(0, 10, None)]
 
     >>> list(compress_indices([1, 2, 5, 6, 7]))
     [slice(1, 3, None), slice(5, 8, None)]
+
+    >>> list(compress_indices([7, 2, 2, 1]))
+    [slice(1, 3, None), slice(7, 8, None)]
+
+    >>> list(compress_indices(range(0, 100000, 2)))[-1]
+    slice(99998, 99999, None)
     """
-    if not indices:
-        return
-    minimum = min(indices)
-    maximum = minimum
-    while maximum in indices:
-        indices.remove(maximum)
-        maximum += 1
-    yield slice(minimum, maximum)
-    for sl in compress_indices(indices):
-        yield sl
-
-
-def add_partitions(data_object: ET.Element, partitions):
-    previous_alignment = data_object
-    for name, indices in partitions.items():
-        indices_set = compress_indices(set(indices))
-        indices_string = ",".join(
-            "{:d}-{:d}".format(s.start + 1, s.stop) for s in indices_set
-        )
-        previous_alignment.addnext(
-            data_object.makeelement(
-                "data",
-                {
-                    "id": "concept:" + name,
-                    "spec": "FilteredAlignment",
-                    "filter": "1," + indices_string,
-                    "data": "@" + data_object.attrib["id"],
-                    "ascertained": "true",
-                    "excludefrom": "0",
-                    "excludeto": "1",
-                },
+    start: t.Optional[int] = None
+    stop = 0
+    for index in sorted(indices):
+        if start is None:
+            start, stop = index, index + 1
+        elif index == stop:
+            stop += 1
+        elif index > stop:
+            yield slice(start, stop)
+            start, stop = index, index + 1
+    if start is not None:
+        yield slice(start, stop)
+
+
+def merge_partitions(
+    partitions: t.Mapping[str, t.Iterable[int]], max_partitions: int
+) -> t.Dict[str, t.List[int]]:
+    """Merge partitions until there are at most `max_partitions` of them.
+
+    Partitions are ordered by their first character, and neighbours in that
+    order are merged into groups of roughly equal numbers of characters. The
+    name of a merged partition is built from the names of its parts.
+
+    >>> merge_partitions({"a": [1, 2], "b": [3], "c": [4, 5, 6], "d": [7]}, 2)
+    {'a_b': [1, 2, 3], 'c_d': [4, 5, 6, 7]}
+    >>> merge_partitions({"a": [1, 2], "b": [3]}, 5)
+    {'a': [1, 2], 'b': [3]}
+    """
+    if max_partitions < 1:
+        raise ValueError("Cannot merge partitions into fewer than one partition.")
+    ordered = sorted(
+        ((name, sorted(indices)) for name, indices in partitions.items()),
+        key=lambda name_indices: name_indices[1][:1],
+    )
+    if len(ordered) <= max_partitions:
+        return dict(ordered)
+    total = sum(len(indices) for _, indices in ordered)
+    merged: t.Dict[str, t.List[int]] = {}
+    names: t.List[str] = []
+    block: t.List[int] = []
+    seen = 0
+    for i, (name, indices) in enumerate(ordered):
+        # Start a new block when this partition lies mostly beyond the next
+        # block boundary, or when every remaining partition needs its own block.
+        free_blocks = max_partitions - len(merged) - 1
+        if (
+            names
+            and free_blocks > 0
+            and (
+                len(ordered) - i <= free_blocks
+                or seen + len(indices) / 2 > total * (len(merged) + 1) / max_partitions
             )
+        ):
+            merged["_".join(names)] = block
+            names, block = [], []
+        names.append(name)
+        block.extend(indices)
+        seen += len(indices)
+    merged["_".join(names)] = block
+    return merged
+
+
+def partition_ranges(
+    partitions: t.Mapping[str, t.Iterable[int]],
+    max_partitions: t.Optional[int] = None,
+) -> t.Dict[str, t.List[t.Tuple[int, int]]]:
+    """Compute the 1-based, inclusive character ranges of each partition.
+
+    This is done once for all partitions, and the result is used for both the
+    BEAST FilteredAlignment filters and the NEXUS CharSet blocks.
+
+    >>> partition_ranges({"m1": [1, 2, 3], "m2": [4, 6]})
+    {'m1': [(2, 4)], 'm2': [(5, 5), (7, 7)]}
+    >>> partition_ranges({"m1": [1, 2], "m2": [3], "m3": [5]}, max_partitions=2)
+    {'m1': [(2, 3)], 'm2_m3': [(4, 4), (6, 6)]}
+    """
+    if max_partitions is not None:
+        partitions = merge_partitions(partitions, max_partitions)
+    return {
+        name: [(s.start + 1, s.stop) for s in compress_indices(indices)]
+        for name, indices in partitions.items()
+    }
+
+
+def format_ranges(
+    ranges: t.Iterable[t.Tuple[int, int]], separator: str, to: str
+) -> str:
+    """Format 1-based inclusive ranges.
+
+    >>> format_ranges([(2, 4), (6, 6)], ",", "-")
+    '2-4,6'
+    """
+    return separator.join(
+        str(start) if start == stop else "{:d}{:}{:d}".format(start, to, stop)
+        for start, stop in ranges
+    )
+
+
+def add_partitions(
+    data_object: ET.Element,
+    partitions: t.Mapping[str, t.Sequence[t.Tuple[int, int]]],
+):
+    """Add a FilteredAlignment for every partition after the data object.
+
+    The partitions are given as 1-based inclusive ranges, as returned by
+    `partition_ranges`.
+
+    >>> xml = ET.fromstring('<beast><data id="vocabulary"/></beast>')
+    >>> add_partitions(xml.find(".//data"), {"m1": [(2, 4)], "m2": [(5, 5), (7, 7)]})
+    >>> [d.attrib.get("filter") for d in xml.iter("data")]
+    [None, '1,2-4', '1,5,7']
+    """
+    previous_alignment = data_object
+    for name, ranges in partitions.items():
+        alignment = data_object.makeelement(
+            "data",
+            {
+                "id": "concept:" + name,
+                "spec": "FilteredAlignment",
+                "filter": "1," + format_ranges(ranges, ",", "-"),
+                "data": "@" + data_object.attrib["id"],
+                "ascertained": "true",
+                "excludefrom": "0",
+                "excludeto": "1",
+            },
         )
+        previous_alignment.addnext(alignment)
+        previous_alignment = alignment
 
 
 if __name__ == "__main__":
@@ -819,6 +926,15 @@ if __name__ == "__main__":
         at least half the the concepts it is connected to are attested with
         other roots in the language.""",
     )
+    parser.add_argument(
+        "--max-partitions",
+        type=int,
+        default=None,
+        metavar="N",
+        help="""For codings with one partition per concept, merge neighbouring
+        concept partitions until there are at most N CharSets or
+        FilteredAlignments. (default: One partition per concept)""",
+    )
     parser.add_argument("--stats-file", type=Path, help="A file to write statistics to")
     args = parser.parse_args()
     logger = cli.setup_logging(args)
@@ -898,10 +1014,13 @@ if __name__ == "__main__":
             for key, value in binal.items()
         }
         sequences = raw_binary_alignment(alignment)
-        partitions = {
-            concept: cognatesets.values()
-            for concept, cognatesets in concept_cognateset_indices.items()
-        }
+        partitions = partition_ranges(
+            {
+                concept: cognatesets.values()
+                for concept, cognatesets in concept_cognateset_indices.items()
+            },
+            max_partitions=args.max_partitions,
+        )
     elif args.coding == "multistate":
         multial, concept_indices = multistate_code(ds)
         n_characters = len(next(iter(multial.values())))
@@ -5,6 +5,7 @@ import pycldf
 
 import lexedata.cli as cli
 import lexedata.types as types
+from lexedata.util.references import references_to, referring_column
 
 
 def coverage_report(
@@ -19,11 +20,11 @@ def coverage_report(
             c_j_form = dataset["CognateTable", "formReference"].name
             coded = set()
             form_column_referred_to_by_judgements = ""
-            for foreign_key in dataset["CognateTable"].tableSchema.foreignKeys:
-                if foreign_key.columnReference == [c_j_form]:
-                    (
-                        form_column_referred_to_by_judgements,
-                    ) = foreign_key.reference.columnReference
+            for reference in references_to(
+                dataset, "FormTable", from_table="CognateTable"
+            ):
+                if reference.column == c_j_form:
+                    form_column_referred_to_by_judgements = reference.referenced_column
             for judgement in dataset["CognateTable"]:
                 coded.add(judgement[c_j_form])
         except KeyError:
@@ -43,15 +44,12 @@ def coverage_report(
         pass
 
     # get the foreign keys pointing to the required tables
-    foreign_key_parameter = ""
-    for foreign_key in dataset["FormTable"].tableSchema.foreignKeys:
-        if foreign_key.reference.resource == dataset["ParameterTable"].url:
-            foreign_key_parameter = foreign_key.columnReference[0]
-
-    foreign_key_language = ""
-    for foreign_key in dataset["FormTable"].tableSchema.foreignKeys:
-        if foreign_key.reference.resource == dataset["LanguageTable"].url:
-            foreign_key_language = foreign_key.columnReference[0]
+    foreign_key_parameter = (
+        referring_column(dataset, "ParameterTable", from_table="FormTable") or ""
+    )
+    foreign_key_language = (
+        referring_column(dataset, "LanguageTable", from_table="FormTable") or ""
+    )
 
     concepts: t.DefaultDict[str, t.Counter[str]] = t.DefaultDict(t.Counter)
     multiple_concepts = bool(dataset["FormTable", "parameterReference"].separator)
@@ -140,15 +138,12 @@ def coverage_report_concepts(
         )
         primary_concepts = [c[c_c_id] for c in dataset["ParameterTable"]]
     # get the foreign keys pointing to the required tables
-    foreign_key_parameter = ""
-    for foreign_key in dataset["FormTable"].tableSchema.foreignKeys:
-        if foreign_key.reference.resource == dataset["ParameterTable"].url:
-            foreign_key_parameter = foreign_key.columnReference[0]
-
-    foreign_key_language = ""
-    for foreign_key in dataset["FormTable"].tableSchema.foreignKeys:
-        if foreign_key.reference.resource == dataset["LanguageTable"].url:
-            foreign_key_language = foreign_key.columnReference[0]
+    foreign_key_parameter = (
+        referring_column(dataset, "ParameterTable", from_table="FormTable") or ""
+    )
+    foreign_key_language = (
+        referring_column(dataset, "LanguageTable", from_table="FormTable") or ""
+    )
 
     multiple_concepts = bool(dataset["FormTable", "parameterReference"].separator)
     c_concept = foreign_key_parameter
@@ -13,6 +13,7 @@ import pycldf
 import typing as t
 
 from lexedata.util import parse_segment_slices, cache_table
+from lexedata.util.references import reference_graph
 
 
 def check_segmentslice_separator(dataset, log=None) -> bool:
@@ -68,13 +69,16 @@ def check_cognate_table(dataset: pycldf.Wordlist, log=None) -> bool:
     # over the implicit semantics of a `#xxxReference` column pointing to an
     # `#id` column, so we need to find forms by the stated foreign key
     # relationship.
-    for foreign_key in cognatetable.tableSchema.foreignKeys:
-        if foreign_key.columnReference == [c_form]:
-            referenced_table = str(foreign_key.reference.resource)
-            # A multi-column column reference for a single-column foreign key
-            # makes no sense, so use tuple unpacking to extract the only
-            # element from that list.
-            (referenced_column,) = foreign_key.reference.columnReference
+    for referenced_table, references in reference_graph(dataset).items():
+        form_references = [
+            r.referenced_column
+            for r in references
+            if r.foreign_key
+            if r.table == cognatetable.url.string
+            if r.column == c_form
+        ]
+        if form_references:
+            referenced_column = form_references[0]
             if (
                 not dataset[referenced_table].common_props["dc:conformsTo"]
                 == "http://cldf.clld.org/v1.0/terms.rdf#FormTable"
@@ -5,24 +5,209 @@ minimal spanning tree according to clics, in order to identify polysemies vs.
 accidental homophones
 
 """
+import csv
+import json
 import typing as t
+import collections
+import concurrent.futures
 from pathlib import Path
 
 import networkx as nx
 import pycldf
+import unidecode as uni
 
 import lexedata.cli as cli
-from lexedata.util import load_clics
+from lexedata.util import edit_distance
+from lexedata.util.bktree import BKTree
+from lexedata.util.clics import ClicsGraph, load_compiled_clics
+
+# The concepts of a form, followed by the form's ID
+Meaning = t.Tuple[str, ...]
+# A homophone group: The form, its meanings, the connectivity of the concepts
+# in CLICS, and whether all concepts were found in CLICS
+Group = t.Tuple[str, t.List[Meaning], str, bool]
+
+# The CLICS graph and Concepticon mapping used by the worker processes. They
+# are set once per worker, instead of being sent with every task.
+_worker_clics: t.Optional[ClicsGraph] = None
+_worker_concepticon: t.Mapping[str, t.Optional[str]] = {}
+
+
+def _set_worker_data(
+    clics: ClicsGraph, concepticon: t.Mapping[str, t.Optional[str]]
+) -> None:
+    global _worker_clics, _worker_concepticon
+    _worker_clics = clics
+    _worker_concepticon = concepticon
+
+
+def classify_homophones(
+    forms: t.Mapping[str, t.Sequence[Meaning]],
+    concepticon: t.Mapping[str, t.Optional[str]],
+    clics: ClicsGraph,
+) -> t.List[Group]:
+    """Find the homophone groups among the forms of one language.
+
+    Each group is classified by whether its concepts are connected in CLICS.
+
+    >>> clics = ClicsGraph.from_networkx(nx.Graph([("1", "2")]))
+    >>> classify_homophones(
+    ...     {"ka": [("one", "f1"), ("two", "f2")], "ta": [("one", "f3")]},
+    ...     {"one": "1", "two": "2"},
+    ...     clics)
+    [('ka', [('one', 'f1'), ('two', 'f2')], 'Connected', True)]
+
+    """
+    groups = [(form, list(meanings)) for form, meanings in forms.items()]
+    groups = [(form, meanings) for form, meanings in groups if len(meanings) > 1]
+    nodes = [
+        {concepticon.get(concept) for meaning in meanings for concept in meaning[:-1]}
+        for form, meanings in groups
+    ]
+    connected = clics.are_connected(n - {None} for n in nodes)
+    classified = []
+    for (form, meanings), n, is_connected in zip(groups, nodes, connected):
+        if len(n - {None}) <= 1:
+            connectivity = "Unknown"
+        elif is_connected:
+            connectivity = "Connected"
+        else:
+            connectivity = "Unconnected"
+        classified.append((form, meanings, connectivity, None not in n))
+    return classified
+
+
+def approximate_homophones(
+    forms: t.Mapping[str, t.Sequence[Meaning]], threshold: float
+) -> t.Dict[str, t.List[Meaning]]:
+    """Find pairs of different, but similar forms of one language.
+
+    Two forms are similar if their `lexedata.util.edit_distance` is at most
+    `threshold` (between 0 and 1), so forms that differ only in diacritics
+    are always similar. Instead of comparing all pairs of forms, candidates
+    are looked up in a BK-tree of the simplified forms.
+
+    >>> approximate_homophones({
+    ...     "kata": [("one", "f1")],
+    ...     "káta": [("two", "f2")],
+    ...     "katta": [("three", "f3")],
+    ...     "pilu": [("four", "f4")]}, 0.2)
+    {'kata ~ katta': [('one', 'f1'), ('three', 'f3')], 'kata ~ káta': [('one', 'f1'), ('two', 'f2')], 'katta ~ káta': [('three', 'f3'), ('two', 'f2')]}
+
+    """
+    simplified: t.Dict[str, t.List[str]] = {}
+    for form in forms:
+        key = uni.unidecode(form).lower()
+        if key:
+            simplified.setdefault(key, []).append(form)
+    tree = BKTree(simplified)
+
+    pairs: t.Dict[str, t.List[Meaning]] = {}
+    for key, originals in simplified.items():
+        # The edit distance is normalized by the length of the longer form,
+        # and one swap of neighbouring characters counts as one edit, but as
+        # two in the Levenshtein distance of the tree. This is the largest
+        # Levenshtein distance of a similar form.
+        radius = int(2 * threshold * len(key) / (1 - threshold))
+        for _, other in tree.query(key, radius):
+            if other < key or edit_distance(key, other) > threshold:
+                continue
+            for form in originals:
+                for other_form in simplified[other]:
+                    if other_form == form:
+                        continue
+                    a, b = sorted([form, other_form])
+                    pairs[f"{a} ~ {b}"] = list(forms[a]) + list(forms[b])
+    return dict(sorted(pairs.items()))
+
+
+def _classify_language(
+    task: t.Tuple[str, t.Mapping[str, t.Sequence[Meaning]], t.Optional[float]]
+) -> t.Tuple[str, t.List[Group]]:
+    language, forms, approximate = task
+    if approximate is not None:
+        forms = approximate_homophones(forms, approximate)
+    return language, classify_homophones(forms, _worker_concepticon, _worker_clics)
+
+
+def forms_by_language(
+    dataset: pycldf.Dataset,
+) -> t.Iterator[t.Tuple[str, t.Dict[str, t.List[Meaning]]]]:
+    """Group the forms of each language by their form, one language at a time.
+
+    A first pass through the FormTable finds the last form of each language.
+    In the second pass, the forms of a language are yielded as soon as its
+    last form is read, so only languages whose forms are interleaved in the
+    FormTable are held in memory at the same time – for a FormTable sorted by
+    language, only one. The languages come in the order of their last forms.
+    NA forms are skipped.
+
+    >>> from lexedata.util.fs import new_wordlist
+    >>> ds = new_wordlist(FormTable=[
+    ...     {"ID": "f1", "Language_ID": "l1", "Parameter_ID": "p", "Form": "ka"},
+    ...     {"ID": "f2", "Language_ID": "l2", "Parameter_ID": "p", "Form": "ka"},
+    ...     {"ID": "f3", "Language_ID": "l1", "Parameter_ID": "q", "Form": "ka"},
+    ...     {"ID": "f4", "Language_ID": "l2", "Parameter_ID": "q", "Form": "-"}])
+    >>> for language, forms in forms_by_language(ds):
+    ...     print(language, forms)
+    l1 {'ka': [('p', 'f1'), ('q', 'f3')]}
+    l2 {'ka': [('p', 'f2')]}
+
+    """
+    f_id = dataset["FormTable", "id"].name
+    f_lang = dataset["FormTable", "languageReference"].name
+    f_concept = dataset["FormTable", "parameterReference"].name
+    f_form = dataset["FormTable", "form"].name
+
+    last_form: t.Dict[str, int] = {}
+    for i, form in enumerate(dataset["FormTable"]):
+        last_form[form[f_lang]] = i
+
+    languages: t.Dict[str, t.DefaultDict[str, t.List[Meaning]]] = {}
+    for i, form in enumerate(dataset["FormTable"]):
+        language = form[f_lang]
+        forms = languages.setdefault(language, t.DefaultDict(list))
+        if form[f_form] != "-" and form[f_form] is not None:
+            if isinstance(form[f_concept], list):
+                forms[form[f_form]].append(tuple(form[f_concept]) + (form[f_id],))
+            else:
+                forms[form[f_form]].append((form[f_concept], form[f_id]))
+        if last_form[language] == i:
+            del languages[language]
+            if forms:
+                yield language, dict(forms)
 
 
 def list_homophones(
-    dataset: pycldf.Dataset, output: Path, logger: cli.logging.Logger = cli.logger
+    dataset: pycldf.Dataset,
+    output: Path,
+    logger: cli.logging.Logger = cli.logger,
+    format: str = "text",
+    jobs: int = 1,
+    approximate: t.Optional[float] = None,
 ) -> None:
-    clics = load_clics()
+    """Write a report of all homophones in the dataset.
+
+    With an `approximate` threshold, report pairs of similar but different
+    forms (see `approximate_homophones`) instead of identical forms.
+
+    The forms are grouped one language at a time (see `forms_by_language`).
+    The homophone groups of each language are classified (in `jobs` worker
+    processes, if more than one) and written as soon as they are available,
+    so the forms of only a few languages are held in memory at any time.
+
+    The report `format` can be "text", for reading and editing, or "tsv" or
+    "json", both of which `lexedata.edit.merge_homophones` can read.
+
+    """
+    try:
+        clics = load_compiled_clics()
+    except OSError:
+        clics = None
     # warn if clics cannot be loaded
-    if not clics:
+    if not clics or not clics.nodes:
         logger.warning("Clics could not be loaded. Using an empty graph instead")
-        clics = nx.Graph()
+        clics = ClicsGraph.from_networkx(nx.Graph())
 
     c_id = dataset["ParameterTable", "id"].name
     try:
@@ -36,45 +221,85 @@ def list_homophones(
     for concept in dataset["ParameterTable"]:
         concepticon[concept[c_id]] = concept[c_concepticon]
 
-    f_id = dataset["FormTable", "id"].name
-    f_lang = dataset["FormTable", "languageReference"].name
-    f_concept = dataset["FormTable", "parameterReference"].name
-    f_form = dataset["FormTable", "form"].name
-
-    homophones: t.DefaultDict[
-        str, t.DefaultDict[str, t.Set[t.Tuple[str, str]]]
-    ] = t.DefaultDict(lambda: t.DefaultDict(set))
-
-    for form in dataset["FormTable"]:
-        if form[f_form] == "-" or form[f_form] is None:
-            continue
-        if isinstance(form[f_concept], list):
-            homophones[form[f_lang]][form[f_form]].add(
-                tuple(form[f_concept]) + (form[f_id],)
-            )
+    def classified_languages() -> t.Iterator[t.Tuple[str, t.List[Group]]]:
+        if jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_set_worker_data,
+                initargs=(clics, concepticon),
+            ) as pool:
+                # Only keep a few languages in flight, instead of submitting
+                # the forms of all languages at once.
+                pending: t.Deque[concurrent.futures.Future] = collections.deque()
+                for language, forms in forms_by_language(dataset):
+                    pending.append(
+                        pool.submit(_classify_language, (language, forms, approximate))
+                    )
+                    if len(pending) >= 2 * jobs:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
         else:
-            homophones[form[f_lang]][form[f_form]].add((form[f_concept], form[f_id]))
+            _set_worker_data(clics, concepticon)
+            for language, forms in forms_by_language(dataset):
+                yield _classify_language((language, forms, approximate))
+
     with output.open("w", encoding="utf8", newline="") as out:
-        for lang, forms in homophones.items():
-            for form, meanings in forms.items():
-                if len(meanings) == 1:
-                    continue
-                clics_nodes = {concepticon.get(concept) for concept in meanings}
-                if None in clics_nodes:
-                    x = "(but at least one concept not found):"
-                else:
-                    x = ":"
-                clics_nodes -= {None}
-                if len(clics_nodes) <= 1:
-                    x = "Unknown " + x
-                elif nx.is_connected(clics.subgraph(clics_nodes)):
-                    x = "Connected " + x
+        if format == "tsv":
+            writer = csv.writer(out, delimiter="\t")
+            writer.writerow(
+                [
+                    "Group",
+                    "Language_ID",
+                    "Form",
+                    "Connectivity",
+                    "All_Concepts_In_CLICS",
+                    "Form_ID",
+                    "Parameter_ID",
+                ]
+            )
+        elif format == "json":
+            out.write("[")
+        n = 0
+        for lang, groups in classified_languages():
+            for form, meanings, connectivity, all_found in groups:
+                n += 1
+                if format == "tsv":
+                    for ele in meanings:
+                        writer.writerow(
+                            [
+                                n,
+                                lang,
+                                form,
+                                connectivity,
+                                all_found,
+                                ele[-1],
+                                "; ".join(ele[:-1]),
+                            ]
+                        )
+                elif format == "json":
+                    group = {
+                        "language": lang,
+                        "form": form,
+                        "connectivity": connectivity,
+                        "all_concepts_in_clics": all_found,
+                        "forms": [
+                            {"id": ele[-1], "concepts": list(ele[:-1])}
+                            for ele in meanings
+                        ],
+                    }
+                    out.write(("\n" if n == 1 else ",\n") + json.dumps(group))
                 else:
-                    x = "Unconnected " + x
-                line = f"{lang}, {form}: {x}\n"
-                for ele in meanings:
-                    line += f"\t {ele[-1]}, ({', '.join(ele[0:-1])})\n"
-                out.write(line)
+                    if all_found:
+                        x = f"{connectivity} :"
+                    else:
+                        x = f"{connectivity} (but at least one concept not found):"
+                    line = f"{lang}, {form}: {x}\n"
+                    for ele in meanings:
+                        line += f"\t {ele[-1]}, ({', '.join(ele[0:-1])})\n"
+                    out.write(line)
+        if format == "json":
+            out.write("\n]\n")
 
 
 if __name__ == "__main__":
@@ -82,10 +307,46 @@ if __name__ == "__main__":
     parser.add_argument(
         "--output-file", help="Path to output file", type=Path, default="homophones.txt"
     )
+    parser.add_argument(
+        "--format",
+        choices=["text", "tsv", "json"],
+        default=None,
+        help="Format of the report. The tsv and json formats can be read by"
+        " lexedata.edit.merge_homophones."
+        " (default: Guess from the extension of the output file, otherwise text)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Classify the homophones of the languages in N parallel worker"
+        " processes (default: 1)",
+    )
+    parser.add_argument(
+        "--approximate",
+        type=float,
+        default=None,
+        metavar="THRESHOLD",
+        help="Instead of identical forms, report pairs of different forms with"
+        " a normalized edit distance of at most THRESHOLD, between 0 and 1,"
+        " e.g. forms differing only in diacritics. (default: Report identical forms)",
+    )
     args = parser.parse_args()
     logger = cli.setup_logging(args)
+    if args.jobs < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--jobs must be at least 1.")
+    if args.approximate is not None and not 0 <= args.approximate < 1:
+        cli.Exit.CLI_ARGUMENT_ERROR("--approximate must be between 0 and 1.")
+    format = args.format
+    if format is None:
+        format = {".tsv": "tsv", ".json": "json"}.get(args.output_file.suffix, "text")
     list_homophones(
         dataset=pycldf.Dataset.from_metadata(args.metadata),
         output=args.output_file,
         logger=logger,
+        format=format,
+        jobs=args.jobs,
+        approximate=args.approximate,
     )
@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*-
 import re
-import zipfile
 import typing as t
-from pathlib import Path
 
 import unicodedata
 import unidecode as uni
@@ -14,6 +12,7 @@ from lexedata.cli import tq
 
 from ..types import KeyKeyDict
 from . import fs
+from . import clics
 
 __all__ = [fs, KeyKeyDict]
 
@@ -76,24 +75,14 @@ def edit_distance(text1: str, text2: str) -> float:
     return ldn_swap(text1, text2, normalized=False) / length
 
 
-def load_clics():
-    gml_file = (
-        Path(__file__).parent.parent
-        / "data/clics-clics3-97832b5/clics3-network.gml.zip"
-    )
-    if not gml_file.exists():
-        import urllib.request
+def load_clics() -> networkx.Graph:
+    """Load the CLICS network, downloading it if necessary.
 
-        file_name, headers = urllib.request.urlretrieve(
-            "https://zenodo.org/record/3687530/files/clics/clics3-v1.1.zip?download=1"
-        )
-        zfobj = zipfile.ZipFile(file_name)
-        zfobj.extract(
-            "clics-clics3-97832b5/clics3-network.gml.zip",
-            Path(__file__).parent.parent / "data/",
-        )
-    gml = zipfile.ZipFile(gml_file).open("graphs/network-3-families.gml", "r")
-    return networkx.parse_gml(line.decode("utf-8") for line in gml)
+    The graph is compiled and cached by `lexedata.util.clics`, and shared
+    within the process, so it must not be modified.
+
+    """
+    return clics.load_clics_graph()
 
 
 def parse_segment_slices(
@@ -0,0 +1,76 @@
+"""A BK-tree for finding similar strings without comparing all pairs.
+
+A BK-tree indexes strings under a metric with integer values, here the
+Levenshtein distance. Thanks to the triangle inequality, a query for all
+strings within some distance of a string only needs to visit a small part of
+the tree.
+
+"""
+
+import typing as t
+
+from lingpy.align.pairwise import edit_dist
+
+
+def levenshtein(text1: t.Sequence, text2: t.Sequence) -> int:
+    """The Levenshtein distance between two sequences.
+
+    >>> levenshtein("kata", "kaṭa")
+    1
+    >>> levenshtein("kata", "akta")
+    2
+    """
+    return int(edit_dist(text1, text2))
+
+
+class BKTree:
+    """A BK-tree of strings under the Levenshtein distance.
+
+    >>> tree = BKTree(["kata", "kota", "kotak", "pilu"])
+    >>> sorted(tree.query("kata", 1))
+    [(0, 'kata'), (1, 'kota')]
+    >>> sorted(tree.query("kata", 2))
+    [(0, 'kata'), (1, 'kota'), (2, 'kotak')]
+
+    """
+
+    def __init__(
+        self,
+        items: t.Iterable[str] = (),
+        distance: t.Callable[[str, str], int] = levenshtein,
+    ):
+        self.distance = distance
+        # Each node is a pair of its item and its children, keyed by their
+        # distance to the item.
+        self.root: t.Optional[t.Tuple[str, t.Dict[int, t.Any]]] = None
+        for item in items:
+            self.add(item)
+
+    def add(self, item: str) -> None:
+        if self.root is None:
+            self.root = (item, {})
+            return
+        node_item, children = self.root
+        while True:
+            d = self.distance(item, node_item)
+            if d == 0:
+                return
+            if d in children:
+                node_item, children = children[d]
+            else:
+                children[d] = (item, {})
+                return
+
+    def query(self, item: str, radius: int) -> t.Iterator[t.Tuple[int, str]]:
+        """Find all items within `radius` of `item`, with their distances."""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node_item, children = stack.pop()
+            d = self.distance(item, node_item)
+            if d <= radius:
+                yield d, node_item
+            for child_d, child in children.items():
+                if d - radius <= child_d <= d + radius:
+                    stack.append(child)
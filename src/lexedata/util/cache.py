@@ -0,0 +1,151 @@
+"""Persistent on-disk caches for expensive derived data.
+
+Cached objects live in one directory, by default `~/.cache/lexedata` (or the
+`lexedata` subdirectory of `$XDG_CACHE_HOME`), which can be overridden using
+the `LEXEDATA_CACHE_DIR` environment variable. Each cached object is stored
+under a name and a key, where the key should change whenever the data the
+object was derived from changes, e.g. the version of a catalog.
+
+"""
+
+import os
+import pickle
+import hashlib
+import tempfile
+import typing as t
+from pathlib import Path
+
+import cldfcatalog
+
+from lexedata.cli import logger
+
+
+def cache_directory(directory: t.Optional[Path] = None) -> Path:
+    """Return the lexedata cache directory, creating it if necessary.
+
+    If a directory is given explicitly, that one is used instead.
+    """
+    directory = directory or os.environ.get("LEXEDATA_CACHE_DIR")
+    if directory:
+        path = Path(directory)
+    else:
+        path = (
+            Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+            / "lexedata"
+        )
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def catalog_version(catalog: cldfcatalog.Catalog) -> t.Optional[str]:
+    """Return a version string for a catalog clone, if it has a reliable one.
+
+    Catalogs that are not git repositories, or have uncommitted changes, have
+    no reliable version, so derived data must not be cached for them.
+    """
+    try:
+        if catalog.is_dirty():
+            return None
+        return "{:}-{:}".format(catalog.describe(), catalog.dir.resolve())
+    except ValueError:
+        return None
+
+
+def cache_file(name: str, key: str, directory: t.Optional[Path] = None) -> Path:
+    """Return the path for the object `name` derived from data with `key`.
+
+    >>> cache_file("bipa", "v2.1.0", directory=Path(tempfile.mkdtemp())).name
+    'bipa-2703e112a2c2.pickle'
+    """
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return cache_directory(directory) / f"{name}-{digest}.pickle"
+
+
+def load_pickle(
+    name: str, key: str, directory: t.Optional[Path] = None
+) -> t.Optional[t.Any]:
+    """Load a cached object, or return None if it is not cached.
+
+    >>> directory = Path(tempfile.mkdtemp())
+    >>> load_pickle("test", "1", directory) is None
+    True
+    >>> store_pickle("test", "1", {"a": 1}, directory)
+    >>> load_pickle("test", "1", directory)
+    {'a': 1}
+    >>> load_pickle("test", "2", directory) is None
+    True
+    """
+    try:
+        path = cache_file(name, key, directory)
+        with path.open("rb") as cached:
+            obj = pickle.load(cached)
+        # Mark the file as recently used, for `evict`
+        os.utime(path)
+        return obj
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.info(f"Could not read {name} from the cache: {e}")
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        logger.warning(f"Cache file {path} is corrupt and will be ignored.")
+        return None
+
+
+def store_pickle(
+    name: str, key: str, obj: t.Any, directory: t.Optional[Path] = None
+) -> None:
+    """Store an object in the cache.
+
+    The object is written to a temporary file first, so that concurrent
+    readers never see a partially written cache file. Failure to cache is not
+    fatal, it is only logged.
+
+    >>> not_a_directory = Path(tempfile.mkstemp()[1])
+    >>> store_pickle("test", "1", {"a": 1}, not_a_directory / "cache")
+    """
+    temporary = None
+    try:
+        path = cache_file(name, key, directory)
+        handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(handle, "wb") as cached:
+            pickle.dump(obj, cached, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+        if temporary is not None and Path(temporary).exists():
+            Path(temporary).unlink()
+        logger.info(f"Could not cache {name}: {e}")
+
+
+def evict(directory: Path, pattern: str, max_bytes: int) -> None:
+    """Remove least recently used cache files until they fit in max_bytes.
+
+    Only files in the directory that match the glob pattern are considered.
+    Their modification time is taken as time of last use, so code reading a
+    cache file should `touch` it.
+
+    >>> directory = Path(tempfile.mkdtemp())
+    >>> for i, name in enumerate(["old", "new", "other"]):
+    ...     _ = (directory / f"{name}.tsv").write_text("x" * 10)
+    ...     os.utime(directory / f"{name}.tsv", (i, i))
+    >>> evict(directory, "*.tsv", 25)
+    >>> sorted(p.name for p in directory.iterdir())
+    ['new.tsv', 'other.tsv']
+    """
+    files = []
+    for path in directory.glob(pattern):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+            logger.debug(f"Evicted {path} from the cache.")
+        except FileNotFoundError:
+            pass
+        total -= size
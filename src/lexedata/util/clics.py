@@ -0,0 +1,196 @@
+"""Fast access to the CLICS colexification network.
+
+Parsing the GML file of the CLICS network takes several seconds. The graph is
+therefore compiled into plain arrays – the node IDs, their Concepticon
+glosses, and the adjacency in compressed sparse row (CSR) form – which are
+pickled in the lexedata cache directory, and loaded only once per process.
+
+"""
+
+import array
+import zipfile
+import functools
+import typing as t
+from pathlib import Path
+
+import attr
+import networkx
+
+from lexedata.util import cache
+
+GML_FILE = (
+    Path(__file__).parent.parent / "data/clics-clics3-97832b5/clics3-network.gml.zip"
+)
+GML_MEMBER = "graphs/network-3-families.gml"
+# Increase this when the compiled format changes, to invalidate old files.
+FORMAT_VERSION = 1
+
+
+@attr.s(auto_attribs=True)
+class ClicsGraph:
+    """The CLICS network, compiled into arrays.
+
+    The nodes are Concepticon IDs (as strings), and the neighbours of the
+    node with index i are `indices[indptr[i]:indptr[i + 1]]`.
+
+    >>> graph = ClicsGraph.from_networkx(networkx.Graph([("1", "2"), ("2", "3")]))
+    >>> graph.nodes
+    ['1', '2', '3']
+    >>> sorted(graph.neighbours("2"))
+    ['1', '3']
+
+    """
+
+    nodes: t.List[str]
+    glosses: t.Dict[str, t.Optional[str]]
+    indptr: array.array
+    indices: array.array
+    index: t.Dict[str, int] = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+
+    @classmethod
+    def from_networkx(cls, graph: networkx.Graph) -> "ClicsGraph":
+        nodes = [str(node) for node in graph.nodes]
+        index = {node: i for i, node in enumerate(graph.nodes)}
+        indptr = array.array("l", [0])
+        indices = array.array("l")
+        for node in graph.nodes:
+            indices.extend(sorted(index[n] for n in graph.neighbors(node)))
+            indptr.append(len(indices))
+        glosses = {
+            str(node): data.get("Gloss") for node, data in graph.nodes(data=True)
+        }
+        return cls(nodes, glosses, indptr, indices)
+
+    def neighbour_indices(self, i: int) -> array.array:
+        return self.indices[self.indptr[i] : self.indptr[i + 1]]
+
+    def neighbours(self, node: str) -> t.Iterator[str]:
+        for j in self.neighbour_indices(self.index[node]):
+            yield self.nodes[j]
+
+    def is_connected(self, nodes: t.Iterable[t.Any]) -> bool:
+        """Check whether these nodes induce a connected subgraph.
+
+        Nodes that are not in CLICS are ignored, like in a networkx subgraph.
+        The components are found with a union-find structure over the given
+        nodes only, looking up neighbours in the adjacency arrays.
+
+        >>> graph = ClicsGraph.from_networkx(
+        ...     networkx.Graph([("1", "2"), ("2", "3"), ("4", "5")]))
+        >>> graph.is_connected({"1", "2", "3"})
+        True
+        >>> graph.is_connected({"1", "3"})
+        False
+        >>> graph.is_connected({"1", "2", 999})
+        True
+        >>> graph.is_connected({"999"})
+        False
+
+        """
+        parent = {
+            self.index[str(node)]: self.index[str(node)]
+            for node in nodes
+            if str(node) in self.index
+        }
+        if not parent:
+            return False
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        components = len(parent)
+        for i in list(parent):
+            for j in self.neighbour_indices(i):
+                if j in parent:
+                    root_i, root_j = find(i), find(j)
+                    if root_i != root_j:
+                        parent[root_i] = root_j
+                        components -= 1
+                        if components == 1:
+                            return True
+        return components == 1
+
+    def are_connected(self, groups: t.Iterable[t.Iterable[t.Any]]) -> t.List[bool]:
+        """Check for each group of nodes whether it induces a connected subgraph.
+
+        >>> graph = ClicsGraph.from_networkx(networkx.Graph([("1", "2"), ("3", "4")]))
+        >>> graph.are_connected([{"1", "2"}, {"2", "3"}])
+        [True, False]
+
+        """
+        return [self.is_connected(group) for group in groups]
+
+    def to_networkx(self) -> networkx.Graph:
+        graph = networkx.Graph()
+        for node in self.nodes:
+            graph.add_node(node, Gloss=self.glosses.get(node))
+        for i, node in enumerate(self.nodes):
+            for j in self.neighbour_indices(i):
+                if j > i:
+                    graph.add_edge(node, self.nodes[j])
+        return graph
+
+    def __getstate__(self):
+        return (self.nodes, self.glosses, self.indptr, self.indices)
+
+    def __setstate__(self, state):
+        self.nodes, self.glosses, self.indptr, self.indices = state
+        self.__attrs_post_init__()
+
+
+def download_clics(gml_file: Path = GML_FILE) -> None:
+    import urllib.request
+
+    file_name, headers = urllib.request.urlretrieve(
+        "https://zenodo.org/record/3687530/files/clics/clics3-v1.1.zip?download=1"
+    )
+    zfobj = zipfile.ZipFile(file_name)
+    zfobj.extract(
+        "clics-clics3-97832b5/clics3-network.gml.zip",
+        gml_file.parent.parent,
+    )
+
+
+def parse_clics(gml_file: Path = GML_FILE) -> networkx.Graph:
+    """Parse the CLICS network from the zipped GML file."""
+    gml = zipfile.ZipFile(gml_file).open(GML_MEMBER, "r")
+    return networkx.parse_gml(line.decode("utf-8") for line in gml)
+
+
+@functools.lru_cache(maxsize=None)
+def load_compiled_clics(
+    gml_file: Path = GML_FILE, cache_dir: t.Optional[Path] = None
+) -> ClicsGraph:
+    """Load the compiled CLICS network, compiling it if necessary.
+
+    The compiled graph is stored in the cache directory (see
+    `lexedata.util.cache`), keyed by the path, size and modification time of
+    the GML file. If it cannot be stored, it is compiled again next time. It
+    is shared within the process, so it must not be modified.
+
+    """
+    if gml_file == GML_FILE and not gml_file.exists():
+        download_clics(gml_file)
+    stat = gml_file.stat()
+    key = f"{FORMAT_VERSION}:{gml_file.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+    graph = cache.load_pickle("clics", key, cache_dir)
+    if graph is None:
+        graph = ClicsGraph.from_networkx(parse_clics(gml_file))
+        cache.store_pickle("clics", key, graph, cache_dir)
+    return graph
+
+
+@functools.lru_cache(maxsize=None)
+def load_clics_graph(gml_file: Path = GML_FILE) -> networkx.Graph:
+    """Load the CLICS network as networkx graph.
+
+    The graph is shared within the process, so it must not be modified.
+
+    """
+    return load_compiled_clics(gml_file).to_networkx()
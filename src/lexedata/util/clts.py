@@ -0,0 +1,45 @@
+"""Lazy access to the CLTS transcription systems.
+
+Loading a transcription system from the CLTS catalog takes several seconds, so
+it is only done when a transcription system is first needed, only once per
+process, and the result is cached on disk for the same catalog version.
+
+"""
+
+import functools
+import typing as t
+
+import pyclts
+import cldfbench
+import cldfcatalog
+
+from lexedata.util import cache
+
+
+@functools.lru_cache(maxsize=None)
+def get_clts() -> cldfbench.catalogs.CLTS:
+    """Return the configured CLTS catalog."""
+    return cldfbench.catalogs.CLTS(cldfcatalog.Config.from_file().get_clone("clts"))
+
+
+@functools.lru_cache(maxsize=None)
+def clts_version() -> t.Optional[str]:
+    """Return the version of the configured CLTS catalog, if it has a reliable one.
+
+    See `lexedata.util.cache.catalog_version`.
+    """
+    return cache.catalog_version(get_clts())
+
+
+@functools.lru_cache(maxsize=None)
+def get_bipa() -> pyclts.TranscriptionSystem:
+    """Return the BIPA transcription system of the configured CLTS catalog."""
+    version = clts_version()
+    if version is not None:
+        bipa = cache.load_pickle("bipa", version)
+        if bipa is not None:
+            return bipa
+    bipa = get_clts().api.bipa
+    if version is not None:
+        cache.store_pickle("bipa", version, bipa)
+    return bipa
@@ -1,10 +1,14 @@
+import os
 import csv
+import contextlib
 import shutil
 import tempfile
 import typing as t
 from pathlib import Path
 
 import pycldf
+import csvw.metadata
+from csvw.dsv import UnicodeWriter
 
 from lexedata.util.add_metadata import add_metadata
 
@@ -58,6 +62,221 @@ def new_wordlist(path: t.Optional[Path] = None, **data):
     return dataset
 
 
+def _replace(temporary: t.Union[str, Path], target: Path) -> None:
+    """Move a temporary file in place of the target file.
+
+    `mkstemp` creates files only readable by their owner, so the temporary
+    file gets the mode of the target file first, or the mode of a newly
+    created file if there is no target file yet.
+    """
+    try:
+        shutil.copymode(target, temporary)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary, 0o666 & ~umask)
+    os.replace(temporary, target)
+
+
+def write_table_atomically(
+    dataset: pycldf.Dataset, table: str, rows: t.Iterable[t.Mapping[str, t.Any]]
+) -> int:
+    """Write rows to a table of the dataset through a temporary file.
+
+    The rows are streamed into a temporary file next to the table file, which
+    replaces the table file only once all rows are written. This means that
+    `rows` may be a generator lazily reading the very same table, and that a
+    crash cannot leave a truncated table behind. The table's dc:extent is
+    updated and the metadata is written.
+
+    Return the number of rows written.
+
+    >>> ds = new_wordlist(FormTable=[
+    ...     {"ID": "f1", "Language_ID": "l", "Parameter_ID": "p", "Form": "a"},
+    ...     {"ID": "f2", "Language_ID": "l", "Parameter_ID": "p", "Form": "b"}])
+    >>> write_table_atomically(
+    ...     ds, "FormTable", (dict(row, Form=row["Form"] * 2) for row in ds["FormTable"]))
+    2
+    >>> [row["Form"] for row in ds["FormTable"]]
+    ['aa', 'bb']
+    """
+    target = dataset.directory / str(dataset[table].url)
+    handle, temporary = tempfile.mkstemp(
+        dir=target.parent, prefix=f".{target.name}.", suffix=".tmp"
+    )
+    os.close(handle)
+    try:
+        count = dataset[table].write(rows, fname=temporary)
+        _replace(temporary, target)
+    except BaseException:
+        Path(temporary).unlink()
+        raise
+    dataset[table].common_props["dc:extent"] = count
+    dataset.write_metadata()
+    return count
+
+
+def _format_row(
+    columns: t.Sequence[csvw.metadata.Column], row: t.Mapping[str, t.Any]
+) -> t.List[str]:
+    # The same lookup of values as in csvw.metadata.Table.write
+    return [c.write(row.get(c.header, row.get(f"{c}"))) for c in columns]
+
+
+@contextlib.contextmanager
+def table_writer(
+    dataset: pycldf.Dataset, table: str, exclude: t.Container[str] = ()
+) -> t.Iterator[t.Callable[[t.Mapping[str, t.Any]], None]]:
+    """Write rows to a table of the dataset one by one, through a temporary file.
+
+    This allows writing several tables at the same time, eg. while reading
+    yet another one, or the very same one. The temporary file replaces the
+    table file only when the context exits without an exception. Columns
+    whose names are in `exclude` are left out. The table's dc:extent is
+    updated and the metadata is written.
+
+    >>> ds = new_wordlist(FormTable=[
+    ...     {"ID": "f1", "Language_ID": "l", "Parameter_ID": "p", "Form": "a"}])
+    >>> with table_writer(ds, "FormTable") as write:
+    ...     for row in ds["FormTable"]:
+    ...         write(row)
+    ...         write(dict(row, ID="f2", Form="b"))
+    >>> [row["Form"] for row in ds["FormTable"]]
+    ['a', 'b']
+    """
+    target = dataset.directory / str(dataset[table].url)
+    dialect = dataset[table]._get_dialect()
+    columns = [
+        c
+        for c in dataset[table].tableSchema.columns
+        if not c.virtual and c.name not in exclude
+    ]
+    handle, temporary = tempfile.mkstemp(
+        dir=target.parent, prefix=f".{target.name}.", suffix=".tmp"
+    )
+    count = 0
+    try:
+        with open(handle, "w", encoding=dialect.python_encoding, newline="") as file:
+            with UnicodeWriter(file, dialect=dialect) as writer:
+                if dialect.header:
+                    writer.writerow([c.header for c in columns])
+
+                def write(row: t.Mapping[str, t.Any]) -> None:
+                    nonlocal count
+                    writer.writerow(_format_row(columns, row))
+                    count += 1
+
+                yield write
+        _replace(temporary, target)
+    except BaseException:
+        Path(temporary).unlink()
+        raise
+    dataset[table].common_props["dc:extent"] = count
+    dataset.write_metadata()
+
+
+@contextlib.contextmanager
+def rollback_on_failure(
+    dataset: pycldf.Dataset, tables: t.Iterable[str]
+) -> t.Iterator[None]:
+    """Undo rows appended to tables of the dataset if the context fails.
+
+    The table files are truncated back to their length on entry, and removed
+    if they did not exist yet, and the tables' dc:extent is restored. Use this
+    around several calls of `append_rows` that must succeed or fail together.
+
+    >>> ds = new_wordlist(FormTable=[
+    ...     {"ID": "f1", "Language_ID": "l", "Parameter_ID": "p", "Form": "a"}])
+    >>> with rollback_on_failure(ds, ["FormTable"]):
+    ...     append_rows(
+    ...         ds, "FormTable", [{"ID": "f2", "Language_ID": "l", "Parameter_ID": "p", "Form": "b"}])
+    ...     raise ValueError
+    Traceback (most recent call last):
+    ...
+    ValueError
+    >>> [row["Form"] for row in ds["FormTable"]]
+    ['a']
+    """
+    sizes: t.Dict[Path, t.Optional[int]] = {}
+    extents: t.Dict[str, t.Any] = {}
+    for table in tables:
+        target = dataset.directory / str(dataset[table].url)
+        try:
+            sizes[target] = target.stat().st_size
+        except FileNotFoundError:
+            sizes[target] = None
+        extents[table] = dataset[table].common_props.get("dc:extent")
+    try:
+        yield
+    except BaseException:
+        for target, size in sizes.items():
+            if size is None:
+                if target.exists():
+                    target.unlink()
+            else:
+                os.truncate(target, size)
+        if any(
+            dataset[table].common_props.get("dc:extent") != extent
+            for table, extent in extents.items()
+        ):
+            for table, extent in extents.items():
+                if extent is None:
+                    dataset[table].common_props.pop("dc:extent", None)
+                else:
+                    dataset[table].common_props["dc:extent"] = extent
+            dataset.write_metadata()
+        raise
+
+
+def append_rows(
+    dataset: pycldf.Dataset, table: str, rows: t.Iterable[t.Mapping[str, t.Any]]
+) -> int:
+    """Append rows to a table of the dataset, without rewriting the table.
+
+    A missing or empty table file is created with a header first. If writing
+    fails, the table file is truncated back to its original length, so a crash
+    cannot leave a partial row behind. The table's dc:extent is updated, if it
+    was given, and the metadata is written.
+
+    Return the number of rows appended.
+
+    >>> ds = new_wordlist(FormTable=[
+    ...     {"ID": "f1", "Language_ID": "l", "Parameter_ID": "p", "Form": "a"}])
+    >>> append_rows(
+    ...     ds, "FormTable", [{"ID": "f2", "Language_ID": "l", "Parameter_ID": "p", "Form": "b"}])
+    1
+    >>> [row["Form"] for row in ds["FormTable"]]
+    ['a', 'b']
+    """
+    target = dataset.directory / str(dataset[table].url)
+    dialect = dataset[table]._get_dialect()
+    columns = [c for c in dataset[table].tableSchema.columns if not c.virtual]
+    try:
+        size = target.stat().st_size
+    except FileNotFoundError:
+        size = 0
+    if size:
+        with target.open("rb") as content:
+            content.seek(-1, os.SEEK_END)
+            complete = content.read(1) in b"\r\n"
+    count = 0
+    with rollback_on_failure(dataset, [table]):
+        with target.open("a", encoding=dialect.python_encoding, newline="") as file:
+            if size and not complete:
+                file.write(dialect.lineTerminators[0])
+            with UnicodeWriter(file, dialect=dialect) as writer:
+                if not size and dialect.header:
+                    writer.writerow([c.header for c in columns])
+                for row in rows:
+                    writer.writerow(_format_row(columns, row))
+                    count += 1
+    extent = dataset[table].common_props.get("dc:extent")
+    if extent is not None:
+        dataset[table].common_props["dc:extent"] = extent + count
+        dataset.write_metadata()
+    return count
+
+
 def get_dataset(fname: Path) -> pycldf.Dataset:
     """Load a CLDF dataset.
 
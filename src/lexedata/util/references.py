@@ -0,0 +1,286 @@
+"""Find the columns, and rows, that refer to the rows of a table.
+
+The references between the tables of a dataset are given by the foreign keys
+in the metadata and, for datasets with incomplete metadata, by the CLDF
+reference properties of the columns (eg. a #languageReference column refers to
+the #id of the #LanguageTable). The CLDF specifications state that foreign
+keys take precedence over the implicit semantics of a reference property, so
+a column is taken from its reference property only if it is not part of a
+foreign key.
+
+`reference_graph` collects these references from the metadata, once per
+state of the metadata. On top of that, a `ReverseIndex` answers which rows
+refer to a given row, reading each referring table only once.
+
+"""
+
+import typing as t
+import weakref
+
+import pycldf
+from pycldf.terms import TERMS
+
+from lexedata import cli
+from lexedata.util import cldf_property
+
+
+class Reference(t.NamedTuple):
+    """A column that refers to some column of another table.
+
+    `table` is the URL of the referring table, `separator` is the separator of
+    the column if it contains a list of references, and `referenced_column` is
+    the column of the referenced table it refers to. `foreign_key` tells
+    whether the reference is a foreign key, instead of being implied by a CLDF
+    reference property.
+
+    """
+
+    table: str
+    column: str
+    separator: t.Optional[str]
+    referenced_column: str
+    foreign_key: bool = True
+
+
+def _table_url(dataset: pycldf.Dataset, component: str) -> t.Optional[str]:
+    try:
+        return dataset[component].url.string
+    except KeyError:
+        return None
+
+
+def _metadata_key(dataset: pycldf.Dataset) -> t.Tuple:
+    return tuple(
+        (
+            table.url.string,
+            tuple(
+                (column.name, str(column.propertyUrl), column.separator)
+                for column in table.tableSchema.columns
+            ),
+            tuple(
+                (
+                    tuple(foreign_key.columnReference),
+                    foreign_key.reference.resource.string,
+                    tuple(foreign_key.reference.columnReference),
+                )
+                for foreign_key in table.tableSchema.foreignKeys
+            ),
+        )
+        for table in dataset.tables
+    )
+
+
+# The columns referring to each table, keyed by the URL of the table
+Graph = t.Dict[str, t.List[Reference]]
+# The cached graphs, with the metadata they were computed from
+_graphs: t.MutableMapping[
+    pycldf.Dataset, t.Tuple[t.Tuple, Graph]
+] = weakref.WeakKeyDictionary()
+
+
+def reference_graph(dataset: pycldf.Dataset) -> Graph:
+    """Find, for each table, all columns that refer to it.
+
+    The tables are given by their URLs. The graph is cached for the dataset,
+    and computed again only if the tables, columns or foreign keys of the
+    dataset change. It is shared, so it must not be modified.
+
+    >>> from lexedata.util.fs import new_wordlist
+    >>> ds = new_wordlist(
+    ...     FormTable=[{"ID": "f", "Language_ID": "l", "Parameter_ID": "p", "Form": "a"}],
+    ...     LanguageTable=[{"ID": "l"}])
+    >>> reference_graph(ds)["languages.csv"]
+    [Reference(table='forms.csv', column='Language_ID', separator=None, referenced_column='ID', foreign_key=True)]
+    >>> reference_graph(ds)["forms.csv"]
+    []
+    >>> reference_graph(ds) is reference_graph(ds)
+    True
+
+    """
+    key = _metadata_key(dataset)
+    try:
+        cached_key, graph = _graphs[dataset]
+        if cached_key == key:
+            return graph
+    except KeyError:
+        pass
+
+    graph: Graph = {table.url.string: [] for table in dataset.tables}
+    for table in dataset.tables:
+        in_foreign_key = set()
+        for foreign_key in table.tableSchema.foreignKeys:
+            target = foreign_key.reference.resource.string
+            in_foreign_key.update(foreign_key.columnReference)
+            if target not in graph:
+                continue
+            for column, referenced in zip(
+                foreign_key.columnReference, foreign_key.reference.columnReference
+            ):
+                graph[target].append(
+                    Reference(
+                        table.url.string,
+                        column,
+                        table.get_column(column).separator,
+                        referenced,
+                    )
+                )
+        for column in table.tableSchema.columns:
+            if column.name in in_foreign_key:
+                continue
+            term = column.propertyUrl and cldf_property(column.propertyUrl)
+            if term not in TERMS or not TERMS[term].references:
+                continue
+            target = _table_url(dataset, TERMS[term].references)
+            if target is None:
+                continue
+            c_id = dataset[target].get_column("http://cldf.clld.org/v1.0/terms.rdf#id")
+            if c_id is None:
+                continue
+            graph[target].append(
+                Reference(
+                    table.url.string,
+                    column.name,
+                    column.separator,
+                    c_id.name,
+                    foreign_key=False,
+                )
+            )
+    _graphs[dataset] = (key, graph)
+    return graph
+
+
+def references_to(
+    dataset: pycldf.Dataset,
+    table: str,
+    from_table: t.Optional[str] = None,
+    column: t.Optional[str] = None,
+) -> t.List[Reference]:
+    """Find the columns referring to a table.
+
+    Only consider columns in `from_table`, or columns referring to `column`
+    (eg. the #id column), if given. Tables can be given as component names or
+    URLs, and columns as CLDF properties or names.
+
+    >>> from lexedata.util.fs import new_wordlist
+    >>> ds = new_wordlist(
+    ...     FormTable=[{"ID": "f", "Language_ID": "l", "Parameter_ID": "p", "Form": "a"}],
+    ...     LanguageTable=[{"ID": "l"}], CognateTable=[])
+    >>> [r.column for r in references_to(ds, "FormTable", from_table="CognateTable")]
+    ['Form_ID']
+    >>> references_to(ds, "LanguageTable", column="id")[0].referenced_column
+    'ID'
+
+    """
+    target = dataset[table].url.string
+    if from_table is not None:
+        from_table = dataset[from_table].url.string
+    if column is not None:
+        column = dataset[target, column].name
+    return [
+        reference
+        for reference in reference_graph(dataset)[target]
+        if from_table in (None, reference.table)
+        if column in (None, reference.referenced_column)
+    ]
+
+
+def referring_column(
+    dataset: pycldf.Dataset, table: str, from_table: str
+) -> t.Optional[str]:
+    """Find the column of `from_table` that refers to `table`, if there is one.
+
+    >>> from lexedata.util.fs import new_wordlist
+    >>> ds = new_wordlist(
+    ...     FormTable=[{"ID": "f", "Language_ID": "l", "Parameter_ID": "p", "Form": "a"}],
+    ...     LanguageTable=[{"ID": "l"}])
+    >>> referring_column(ds, "LanguageTable", "FormTable")
+    'Language_ID'
+    >>> referring_column(ds, "FormTable", "LanguageTable") is None
+    True
+
+    """
+    for reference in references_to(dataset, table, from_table=from_table):
+        return reference.column
+    return None
+
+
+class ReverseIndex:
+    """Look up which rows refer to a row.
+
+    The index of a referring table is built when it is first needed, in one
+    pass through that table, and lists the IDs of the referring rows for each
+    referenced value.
+
+    >>> from lexedata.util.fs import new_wordlist
+    >>> ds = new_wordlist(
+    ...     FormTable=[{"ID": "f1", "Language_ID": "l", "Parameter_ID": "p", "Form": "a"},
+    ...         {"ID": "f2", "Language_ID": "l", "Parameter_ID": "p", "Form": "b"}],
+    ...     CognateTable=[{"ID": "j1", "Form_ID": "f1", "Cognateset_ID": "s"},
+    ...         {"ID": "j2", "Form_ID": "f1", "Cognateset_ID": "t"}])
+    >>> index = ReverseIndex(ds)
+    >>> index.referring("FormTable", "f1")
+    {'cognates.csv': ['j1', 'j2']}
+    >>> index.referring("FormTable", "f2")
+    {}
+
+    """
+
+    def __init__(
+        self, dataset: pycldf.Dataset, logger: cli.logging.Logger = cli.logger
+    ):
+        self.dataset = dataset
+        self.logger = logger
+        self._indices: t.Dict[str, t.Dict[Reference, t.Dict[t.Any, t.List[t.Any]]]] = {}
+
+    def index(self, table: str) -> t.Dict[Reference, t.Dict[t.Any, t.List[t.Any]]]:
+        """Index all references in `table`, by the referenced values."""
+        url = self.dataset[table].url.string
+        try:
+            return self._indices[url]
+        except KeyError:
+            pass
+        references = [
+            reference
+            for references in reference_graph(self.dataset).values()
+            for reference in references
+            if reference.table == url
+        ]
+        c_id = self.dataset[url].get_column("http://cldf.clld.org/v1.0/terms.rdf#id")
+        index: t.Dict[Reference, t.Dict[t.Any, t.List[t.Any]]] = {
+            reference: {} for reference in references
+        }
+        for row in cli.tq(
+            self.dataset[url],
+            task=f"Indexing references in {url}",
+            total=self.dataset[url].common_props.get("dc:extent"),
+            logger=self.logger,
+        ):
+            id = row[c_id.name] if c_id is not None else None
+            for reference in references:
+                values = row.get(reference.column)
+                if values is None:
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    index[reference].setdefault(value, []).append(id)
+        self._indices[url] = index
+        return index
+
+    def referring(
+        self, table: str, id: t.Any, from_table: t.Optional[str] = None
+    ) -> t.Dict[str, t.List[t.Any]]:
+        """Find the IDs of the rows referring to the row with `id` in `table`.
+
+        The result maps the URLs of the referring tables to the IDs of the
+        referring rows. Only tables with such rows are included.
+
+        """
+        referring: t.Dict[str, t.List[t.Any]] = {}
+        for reference in references_to(
+            self.dataset, table, from_table=from_table, column="id"
+        ):
+            rows = self.index(reference.table)[reference].get(id)
+            if rows:
+                referring.setdefault(reference.table, []).extend(rows)
+        return referring
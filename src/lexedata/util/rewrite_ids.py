@@ -0,0 +1,159 @@
+"""Rewrite IDs throughout a dataset.
+
+Changing the IDs of a table means changing all references to them, in other
+tables and possibly in the table itself. `rewrite_ids` does this for the ID
+mappings of any number of tables at once: It looks up all columns referring to
+the mapped tables once, and then streams every affected table through a
+temporary file in a single pass, replacing the table file only when all its
+rows are written.
+
+Mappings are keyed by the string form of the old IDs. For very large mappings,
+`ExternalMapping` keeps the mapping in an SQLite database on disk instead of
+in memory.
+
+"""
+
+import os
+import sqlite3
+import tempfile
+import typing as t
+from pathlib import Path
+
+import pycldf
+
+from lexedata import cli
+from lexedata.util import fs
+from lexedata.util.references import references_to
+
+
+class ExternalMapping(t.Mapping[str, t.Any]):
+    """A mapping of IDs, stored in a temporary SQLite database on disk.
+
+    >>> with ExternalMapping([("a", "x"), ("b", 2)]) as mapping:
+    ...     mapping.get("a"), mapping.get("b"), mapping.get("c"), len(mapping)
+    ('x', 2, None, 2)
+
+    """
+
+    def __init__(
+        self,
+        items: t.Iterable[t.Tuple[str, t.Any]],
+        directory: t.Optional[Path] = None,
+    ):
+        handle, path = tempfile.mkstemp(suffix=".sqlite", dir=directory)
+        os.close(handle)
+        self.path = Path(path)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.execute("CREATE TABLE mapping (old TEXT PRIMARY KEY, new)")
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO mapping VALUES (?, ?)",
+            ((str(old), new) for old, new in items),
+        )
+        self.connection.commit()
+
+    def __getitem__(self, key: str) -> t.Any:
+        row = self.connection.execute(
+            "SELECT new FROM mapping WHERE old = ?", (key,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __iter__(self) -> t.Iterator[str]:
+        for (old,) in self.connection.execute("SELECT old FROM mapping"):
+            yield old
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM mapping").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
+        self.path.unlink()
+
+    def __enter__(self) -> "ExternalMapping":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# A column to rewrite, and the mapping to apply to it
+Change = t.Tuple[str, t.Mapping[str, t.Any]]
+
+
+def _rewrite_rows(
+    rows: t.Iterable[t.Dict[str, t.Any]],
+    changes: t.Sequence[Change],
+    status_update: t.Optional[str],
+) -> t.Iterator[t.Dict[str, t.Any]]:
+    for row in rows:
+        changed = False
+        for column, mapping in changes:
+            value = row.get(column)
+            if value is None:
+                continue
+            elif isinstance(value, list):
+                new = [mapping.get(str(v), v) for v in value]
+            else:
+                new = mapping.get(str(value), value)
+            if new != value:
+                row[column] = new
+                changed = True
+        if changed and status_update:
+            row["Status_Column"] = status_update
+        yield row
+
+
+def rewrite_ids(
+    dataset: pycldf.Dataset,
+    mappings: t.Mapping[str, t.Mapping[str, t.Any]],
+    status_update: t.Optional[str] = None,
+    copy_datatypes: bool = False,
+    logger: cli.logging.Logger = cli.logger,
+) -> None:
+    """Change the IDs of tables, and all references to them.
+
+    `mappings` maps tables to mappings from old to new IDs. IDs that are not
+    in the mapping stay as they are. Every changed row gets the
+    `status_update`. With `copy_datatypes`, the referring columns get the
+    datatype of the ID column they refer to.
+
+    >>> ds = fs.new_wordlist(
+    ...     FormTable=[
+    ...         {"ID": "f1", "Language_ID": "l1", "Parameter_ID": "p", "Form": "a"},
+    ...         {"ID": "f2", "Language_ID": "l2", "Parameter_ID": "p", "Form": "b"}],
+    ...     LanguageTable=[{"ID": "l1"}, {"ID": "l2"}])
+    >>> rewrite_ids(ds, {"LanguageTable": {"l1": "one"}, "FormTable": {"f2": "b"}})
+    >>> [(f["ID"], f["Language_ID"]) for f in ds["FormTable"]]
+    [('f1', 'one'), ('b', 'l2')]
+    >>> [language["ID"] for language in ds["LanguageTable"]]
+    ['one', 'l2']
+
+    """
+    changes: t.Dict[str, t.List[Change]] = {}
+    for table, mapping in mappings.items():
+        target = dataset[table].url.string
+        c_id = dataset[target].get_column("http://cldf.clld.org/v1.0/terms.rdf#id")
+        changes.setdefault(target, []).append((c_id.name, mapping))
+        for reference in references_to(dataset, target, column=c_id.name):
+            changes.setdefault(reference.table, []).append((reference.column, mapping))
+            if copy_datatypes:
+                dataset[reference.table, reference.column].datatype = c_id.datatype
+
+    for table, columns in changes.items():
+        logger.info(
+            f"Applying changed IDs to columns {[c for c, _ in columns]} in {table}…"
+        )
+        fs.write_table_atomically(
+            dataset,
+            table,
+            _rewrite_rows(
+                cli.tq(
+                    dataset[table],
+                    task=f"Updating ids in {table}",
+                    total=dataset[table].common_props.get("dc:extent"),
+                ),
+                columns,
+                status_update,
+            ),
+        )
@@ -2,7 +2,14 @@ import logging
 from pathlib import Path
 import re
 
-from lexedata.edit.add_singleton_cognatesets import create_singeltons
+import pytest
+
+from lexedata.util import fs
+from lexedata.edit.add_singleton_cognatesets import (
+    add_singletons,
+    create_singeltons,
+    singleton_rows,
+)
 from lexedata.edit.add_status_column import add_status_column_to_table
 from helper_functions import copy_to_temp_no_bib
 
@@ -56,3 +63,60 @@ def test_singletons():
         },
         {"ID": "X3_ache", "Name": "five", "Status_Column": "automatic singleton"},
     ]
+
+
+def test_singletons_appended():
+    dataset, _ = copy_to_temp_no_bib(
+        Path(__file__).parent / "data/cldf/smallmawetiguarani/cldf-metadata.json"
+    )
+    cogsets = list(dataset["CognatesetTable"])
+    judgements = list(dataset["CognateTable"])
+    new_cogsets, new_judgements = singleton_rows(dataset=dataset)
+    add_singletons(dataset=dataset)
+    c_cs_id = dataset["CognatesetTable", "id"].name
+    c_c_id = dataset["CognateTable", "id"].name
+    assert [c[c_cs_id] for c in dataset["CognatesetTable"]] == [
+        c[c_cs_id] for c in cogsets + new_cogsets
+    ]
+    assert [j[c_c_id] for j in dataset["CognateTable"]] == [
+        j[c_c_id] for j in judgements + new_judgements
+    ]
+
+
+def test_singletons_create_missing_table():
+    dataset, _ = copy_to_temp_no_bib(
+        Path(__file__).parent / "data/cldf/smallmawetiguarani/cldf-metadata.json"
+    )
+    new_cogsets, _ = singleton_rows(dataset=dataset)
+    (dataset.directory / str(dataset["CognatesetTable"].url)).unlink()
+    add_singletons(dataset=dataset)
+    c_cs_id = dataset["CognatesetTable", "id"].name
+    assert [c[c_cs_id] for c in dataset["CognatesetTable"]] == [
+        c[c_cs_id] for c in new_cogsets
+    ]
+
+
+def test_singletons_rolled_back_on_failure(monkeypatch):
+    dataset, _ = copy_to_temp_no_bib(
+        Path(__file__).parent / "data/cldf/smallmawetiguarani/cldf-metadata.json"
+    )
+    tables = {
+        table: (dataset.directory / str(dataset[table].url)).read_bytes()
+        for table in ["CognatesetTable", "CognateTable"]
+    }
+    append_rows = fs.append_rows
+
+    def failing_append_rows(dataset, table, rows):
+        def failing_rows():
+            yield from rows[:1]
+            raise OSError("Disk full")
+
+        if table == "CognateTable":
+            return append_rows(dataset, table, failing_rows())
+        return append_rows(dataset, table, rows)
+
+    monkeypatch.setattr(fs, "append_rows", failing_append_rows)
+    with pytest.raises(OSError):
+        add_singletons(dataset=dataset)
+    for table, content in tables.items():
+        assert (dataset.directory / str(dataset[table].url)).read_bytes() == content
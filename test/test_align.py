@@ -0,0 +1,85 @@
+import random
+
+import lingpy
+
+from lexedata.util.fs import new_wordlist
+from lexedata.edit.align import (
+    _align_morphemes,
+    _pair_distance,
+    align,
+    aligne_cognate_table,
+)
+
+
+def random_wordlist(seed=0):
+    rng = random.Random(seed)
+    forms = []
+    judgements = []
+    # More than one batch of cognate sets, with many repeated morphemes
+    for c in range(150):
+        root = [rng.choice("ptkmnsl"), rng.choice("aeiou"), rng.choice("ptkmnsl")]
+        for language in ["l1", "l2", "l3", "l4"]:
+            segments = root[: rng.randint(2, 3)] + [rng.choice("ae")]
+            forms.append(
+                {
+                    "ID": f"{language}_c{c}",
+                    "Language_ID": language,
+                    "Parameter_ID": f"c{c}",
+                    "Form": "".join(segments),
+                    "Segments": segments,
+                }
+            )
+            judgements.append(
+                {
+                    "ID": f"{language}_c{c}-s{c}",
+                    "Form_ID": f"{language}_c{c}",
+                    "Cognateset_ID": f"s{c}",
+                }
+            )
+    return new_wordlist(
+        FormTable=forms,
+        CognateTable=judgements,
+        CognatesetTable=[{"ID": f"s{c}"} for c in range(150)],
+    )
+
+
+def test_parallel_alignment_matches_serial():
+    _pair_distance.cache_clear()
+    alignments = []
+    # Serially with an empty and with a filled cache, and in parallel
+    for jobs in (1, 1, 2):
+        dataset = random_wordlist()
+        aligne_cognate_table(dataset, jobs=jobs)
+        alignments.append([(j["ID"], j["Alignment"]) for j in dataset["CognateTable"]])
+    assert alignments[0] == alignments[1] == alignments[2]
+    assert all(alignment for _, alignment in alignments[0])
+
+
+def test_memoised_alignment_matches_lingpy():
+    dataset = random_wordlist()
+    segments = {f["ID"]: f["Segments"] for f in dataset["FormTable"]}
+    cognatesets = {}
+    for j in dataset["CognateTable"]:
+        cognatesets.setdefault(j["Cognateset_ID"], set()).add(
+            tuple(segments[j["Form_ID"]])
+        )
+    _pair_distance.cache_clear()
+    for morphemes in cognatesets.values():
+        morphemes = tuple(sorted(morphemes))
+        msa = lingpy.Multiple([list(m) for m in morphemes])
+        msa.prog_align(model="sca")
+        expected = tuple(tuple(row) for row in msa.alm_matrix)
+        assert _align_morphemes(morphemes, "sca") == expected
+    # Pairs of morphemes recur across cognate sets
+    assert _pair_distance.cache_info().hits > 0
+
+
+def test_identical_morphemes_get_identical_alignments():
+    morphemes = [
+        (("l1", ["t", "a", "k", "a"]), "j1"),
+        (("l2", ["t", "a", "k"]), "j2"),
+        (("l3", ["t", "a", "k", "a"]), "j3"),
+    ]
+    first = list(align(morphemes))
+    second = list(align(list(reversed(morphemes))))
+    assert sorted(first, key=lambda a: a[1]) == sorted(second, key=lambda a: a[1])
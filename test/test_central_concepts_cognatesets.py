@@ -1,12 +1,17 @@
 from pathlib import Path
+import collections
+import random
 import shutil
 import tempfile
 
 import pytest
 import pycldf
+import networkx
 
 from lexedata.edit.add_central_concepts import (
     add_central_concepts_to_cognateset_table,
+    central_concept,
+    central_concepts,
 )
 from lexedata.edit.add_concepticon import create_concepticon_for_concepts
 
@@ -71,3 +76,28 @@ def test_central_concept_status_column(copy_wordlist_add_concepticons):
         dataset, status_update="Test_Status"
     )
     assert all(c["Status_Column"] == "Test_Status" for c in dataset["CognatesetTable"])
+
+
+def test_central_concepts_parallel_matches_serial():
+    clics = networkx.barabasi_albert_graph(60, 2, seed=1)
+    clics = networkx.relabel_nodes(clics, str)
+    rng = random.Random(0)
+    concepticon = {f"c{i}": i for i in range(60)}
+    concepts_of_cognateset = {
+        f"s{i}": collections.Counter(rng.choices(sorted(concepticon), k=8))
+        for i in range(40)
+    }
+    # Many cognate sets share their concepts
+    concepts_of_cognateset.update(
+        {f"t{i}": concepts_of_cognateset[f"s{i % 5}"] for i in range(40)}
+    )
+    serial = {
+        cognateset: central_concept(concepts, concepticon, clics)
+        for cognateset, concepts in concepts_of_cognateset.items()
+    }
+    assert central_concepts(concepts_of_cognateset, concepticon, clics) == serial
+    assert (
+        central_concepts(concepts_of_cognateset, concepticon, clics, jobs=2) == serial
+    )
+    sampled = central_concepts(concepts_of_cognateset, concepticon, clics, sample=3)
+    assert sampled.keys() == serial.keys()
@@ -0,0 +1,59 @@
+import random
+import zipfile
+
+import networkx
+
+from lexedata.util import clics
+
+
+def write_gml(path, graph):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(clics.GML_MEMBER, "\n".join(networkx.generate_gml(graph)))
+
+
+def test_compiled_clics_roundtrip(tmp_path, monkeypatch):
+    graph = networkx.Graph()
+    graph.add_node("1277", Gloss="HAND")
+    graph.add_node("1673", Gloss="ARM")
+    graph.add_node("493", Gloss="FIVE")
+    graph.add_edges_from([("1277", "1673"), ("1277", "493")])
+    gml_file = tmp_path / "network.gml.zip"
+    write_gml(gml_file, graph)
+    cache_dir = tmp_path / "cache"
+
+    compiled = clics.load_compiled_clics(gml_file, cache_dir)
+    assert sorted(compiled.neighbours("1277")) == ["1673", "493"]
+    assert compiled.glosses["493"] == "FIVE"
+    assert len(list(cache_dir.glob("clics-*.pickle"))) == 1
+    assert not list(tmp_path.glob("clics-*.pickle"))
+
+    # Without a usable cache directory, the graph is compiled all the same
+    clics.load_compiled_clics.cache_clear()
+    uncached = clics.load_compiled_clics(gml_file, gml_file / "cache")
+    assert uncached.nodes == compiled.nodes
+
+    # Another process loads the compiled graph instead of parsing the GML
+    clics.load_compiled_clics.cache_clear()
+    monkeypatch.setattr(clics, "parse_clics", None)
+    reloaded = clics.load_compiled_clics(gml_file, cache_dir)
+    assert reloaded.nodes == compiled.nodes
+    monkeypatch.setenv("LEXEDATA_CACHE_DIR", str(cache_dir))
+    assert networkx.is_isomorphic(clics.load_clics_graph(gml_file), graph)
+
+
+def test_connectivity_matches_networkx():
+    rng = random.Random(0)
+    graph = networkx.gnp_random_graph(60, 0.05, seed=1)
+    graph = networkx.relabel_nodes(graph, str)
+    compiled = clics.ClicsGraph.from_networkx(graph)
+    groups = []
+    for _ in range(300):
+        # Neighbourhoods are connected, adding random nodes may disconnect them.
+        start = rng.choice(list(graph.nodes))
+        neighbours = list(graph[start])
+        group = {start, *rng.sample(neighbours, min(len(neighbours), 3))}
+        group.update(rng.sample(list(graph.nodes), rng.randint(0, 2)))
+        groups.append(group)
+    assert compiled.are_connected(groups) == [
+        networkx.is_connected(graph.subgraph(group)) for group in groups
+    ]
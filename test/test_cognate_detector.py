@@ -1,6 +1,44 @@
 from lexedata import util
+from lexedata.edit._cognate_code_language import cognate_code_language
 from lexedata.edit.add_segments import add_segments_to_dataset
-from lexedata.edit.detect_cognates import filter_function_factory
+from lexedata.edit.detect_cognates import (
+    filter_function_factory,
+    judgements_from_alignments,
+    scorer_cache_key,
+    ParallelAlignments,
+    ParallelPartial,
+)
+
+import random
+import pytest
+import lingpy
+
+
+def random_words(concepts, languages=("l1", "l2", "l3"), suffix=False):
+    """Generate similar random words for each concept in each language.
+
+    The words of a concept share their first two sounds. With `suffix`, each
+    word is followed by a morpheme boundary and the root of the concept.
+    Return (language, concept, tokens) triples.
+    """
+    rng = random.Random(0)
+    words = []
+    for c in range(concepts):
+        root = [rng.choice("ptkmnsl"), rng.choice("aeiou"), rng.choice("ptkmnsl")]
+        for language in languages:
+            tokens = root[:2] + [rng.choice("aeiou")]
+            if suffix:
+                tokens = tokens + ["+"] + root
+            words.append((language, f"c{c}", tokens))
+    return words
+
+
+def lingpy_data(words):
+    """Turn (language, concept, tokens) triples into LingPy wordlist data."""
+    data = {0: ["doculect", "concept", "tokens"]}
+    for language, concept, tokens in words:
+        data[len(data)] = [language, concept, list(tokens)]
+    return data
 
 
 def test_filter_function_factory():
@@ -67,3 +105,191 @@ def test_filter_function_factory():
         "doculect": "language",
         "tokens": ["f", "+", "a"],
     }
+
+
+def test_scorer_cache_key_depends_on_data_and_parameters():
+    def lexstat(form):
+        return lingpy.LexStat(
+            {
+                0: ["doculect", "concept", "tokens"],
+                1: ["l1", "c1", ["p", "a"]],
+                2: ["l2", "c1", form],
+            }
+        )
+
+    key = scorer_cache_key(lexstat(["p", "a"]), ratio=(3, 2))
+    assert key == scorer_cache_key(lexstat(["p", "a"]), ratio=(3, 2))
+    assert key != scorer_cache_key(lexstat(["b", "a"]), ratio=(3, 2))
+    assert key != scorer_cache_key(lexstat(["p", "a"]), ratio=(1, 1))
+
+
+def test_parallel_scorer_reproducible_from_seed():
+    data = lingpy_data(random_words(20))
+
+    matrices = []
+    for jobs in (1, 2):
+        lex = ParallelPartial({k: list(v) for k, v in data.items()})
+        lex.jobs = jobs
+        lex.seed = "seed"
+        lex.get_scorer(runs=50, ratio=(3, 2))
+        matrices.append([list(row) for row in lex.cscorer.matrix])
+    assert matrices[0] == matrices[1]
+
+
+def test_pair_cache_extends_scorer_to_new_language(tmp_path):
+    data = lingpy_data(random_words(20))
+
+    def scorer(data, cache_dir):
+        lex = ParallelPartial({k: list(v) for k, v in data.items()})
+        lex.seed = "seed"
+        lex.pair_cache_dir = cache_dir
+        lex.get_scorer(runs=50, ratio=(3, 2))
+        return [list(row) for row in lex.cscorer.matrix]
+
+    without_l3 = {k: v for k, v in data.items() if k == 0 or v[0] != "l3"}
+    scorer(without_l3, tmp_path)
+    # One distribution per pair of languages, including each language with itself
+    assert len(list(tmp_path.iterdir())) == 3
+    assert scorer(data, tmp_path) == scorer(data, None)
+    assert len(list(tmp_path.iterdir())) == 6
+
+
+def test_judgements_from_alignments():
+    alm = lingpy.Alignments(
+        {
+            0: ["doculect", "concept", "ipa", "tokens", "form_id", "partialcognateids"],
+            1: ["l1", "c", "ta ka", ["t", "a", "+", "k", "a"], "l1_c", [1, 2]],
+            2: ["l2", "c", "ta", ["t", "a"], "l2_c", [1]],
+        },
+        ref="partialcognateids",
+        fuzzy=True,
+    )
+    alm.align(method="progressive")
+    cognatesets = {}
+    judgements = list(judgements_from_alignments(alm, cognatesets))
+    assert [(j["Form_ID"], j["Cognateset_ID"]) for j in judgements] == [
+        ("l1_c", "1"),
+        ("l1_c", "2"),
+        ("l2_c", "1"),
+    ]
+    assert [j["Segment_Slice"] for j in judgements[:2]] == [["0:2"], ["2:4"]]
+    assert set(cognatesets) == {"1", "2"}
+
+
+def test_parallel_clustering_and_alignment_match_serial():
+    data = lingpy_data(random_words(12, suffix=True))
+
+    results = []
+    for jobs in (1, 2):
+        lex = ParallelPartial({k: list(v) for k, v in data.items()})
+        lex.jobs = jobs
+        lex.seed = "seed"
+        lex.get_scorer(runs=50)
+        lex.cluster(method="lexstat", threshold=0.55, ref="cogid")
+        lex.partial_cluster(method="lexstat", threshold=0.55, ref="partialcognateids")
+        alm = ParallelAlignments(lex, ref="partialcognateids", fuzzy=True)
+        alm.jobs = jobs
+        alm.align(method="progressive")
+        results.append(
+            [
+                (
+                    lex[idx, "cogid"],
+                    list(alm[idx, "partialcognateids"]),
+                    list(alm[idx, "alignment"]),
+                )
+                for idx in lex
+            ]
+        )
+    assert results[0] == results[1]
+
+
+def test_cognate_code_language(tmp_path):
+    forms = []
+    judgements = []
+    for language, concept, segments in random_words(20):
+        forms.append(
+            {
+                "ID": f"{language}_{concept}",
+                "Language_ID": language,
+                "Parameter_ID": concept,
+                "Form": "".join(segments),
+                "Segments": segments,
+            }
+        )
+        if language != "l3":
+            judgements.append(
+                {
+                    "ID": f"{language}_{concept}-s{concept[1:]}",
+                    "Form_ID": f"{language}_{concept}",
+                    "Cognateset_ID": f"s{concept[1:]}",
+                }
+            )
+    # A form whose LingPy tokens differ from its segments
+    forms[2]["Segments"] = forms[2]["Segments"] + ["_", "0", "k", "a"]
+    forms[2]["Form"] = forms[2]["Form"] + " ka"
+    # A form of a concept without judged forms in other languages
+    forms.append(
+        {
+            "ID": "l3_new",
+            "Language_ID": "l3",
+            "Parameter_ID": "new",
+            "Form": "sulu",
+            "Segments": ["s", "u", "l", "u"],
+        }
+    )
+    # A form that is judged already
+    judgements.append({"ID": "l3_c1-s1", "Form_ID": "l3_c1", "Cognateset_ID": "s1"})
+    dataset = util.fs.new_wordlist(
+        path=tmp_path,
+        FormTable=forms,
+        CognateTable=judgements,
+        CognatesetTable=[{"ID": f"s{c}"} for c in range(20)] + [{"ID": "l3_new"}],
+    )
+
+    new_cognatesets, new_judgements = cognate_code_language(
+        dataset.tablegroup._fname,
+        language="l3",
+        ratio=1.5,
+        soundclass="sca",
+        threshold=0.55,
+        initial_threshold=0.7,
+        gop=-2,
+        mode="overlap",
+        cache_dir=tmp_path / "cache",
+        seed="seed",
+    )
+    judged = {j["Form_ID"]: j for j in new_judgements}
+    assert "l3_c1" not in judged
+    assert len(judged) == len(new_judgements) == 20
+    assert judged["l3_c2"]["Cognateset_ID"] == "s2"
+    # Slice and alignment refer to the segments, not to the LingPy tokens
+    assert judged["l3_c0"]["Segment_Slice"] == ["1:7"]
+    assert judged["l3_c0"]["Alignment"] == forms[2]["Segments"]
+    # The singleton gets a new cognate set, with an ID that is not taken yet
+    assert judged["l3_new"]["Cognateset_ID"] == "l3_new_2"
+    assert {"ID": "l3_new_2"} in new_cognatesets
+    assert all(
+        judgement["Cognateset_ID"] in {f"s{c}" for c in range(20)}
+        or {"ID": judgement["Cognateset_ID"]} in new_cognatesets
+        for judgement in new_judgements
+    )
+
+
+def test_scorer_overrides_match_upstream_lexstat(tmp_path):
+    # With more runs than word pairs, LingPy uses all word pairs instead of a
+    # random sample, so the scorers can be compared exactly.
+    data = lingpy_data(random_words(6))
+
+    upstream = lingpy.compare.partial.Partial({k: list(v) for k, v in data.items()})
+    upstream.get_scorer(runs=1000, ratio=(3, 2))
+    expected = [list(row) for row in upstream.cscorer.matrix]
+
+    for jobs, cache_dir in [(1, tmp_path), (2, None), (2, tmp_path)]:
+        lex = ParallelPartial({k: list(v) for k, v in data.items()})
+        lex.jobs = jobs
+        lex.pair_cache_dir = cache_dir
+        lex.get_scorer(runs=1000, ratio=(3, 2))
+        assert lex.cscorer.chars2int == upstream.cscorer.chars2int
+        assert [list(row) for row in lex.cscorer.matrix] == [
+            pytest.approx(row) for row in expected
+        ]
@@ -17,6 +17,7 @@ from lexedata.edit.add_concepticon import (
     add_concepticon_names,
 )
 from lexedata.util.fs import copy_dataset
+from lexedata.edit import add_concepticon
 
 
 # TODO: Discuss this with Gereon. This fixture seems dangerous as we call a function that we test at another place
@@ -167,3 +168,27 @@ def test_add_concepticon_names_missing_column():
         assert dataset["ParameterTable", "Concepticon_Gloss"]
     except KeyError:
         pytest.fail("No column Concepticon_Gloss")
+
+
+def test_concepticon_mapping_only_maps_new_glosses(monkeypatch, tmp_path):
+    monkeypatch.setenv("LEXEDATA_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(add_concepticon, "concepticon_version", lambda: "v1")
+    targets = [("1", "HAND"), ("2", "ARM")]
+    monkeypatch.setattr(
+        add_concepticon, "concepticon_targets", lambda language: targets
+    )
+    mapped = []
+
+    def concept_map2(glosses, to, language, **kwargs):
+        mapped.extend(glosses)
+        return {i: ([to.index(g.upper())], 1) for i, g in enumerate(glosses)}
+
+    monkeypatch.setattr(add_concepticon, "concept_map2", concept_map2)
+
+    assert add_concepticon.mapped_glosses({"en": ["hand"]}) == {
+        "en": {"hand": ([("1", "HAND")], 1)}
+    }
+    assert add_concepticon.mapped_glosses({"en": ["hand", "arm"]}) == {
+        "en": {"hand": ([("1", "HAND")], 1), "arm": ([("2", "ARM")], 1)}
+    }
+    assert mapped == ["hand", "arm"]
@@ -5,19 +5,15 @@ from pathlib import Path
 from tempfile import mkdtemp
 
 import pycldf
-import cldfbench
-import cldfcatalog
 
 from mock_excel import MockSingleExcelSheet
 from lexedata.importer.excel_matrix import excel_parser_from_dialect
+from lexedata.util.clts import get_bipa
 
 
 @pytest.fixture
 def bipa():
-    clts_path = cldfcatalog.Config.from_file().get_clone("clts")
-    clts = cldfbench.catalogs.CLTS(clts_path)
-    bipa = clts.api.bipa
-    return bipa
+    return get_bipa()
 
 
 @pytest.fixture
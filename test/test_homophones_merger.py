@@ -1,11 +1,16 @@
 import re
+import json
 from pathlib import Path
 from copy import deepcopy
 import logging
 
 import pytest
+import networkx
+from csvw.metadata import URITemplate
 
 from lexedata.edit import merge_homophones
+from lexedata.report import homophones
+from lexedata.util.clics import ClicsGraph
 from helper_functions import copy_to_temp
 
 
@@ -277,6 +282,15 @@ def test_merge_group_assertion_error(copy_dataset, caplog):
         )
 
 
+def test_merge_plan(copy_dataset):
+    dataset, _ = copy_dataset
+    plan = dict(merge_homophones.merge_plan(dataset, merge_homophones.default_mergers))
+    assert "ID" not in plan
+    assert plan["Form"] is merge_homophones.must_be_equal
+    assert plan["Source"] is merge_homophones.union
+    assert plan["procedural_comment"] is merge_homophones.must_be_equal
+
+
 def test_merge_1(copy_dataset):
     dataset, _ = copy_dataset
     c_f_id = dataset["FormTable", "id"].name
@@ -505,6 +519,43 @@ def test_merge_3():
     # to increase coverage
 
 
+def test_merge_keeps_form_positions(copy_dataset):
+    dataset, _ = copy_dataset
+    c_f_id = dataset["FormTable", "id"].name
+    first_form = next(dataset["FormTable"].iterdicts())
+    forms = []
+    for suffix in ["", "_a", "_b", "_c", "_d", "_e", "_f", "_g", "_h"]:
+        form = deepcopy(first_form)
+        form[c_f_id] += suffix
+        forms.append(form)
+    forms[5]["Comment"] = "different"
+    dataset.write(FormTable=forms)
+    first_id = first_form[c_f_id]
+    mergers = dict(merge_homophones.default_mergers)
+    mergers["Comment"] = merge_homophones.cancel_and_skip
+    merged = merge_homophones.merge_forms(
+        data=dataset,
+        mergers=mergers,
+        homophone_groups={
+            first_id + "_a": [first_id + "_c"],
+            first_id + "_b": [first_id + "_missing"],
+            first_id + "_d": [first_id + "_f"],
+            first_id + "_g": [first_id + "_e", first_id + "_h"],
+        },
+    )
+    # Merged forms take the place of their target, skipped merges and
+    # incomplete groups are left as they are.
+    assert [f[c_f_id] for f in merged] == [
+        first_id,
+        first_id + "_a",
+        first_id + "_b",
+        first_id + "_d",
+        first_id + "_e",
+        first_id + "_g",
+        first_id + "_h",
+    ]
+
+
 def test_parse_merge_override():
     assert ("Source", merge_homophones.union) == merge_homophones.parse_merge_override(
         "Source:union"
@@ -516,3 +567,93 @@ def test_order_merge():
     Someone wrote in their homophones to be merged that 3, 2, 1 shoud be merged.
     Presumably, that means the values in form 3 have precedence, and for concatenate, they should appear in order 3,2,1.
     """
+
+
+@pytest.mark.parametrize("format", ["tsv", "json"])
+def test_homophones_report_roundtrip(copy_dataset, monkeypatch, tmp_path, format):
+    dataset, _ = copy_dataset
+    dataset.add_columns("ParameterTable", "Concepticon_ID")
+    dataset["ParameterTable", "Concepticon_ID"].propertyUrl = URITemplate(
+        "http://cldf.clld.org/v1.0/terms.rdf#concepticonReference"
+    )
+    dataset.write_metadata()
+    dataset.write(
+        ParameterTable=[
+            {"ID": "one", "Name": "one", "Concepticon_ID": "1"},
+            {"ID": "two", "Name": "two", "Concepticon_ID": "2"},
+            {"ID": "three", "Name": "three", "Concepticon_ID": "3"},
+        ]
+    )
+    first_form = next(dataset["FormTable"].iterdicts())
+    forms = []
+    for language, concept, value in [
+        ("ache", "one", "ka"),
+        ("ache", "two", "ka"),
+        ("ache", "three", "pa"),
+        ("paraguayan_guarani", "one", "ta"),
+        ("paraguayan_guarani", "three", "ta"),
+    ]:
+        form = deepcopy(first_form)
+        form.update(
+            {
+                "ID": f"{language}_{concept}",
+                "Language_ID": language,
+                "Parameter_ID": [concept],
+                "Form": value,
+            }
+        )
+        forms.append(form)
+    dataset.write(FormTable=forms)
+    monkeypatch.setattr(
+        homophones,
+        "load_compiled_clics",
+        lambda: ClicsGraph.from_networkx(networkx.Graph([("1", "2"), ("2", "3")])),
+    )
+
+    output = tmp_path / f"homophones.{format}"
+    homophones.list_homophones(dataset, output, format=format, jobs=2)
+    parse = {
+        "tsv": merge_homophones.parse_homophones_tsv,
+        "json": merge_homophones.parse_homophones_json,
+    }[format]
+    assert parse(output.open(encoding="utf-8", newline="")) == {
+        "ache_one": ["ache_two"],
+        "paraguayan_guarani_one": ["paraguayan_guarani_three"],
+    }
+    if format == "json":
+        groups = json.load(output.open(encoding="utf-8"))
+        assert [g["connectivity"] for g in groups] == ["Connected", "Unconnected"]
+
+
+def test_approximate_homophones_report(copy_dataset, monkeypatch, tmp_path):
+    dataset, _ = copy_dataset
+    first_form = next(dataset["FormTable"].iterdicts())
+    forms = []
+    for concept, value in [("one", "kata"), ("two", "káta"), ("three", "pilu")]:
+        form = deepcopy(first_form)
+        form.update(
+            {
+                "ID": f"ache_{concept}",
+                "Language_ID": "ache",
+                "Parameter_ID": [concept],
+                "Form": value,
+            }
+        )
+        forms.append(form)
+    dataset.write(FormTable=forms)
+    dataset.add_columns("ParameterTable", "Concepticon_ID")
+    dataset["ParameterTable", "Concepticon_ID"].propertyUrl = URITemplate(
+        "http://cldf.clld.org/v1.0/terms.rdf#concepticonReference"
+    )
+    monkeypatch.setattr(
+        homophones,
+        "load_compiled_clics",
+        lambda: ClicsGraph.from_networkx(networkx.Graph()),
+    )
+
+    output = tmp_path / "homophones.json"
+    homophones.list_homophones(dataset, output, format="json", approximate=0.1)
+    groups = json.load(output.open(encoding="utf-8"))
+    assert [(g["form"], [f["id"] for f in g["forms"]]) for g in groups] == [
+        ("kata ~ káta", ["ache_one", "ache_two"])
+    ]
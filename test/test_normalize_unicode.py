@@ -0,0 +1,29 @@
+import unicodedata
+from pathlib import Path
+
+from lexedata.edit.normalize_unicode import normalize, normalize_files
+
+
+def test_normalize_in_small_chunks(tmp_path):
+    text = "ID,Form\r\n" + "".join(
+        f"f{i},ka\u0301ta{'e' * i}\u0301\r\n" for i in range(50)
+    )
+    file = tmp_path / "forms.csv"
+    file.write_bytes(text.encode("utf-8"))
+    assert normalize(file, chunk_size=7)
+    assert file.read_bytes().decode("utf-8") == unicodedata.normalize("NFC", text)
+
+
+def test_normalize_files_skips_clean_files(tmp_path):
+    clean = tmp_path / "clean.csv"
+    clean.write_text("ID,Form\nf1,\u00e9\n", encoding="utf-8")
+    dirty = tmp_path / "dirty.csv"
+    dirty.write_text("ID,Form\nf1,e\u0301\n", encoding="utf-8")
+    mtime = clean.stat().st_mtime_ns
+    assert normalize_files([clean, dirty], jobs=2) == [dirty]
+    assert clean.stat().st_mtime_ns == mtime
+    assert dirty.read_text(encoding="utf-8") == "ID,Form\nf1,\u00e9\n"
+    assert sorted(p.name for p in Path(tmp_path).iterdir()) == [
+        "clean.csv",
+        "dirty.csv",
+    ]
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from csvw.metadata import URITemplate
+
+from lexedata.util.references import ReverseIndex, reference_graph, references_to
+
+from helper_functions import copy_to_temp
+
+
+def test_reverse_index_matches_scan():
+    dataset, _ = copy_to_temp(
+        Path(__file__).parent / "data/cldf/smallmawetiguarani/cldf-metadata.json"
+    )
+    c_j_id = dataset["CognateTable", "id"].name
+    c_j_form = dataset["CognateTable", "formReference"].name
+    index = ReverseIndex(dataset)
+    for form in dataset["FormTable"]:
+        judgements = [
+            j[c_j_id] for j in dataset["CognateTable"] if j[c_j_form] == form["ID"]
+        ]
+        assert index.referring("FormTable", form["ID"], "CognateTable") == (
+            {dataset["CognateTable"].url.string: judgements} if judgements else {}
+        )
+
+
+def test_reference_graph_follows_metadata_changes():
+    dataset, _ = copy_to_temp(
+        Path(__file__).parent / "data/cldf/smallmawetiguarani/cldf-metadata.json"
+    )
+    graph = reference_graph(dataset)
+    assert reference_graph(dataset) is graph
+    assert not references_to(dataset, "ParameterTable", from_table="CognatesetTable")
+
+    dataset.add_columns("CognatesetTable", "Core_Concept_ID")
+    dataset["CognatesetTable", "Core_Concept_ID"].propertyUrl = URITemplate(
+        "http://cldf.clld.org/v1.0/terms.rdf#parameterReference"
+    )
+    (reference,) = references_to(
+        dataset, "ParameterTable", from_table="CognatesetTable"
+    )
+    assert reference.column == "Core_Concept_ID"
+    assert not reference.foreign_key
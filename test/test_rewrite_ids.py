@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+
+from lexedata.util.rewrite_ids import ExternalMapping, rewrite_ids
+from lexedata.edit.simplify_ids import update_integer_ids
+
+from helper_functions import copy_to_temp
+
+
+@pytest.fixture
+def dataset():
+    dataset, _ = copy_to_temp(
+        Path(__file__).parent / "data/cldf/smallmawetiguarani/cldf-metadata.json"
+    )
+    return dataset
+
+
+def test_rewrite_ids_updates_all_references(dataset):
+    c_f_id = dataset["FormTable", "id"].name
+    c_f_concept = dataset["FormTable", "parameterReference"].name
+    c_j_form = dataset["CognateTable", "formReference"].name
+    forms = list(dataset["FormTable"])
+    judgements = list(dataset["CognateTable"])
+    form_mapping = {form[c_f_id]: f"form_{i}" for i, form in enumerate(forms)}
+    concept_mapping = {"one": "uno"}
+
+    rewrite_ids(
+        dataset,
+        {"FormTable": form_mapping, "ParameterTable": concept_mapping},
+    )
+
+    assert [form[c_f_id] for form in dataset["FormTable"]] == [
+        form_mapping[form[c_f_id]] for form in forms
+    ]
+    assert [form[c_f_concept] for form in dataset["FormTable"]] == [
+        [concept_mapping.get(c, c) for c in form[c_f_concept]]
+        if isinstance(form[c_f_concept], list)
+        else concept_mapping.get(form[c_f_concept], form[c_f_concept])
+        for form in forms
+    ]
+    assert [j[c_j_form] for j in dataset["CognateTable"]] == [
+        form_mapping[j[c_j_form]] for j in judgements
+    ]
+    assert "uno" in {
+        c[dataset["ParameterTable", "id"].name] for c in dataset["ParameterTable"]
+    }
+    assert dataset["FormTable"].common_props["dc:extent"] == len(forms)
+
+
+def test_rewrite_ids_with_external_mapping(dataset):
+    c_l_id = dataset["LanguageTable", "id"].name
+    c_f_language = dataset["FormTable", "languageReference"].name
+    languages = [language[c_l_id] for language in dataset["LanguageTable"]]
+    with ExternalMapping(
+        (language, language.upper()) for language in languages
+    ) as mapping:
+        rewrite_ids(dataset, {"LanguageTable": mapping})
+    assert [language[c_l_id] for language in dataset["LanguageTable"]] == [
+        language.upper() for language in languages
+    ]
+    assert {form[c_f_language] for form in dataset["FormTable"]} <= {
+        language.upper() for language in languages
+    }
+
+
+def test_update_integer_ids(dataset):
+    table = dataset["CognatesetTable"]
+    c_id = table.get_column("http://cldf.clld.org/v1.0/terms.rdf#id")
+    c_j_cogset = dataset["CognateTable", "cognatesetReference"].name
+    ids = [row[c_id.name] for row in table]
+    update_integer_ids(dataset, table)
+    assert [str(row[c_id.name]) for row in dataset["CognatesetTable"]] == [
+        str(i) for i in range(1, len(ids) + 1)
+    ]
+    assert {str(j[c_j_cogset]) for j in dataset["CognateTable"]} <= {
+        str(i) for i in range(1, len(ids) + 1)
+    }
+
+
+def test_rewrite_ids_keeps_file_mode(dataset):
+    forms = dataset.directory / str(dataset["FormTable"].url)
+    forms.chmod(0o644)
+    rewrite_ids(dataset, {"LanguageTable": {"ache": "Aché"}})
+    assert forms.stat().st_mode & 0o777 == 0o644
@@ -4,10 +4,14 @@ from pathlib import Path
 from lexedata.edit.add_segments import (
     segment_form,
     SegmentReport,
+    SegmentCache,
+    SegmentedForm,
+    PreReplacer,
     add_segments_to_dataset,
 )
 from test_excel_conversion import copy_to_temp
 from lexedata.cli import logger
+from lexedata.util.fs import new_wordlist
 
 
 def test_unkown_aspiration(caplog):
@@ -61,6 +65,30 @@ def test_deleting_symbols():
     assert "".join(str(s) for s in form) == "abːcdefgh"
 
 
+def test_segment_cache_replays_report(caplog, tmp_path):
+    cache = SegmentCache(tmp_path / "segments.json", version="test")
+    report = SegmentReport()
+    first = cache.segment("-á:muaʰ", report, context_for_warnings="1: ")
+    second = cache.segment("-á:muaʰ", report, context_for_warnings="2: ")
+    assert first == second == [str(s) for s in segment_form("-á:muaʰ", SegmentReport())]
+    assert report("language") == [("language", "aʰ", 2, "unknown pre-aspiration")]
+    assert re.search("2: Unknown sound aʰ encountered in -á:muaʰ", caplog.text)
+    cache.save()
+
+    reloaded = SegmentCache(tmp_path / "segments.json", version="test")
+    report = SegmentReport()
+    assert reloaded.segment("-á:muaʰ", report) == first
+    assert report("language") == [("language", "aʰ", 1, "unknown pre-aspiration")]
+
+
+def test_segment_cache_discarded_for_other_version(tmp_path):
+    cache = SegmentCache(tmp_path / "segments.json", version="clts v2.1.0")
+    cache.entries["ta"] = SegmentedForm(segments=["t", "a"])
+    cache.save()
+    assert SegmentCache(tmp_path / "segments.json", version="clts v2.1.0").entries
+    assert not SegmentCache(tmp_path / "segments.json", version="clts v2.2.0").entries
+
+
 # TODO: report contains warnings from other test. See other TODO.
 def test_add_segments_to_dataset():
     dataset, target = copy_to_temp(
@@ -85,3 +113,75 @@ def test_add_segments_to_dataset():
     #     ("old_paraguayan_guarani", "?", 1, "unknown sound"),
     #
     # ]
+
+
+def test_add_segments_parallel_matches_serial():
+    results = []
+    for jobs in (1, 2):
+        dataset, target = copy_to_temp(
+            Path(__file__).parent / "data/cldf/smallmawetiguarani/cldf-metadata.json"
+        )
+        report = add_segments_to_dataset(
+            dataset=dataset,
+            transcription=dataset.column_names.forms.form,
+            overwrite_existing=True,
+            replace_form=False,
+            logger=logger,
+            jobs=jobs,
+        )
+        results.append(
+            (
+                {language: r(language) for language, r in report.items()},
+                [row["Segments"] for row in dataset["FormTable"]],
+            )
+        )
+    assert results[0] == results[1]
+
+
+def test_add_segments_custom_replacements(tmp_path):
+    dataset, target = copy_to_temp(
+        Path(__file__).parent / "data/cldf/smallmawetiguarani/cldf-metadata.json"
+    )
+    expected = {}
+    for row in dataset["FormTable"]:
+        if row["Form"] and row["Form"] != "-":
+            expected.setdefault(row["Language_ID"], 0)
+            expected[row["Language_ID"]] += row["Form"].count("k")
+    table = tmp_path / "replacements.tsv"
+    table.write_text("# Replace k by g\nk\tg\n", encoding="utf-8")
+    report = add_segments_to_dataset(
+        dataset=dataset,
+        transcription=dataset.column_names.forms.form,
+        overwrite_existing=True,
+        replace_form=False,
+        logger=logger,
+        replacer=PreReplacer.from_file(table),
+    )
+    assert {
+        language: r.sounds["k"].count
+        for language, r in report.items()
+        if expected.get(language)
+    } == {language: count for language, count in expected.items() if count}
+    assert not any("k" in row["Segments"] for row in dataset["FormTable"])
+
+
+def test_replace_form_only_applies_replacements_of_transcription():
+    dataset = new_wordlist(
+        FormTable=[
+            {
+                "ID": "f1",
+                "Language_ID": "l",
+                "Parameter_ID": "p",
+                "Form": "ts͡aɁ",
+                "IPA": "taɁ",
+            }
+        ]
+    )
+    add_segments_to_dataset(
+        dataset=dataset,
+        transcription="IPA",
+        overwrite_existing=True,
+        replace_form=True,
+        logger=logger,
+    )
+    assert [f["Form"] for f in dataset["FormTable"]] == ["ts͡aʔ"]
@@ -6,6 +6,7 @@
 - Add segments
 """
 
+import os
 import csv
 import pytest
 import logging
@@ -610,6 +611,31 @@ def test_add_cog_tables_correct(formtable_only_example):
     # TODO: Check whether the outcome is correct
 
 
+def test_add_cog_tables_in_one_pass(formtable_only_example):
+    ds = formtable_only_example
+    forms = list(ds["FormTable"])
+    (ds.directory / str(ds["FormTable"].url)).chmod(0o640)
+    add_cognate_table.add_cognate_table(ds, False, cognateset_table=True)
+    assert "Cognateset_ID" not in ds["FormTable"].tableSchema.columndict
+    # The rewritten table keeps its mode, new tables get the default mode
+    umask = os.umask(0)
+    os.umask(umask)
+    assert (ds.directory / str(ds["FormTable"].url)).stat().st_mode & 0o777 == 0o640
+    assert (
+        ds.directory / str(ds["CognateTable"].url)
+    ).stat().st_mode & 0o777 == 0o666 & ~umask
+    assert [f["ID"] for f in ds["FormTable"]] == [f["ID"] for f in forms]
+    judgements = list(ds["CognateTable"])
+    assert [(j["Form_ID"], j["Cognateset_ID"]) for j in judgements] == [
+        (f["ID"], f["Cognateset_ID"]) for f in forms if f["Cognateset_ID"]
+    ]
+    assert [c["ID"] for c in ds["CognatesetTable"]] == sorted(
+        {f["Cognateset_ID"] for f in forms if f["Cognateset_ID"]}
+    )
+    assert ds["CognateTable"].common_props["dc:extent"] == len(judgements)
+    ds.validate()
+
+
 # TODO: Add segments, add alignments, add language table, add concept table,
 # add concepticon to concept table, find central concepts, phylogenetics
 # exporter. Check some reports: In particular coverage. At a later stage, add a